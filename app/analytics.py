@@ -0,0 +1,325 @@
+"""Per-center columnar snapshot of sessions and ratings behind the manager analytics endpoints.
+
+Each center's sessions are held as NumPy columns sorted by session id, so a breakdown is a mask
+plus ``bincount`` instead of another SQL scan. A snapshot is loaded on first use and kept current
+by re-reading the sessions and ratings around its id watermarks and the attendance of recent
+sessions; after ANALYTICS_SNAPSHOT_TTL it is dropped and loaded again from scratch.
+"""
+
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import BigInteger, case, cast, extract, func, select
+from sqlalchemy.orm import Session
+from .cache import TTLCache
+from .models import User, Session as SessionModel, Rating
+from .stats import NO_SUBJECT, RATING_DIMENSIONS
+
+ANALYTICS_SNAPSHOT_TTL = float(os.getenv("ANALYTICS_SNAPSHOT_TTL", "3600"))
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "5"))
+ANALYTICS_MAX_CENTERS = int(os.getenv("ANALYTICS_MAX_CENTERS", "8"))
+# Attendance is re-read for sessions this recent on every refresh; older re-marks wait for the reload
+ANALYTICS_ATTENDANCE_WINDOW_DAYS = int(os.getenv("ANALYTICS_ATTENDANCE_WINDOW_DAYS", "14"))
+# Ids are taken at insert but become visible at commit, so a row can show up below ids already seen;
+# each refresh re-reads this many ids under the watermarks and adds whatever it had not seen yet
+ANALYTICS_RESCAN_IDS = int(os.getenv("ANALYTICS_RESCAN_IDS", "1000"))
+ANALYTICS_LOAD_CHUNK_ROWS = 50000
+
+RATING_SCORES = 5  # each dimension is rated 1-5
+PRESENT, ABSENT = 1, 2  # attendance codes; 0 = not marked
+ATTENDANCE_CODE = case(
+    (SessionModel.attendance == "present", PRESENT),
+    (SessionModel.attendance == "absent", ABSENT),
+    else_=0
+)
+
+SECONDS_PER_DAY = 86400
+EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+COLUMNS = (
+    "session_ids", "timestamps", "hours_of_week", "assistant_codes", "student_ids", "subject_ids", "attendance"
+)
+
+
+def _timestamp(moment: datetime) -> int:
+    """Seconds since 1970-01-01 of a naive datetime, matching the snapshot's timestamps column"""
+    return int(np.datetime64(moment, "s").astype(np.int64))
+
+
+def _timestamp_column(dialect_name: str):
+    """Session time as epoch seconds computed by the database where it can, else the datetime itself"""
+    if dialect_name in ("sqlite", "postgresql"):
+        return cast(extract("epoch", SessionModel.datetime), BigInteger)
+    return SessionModel.datetime
+
+
+def _sessions_statement(dialect_name: str):
+    """Snapshot rows: (id, time, assistant, student, subject, attendance code, rating id, *dimensions), all integers"""
+    return select(
+        SessionModel.id, _timestamp_column(dialect_name), SessionModel.assistant_id, SessionModel.student_id,
+        func.coalesce(SessionModel.subject_id, NO_SUBJECT), ATTENDANCE_CODE, func.coalesce(Rating.id, 0),
+        *[func.coalesce(getattr(Rating, dimension), 0) for dimension in RATING_DIMENSIONS]
+    ).outerjoin(Rating, Rating.session_id == SessionModel.id)
+
+
+class CenterSnapshot:
+    """Session columns of one center; the first ``size`` entries are valid, the rest is spare capacity"""
+
+    def __init__(self, learning_center_id: int):
+        self.learning_center_id = learning_center_id
+        self.lock = threading.Lock()
+        self.size = 0
+        self.session_ids = np.empty(0, np.int64)
+        self.timestamps = np.empty(0, np.int64)  # seconds since 1970-01-01 of the stored (naive) datetime
+        self.hours_of_week = np.empty(0, np.int16)  # weekday (Monday = 0) * 24 + hour
+        self.assistant_codes = np.empty(0, np.int32)  # index into assistant_ids
+        self.student_ids = np.empty(0, np.int32)
+        self.subject_ids = np.empty(0, np.int32)  # subject the session was booked under, NO_SUBJECT if none
+        self.attendance = np.empty(0, np.int8)  # PRESENT, ABSENT or 0
+        self.ratings = np.empty((len(RATING_DIMENSIONS), 0), np.int8)  # 0 = not rated
+        self.assistant_ids = []  # code -> user id
+        self._assistant_codes = {}  # user id -> code
+        self.last_session_id = 0
+        self.last_rating_id = 0
+        self.loaded_at = None
+        self.refreshed_at = None
+
+    # ---- loading ----
+
+    def _reserve(self, extra: int):
+        """Grow every column to hold ``extra`` more sessions, doubling so appends stay amortized O(1)"""
+        needed = self.size + extra
+        capacity = len(self.session_ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        for name in COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+        ratings = np.zeros((len(RATING_DIMENSIONS), capacity), np.int8)
+        ratings[:, :self.size] = self.ratings[:, :self.size]
+        self.ratings = ratings
+
+    def _assistant_code(self, assistant_id: int) -> int:
+        code = self._assistant_codes.get(assistant_id)
+        if code is None:
+            code = self._assistant_codes[assistant_id] = len(self.assistant_ids)
+            self.assistant_ids.append(assistant_id)
+        return code
+
+    def _append(self, rows):
+        """Append _sessions_statement rows"""
+        if not rows:
+            return
+        if not isinstance(rows[0][1], int):  # datetimes on backends without an epoch extract
+            rows = [(row[0], _timestamp(row[1]), *row[2:]) for row in rows]
+        table = np.array([tuple(row) for row in rows], np.int64)
+
+        self._reserve(len(table))
+        window = slice(self.size, self.size + len(table))
+        timestamps = table[:, 1]
+        days, seconds = np.divmod(timestamps, SECONDS_PER_DAY)
+        assistant_ids, assistant_index = np.unique(table[:, 2], return_inverse=True)
+        assistant_codes = np.array([self._assistant_code(int(assistant_id)) for assistant_id in assistant_ids], np.int32)
+
+        self.session_ids[window] = table[:, 0]
+        self.timestamps[window] = timestamps
+        self.hours_of_week[window] = (days + EPOCH_WEEKDAY) % 7 * 24 + seconds // 3600
+        self.assistant_codes[window] = assistant_codes[assistant_index]
+        self.student_ids[window] = table[:, 3]
+        self.subject_ids[window] = table[:, 4]
+        self.attendance[window] = table[:, 5]
+        self.ratings[:, window] = table[:, 7:].T
+        self.size += len(table)
+        self.last_session_id = max(self.last_session_id, int(table[:, 0].max()))
+        self.last_rating_id = max(self.last_rating_id, int(table[:, 6].max()))
+
+    def _positions(self, session_ids) -> tuple:
+        """(positions, found mask) of session ids in the id-sorted columns"""
+        session_ids = np.asarray(session_ids, np.int64)
+        positions = np.searchsorted(self.session_ids[:self.size], session_ids)
+        found = positions < self.size
+        found[found] = self.session_ids[positions[found]] == session_ids[found]
+        return positions, found
+
+    def _sort(self):
+        order = np.argsort(self.session_ids[:self.size], kind="stable")
+        for name in COLUMNS:
+            column = getattr(self, name)
+            column[:self.size] = column[:self.size][order]
+        self.ratings[:, :self.size] = self.ratings[:, :self.size][:, order]
+
+    def _center_sessions(self, statement):
+        return statement.join(User, User.id == SessionModel.assistant_id).where(
+            User.learning_center_id == self.learning_center_id
+        )
+
+    def _load(self, db: Session):
+        statement = self._center_sessions(_sessions_statement(db.get_bind().dialect.name))
+        for rows in db.execute(statement.execution_options(yield_per=ANALYTICS_LOAD_CHUNK_ROWS)).partitions():
+            self._append(rows)
+
+        # Loaded without ORDER BY (that would sort the whole center in SQL); sort the columns once here
+        self._sort()
+        self.loaded_at = time.monotonic()
+
+    def _update(self, db: Session):
+        # Both floors are taken before new sessions bring their ratings' ids along
+        session_floor = max(0, self.last_session_id - ANALYTICS_RESCAN_IDS)
+        rating_floor = max(0, self.last_rating_id - ANALYTICS_RESCAN_IDS)
+
+        # Sessions above the floor (with any rating they already have) that the snapshot lacks
+        rows = db.execute(self._center_sessions(
+            _sessions_statement(db.get_bind().dialect.name).where(SessionModel.id > session_floor)
+        ).order_by(SessionModel.id)).all()
+        if rows:
+            _, known = self._positions([row[0] for row in rows])
+            unseen = [row for row, seen in zip(rows, known) if not seen]
+            if unseen:
+                committed_late = unseen[0][0] < self.last_session_id
+                self._append(unseen)
+                if committed_late:
+                    self._sort()
+
+        # Ratings above the floor; rewriting one already applied is harmless
+        ratings = db.execute(self._center_sessions(
+            select(Rating.id, Rating.session_id, *[getattr(Rating, dimension) for dimension in RATING_DIMENSIONS])
+            .join(SessionModel, SessionModel.id == Rating.session_id)
+            .where(Rating.id > rating_floor)
+        )).all()
+        if ratings:
+            rating_ids, session_ids, *dimensions = zip(*ratings)
+            positions, found = self._positions(session_ids)
+            for index, scores in enumerate(dimensions):
+                self.ratings[index, positions[found]] = np.asarray(scores, np.int8)[found]
+            self.last_rating_id = max(self.last_rating_id, max(rating_ids))
+
+        # Attendance of recent sessions, which is where marking happens
+        since = datetime.combine(date.today() - timedelta(days=ANALYTICS_ATTENDANCE_WINDOW_DAYS), datetime.min.time())
+        marked = db.execute(
+            select(SessionModel.id, ATTENDANCE_CODE)
+            .join(User, User.id == SessionModel.assistant_id)
+            .where(User.learning_center_id == self.learning_center_id, SessionModel.datetime >= since)
+        ).all()
+        if marked:
+            session_ids, codes = zip(*marked)
+            positions, found = self._positions(session_ids)
+            self.attendance[positions[found]] = np.asarray(codes, np.int8)[found]
+
+    def refresh(self, db: Session):
+        """Load on first use, afterwards catch up at most every ANALYTICS_REFRESH_SECONDS"""
+        with self.lock:
+            if self.loaded_at is None:
+                self._load(db)
+            elif time.monotonic() - self.refreshed_at >= ANALYTICS_REFRESH_SECONDS:
+                self._update(db)
+            else:
+                return
+            self.refreshed_at = time.monotonic()
+
+    # ---- queries ----
+
+    def _selection(self, date_from: Optional[date], date_to: Optional[date], assistant_ids=None,
+                   subject_id: Optional[int] = None):
+        """Index (slice or boolean mask) of the sessions inside the date range, of these assistants and
+        booked under this subject"""
+        selection = None
+        timestamps = self.timestamps[:self.size]
+        masks = []
+        if date_from:
+            masks.append(timestamps >= _timestamp(datetime.combine(date_from, datetime.min.time())))
+        if date_to:
+            masks.append(timestamps < _timestamp(datetime.combine(date_to + timedelta(days=1), datetime.min.time())))
+        if assistant_ids is not None:
+            codes = [self._assistant_codes[assistant_id] for assistant_id in assistant_ids
+                     if assistant_id in self._assistant_codes]
+            masks.append(np.isin(self.assistant_codes[:self.size], codes))
+        if subject_id is not None:
+            masks.append(self.subject_ids[:self.size] == subject_id)
+        for mask in masks:
+            selection = mask if selection is None else selection & mask
+        return slice(0, self.size) if selection is None else selection
+
+    def heatmap(self, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                assistant_ids=None, subject_id: Optional[int] = None) -> dict:
+        """Sessions and present sessions as 7 x 24 (Monday-first weekday x hour) matrices"""
+        with self.lock:
+            selection = self._selection(date_from, date_to, assistant_ids, subject_id)
+            cells = self.hours_of_week[:self.size][selection]
+            present = self.attendance[:self.size][selection] == PRESENT
+
+        return {
+            "sessions": np.bincount(cells, minlength=7 * 24).reshape(7, 24).tolist(),
+            "present": np.bincount(cells[present], minlength=7 * 24).reshape(7, 24).tolist()
+        }
+
+    def assistant_counts(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+        """{assistant_id: {"sessions", "present", "absent", "subjects"}} for assistants with sessions in the
+        range; "subjects" maps the subject each session was booked under (None for none) to its sessions"""
+        with self.lock:
+            selection = self._selection(date_from, date_to)
+            codes = self.assistant_codes[:self.size][selection]
+            subjects = self.subject_ids[:self.size][selection]
+            attendance = self.attendance[:self.size][selection]
+            assistant_ids = list(self.assistant_ids)
+
+        width = len(assistant_ids)
+        sessions = np.bincount(codes, minlength=width)
+        present = np.bincount(codes[attendance == PRESENT], minlength=width)
+        absent = np.bincount(codes[attendance == ABSENT], minlength=width)
+        counts = {
+            assistant_id: {"sessions": int(sessions[code]), "present": int(present[code]),
+                           "absent": int(absent[code]), "subjects": {}}
+            for code, assistant_id in enumerate(assistant_ids)
+            if sessions[code]
+        }
+        pairs, pair_sessions = np.unique(np.stack([codes, subjects]), axis=1, return_counts=True)
+        for (code, subject_id), amount in zip(pairs.T.tolist(), pair_sessions.tolist()):
+            counts[assistant_ids[code]]["subjects"][subject_id or None] = amount
+        return counts
+
+    def rating_distribution(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+        """{subject id: {dimension: [count of 1s .. count of 5s]}} over rated sessions in the range.
+
+        Sessions count under the subject they were booked under; None collects sessions without one.
+        """
+        with self.lock:
+            selection = self._selection(date_from, date_to)
+            rated = np.flatnonzero(self.ratings[0, :self.size][selection])
+            if isinstance(selection, np.ndarray):
+                rated = np.flatnonzero(selection)[rated]
+            subjects = self.subject_ids[rated]
+            scores = self.ratings[:, rated]
+
+        groups, group_of_session = np.unique(subjects, return_inverse=True)
+        offsets = group_of_session * RATING_SCORES - 1
+        width = len(groups) * RATING_SCORES
+        distributions = {
+            dimension: np.bincount(offsets + scores[index], minlength=width).reshape(len(groups), RATING_SCORES)
+            for index, dimension in enumerate(RATING_DIMENSIONS)
+        }
+        return {
+            int(subject_id) or None: {
+                dimension: distribution[index].tolist() for dimension, distribution in distributions.items()
+            }
+            for index, subject_id in enumerate(groups)
+        }
+
+analytics_snapshots = TTLCache(ANALYTICS_MAX_CENTERS, ANALYTICS_SNAPSHOT_TTL)
+_snapshots_lock = threading.Lock()
+
+
+def center_snapshot(db: Session, learning_center_id: int) -> CenterSnapshot:
+    """The center's snapshot, loaded or caught up with the database as needed"""
+    with _snapshots_lock:
+        snapshot = analytics_snapshots.get(learning_center_id)
+        if snapshot is None:
+            snapshot = CenterSnapshot(learning_center_id)
+            analytics_snapshots.set(learning_center_id, snapshot)
+    snapshot.refresh(db)
+    return snapshot
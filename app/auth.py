@@ -1,13 +1,19 @@
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import hashlib
+import hmac
 import secrets
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, get_async_db
 from .models import User
+from .cache import TTLCache
+from .hashing import HashingPool, HashingPoolSaturated
 import os
 from dotenv import load_dotenv
 
@@ -16,30 +22,109 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-this-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "1024"))
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+PASSWORD_HASH_SCHEME = "pbkdf2_sha256"
 
 security = HTTPBearer()
 
+# Principals of recently authenticated users, keyed by user id
+principal_cache = TTLCache(PRINCIPAL_CACHE_MAX_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
 
-def verify_password(plain_password, hashed_password):
-    """Verify a password against its hash using simple SHA256 + salt"""
+# Password hashing runs here instead of on request threads
+hashing_pool = HashingPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+
+def _derive(password: str, salt: str, iterations: int) -> str:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations).hex()
+
+
+def _verify_password(plain_password, hashed_password):
     try:
-        # Split the stored hash to get salt and hash
-        stored_salt, stored_hash = hashed_password.split(':')
-        # Hash the provided password with the same salt
-        password_hash = hashlib.sha256((plain_password + stored_salt).encode()).hexdigest()
-        return password_hash == stored_hash
-    except:
+        if hashed_password.startswith(f"{PASSWORD_HASH_SCHEME}$"):
+            _, iterations, salt, stored_hash = hashed_password.split("$")
+            password_hash = _derive(plain_password, salt, int(iterations))
+        else:
+            # Legacy SHA256 + salt format: "salt:hash"
+            salt, stored_hash = hashed_password.split(":")
+            password_hash = hashlib.sha256((plain_password + salt).encode()).hexdigest()
+        return hmac.compare_digest(password_hash, stored_hash)
+    except (AttributeError, ValueError):
         return False
 
 
-def get_password_hash(password):
-    """Hash a password using SHA256 + random salt"""
-    # Generate a random salt
+def _hash_password(password):
     salt = secrets.token_hex(16)
-    # Hash password with salt
-    password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-    # Return salt:hash format
-    return f"{salt}:{password_hash}"
+    password_hash = _derive(password, salt, PASSWORD_HASH_ITERATIONS)
+    return f"{PASSWORD_HASH_SCHEME}${PASSWORD_HASH_ITERATIONS}${salt}${password_hash}"
+
+
+def _run_hashing(fn, *args):
+    try:
+        return hashing_pool.run(fn, *args)
+    except HashingPoolSaturated:
+        raise _hashing_busy_exception()
+
+
+def _hashing_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server band, birozdan so'ng qayta urinib ko'ring",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def hashing_admission():
+    """Dependency for routes that hash: answer 503 while the hashing pool is full.
+
+    Runs on the event loop, before a sync route takes a threadpool thread to wait on the pool.
+    """
+    if not hashing_pool.admit():
+        raise _hashing_busy_exception()
+    try:
+        yield
+    finally:
+        hashing_pool.leave()
+
+
+def verify_password(plain_password, hashed_password):
+    """Verify a password against its hash on the hashing pool"""
+    return _run_hashing(_verify_password, plain_password, hashed_password)
+
+
+def get_password_hash(password):
+    """Hash a password with PBKDF2-SHA256 + random salt on the hashing pool"""
+    return _run_hashing(_hash_password, password)
+
+
+def get_password_hashes(passwords) -> list:
+    """Hash many passwords in parallel, keeping at most one job per worker in flight.
+
+    The pool's waiting queue stays free for interactive logins while an import hashes.
+    """
+    hashes, window = [], deque()
+    try:
+        for password in passwords:
+            if len(window) >= hashing_pool.workers:
+                hashes.append(window.popleft().result())
+            window.append(hashing_pool.submit(_hash_password, password))
+        hashes.extend(future.result() for future in window)
+    except HashingPoolSaturated:
+        raise _hashing_busy_exception()
+    return hashes
+
+
+def needs_rehash(hashed_password) -> bool:
+    """True for legacy hashes or hashes made with fewer iterations than configured"""
+    if not hashed_password.startswith(f"{PASSWORD_HASH_SCHEME}$"):
+        return True
+    try:
+        return int(hashed_password.split("$")[1]) < PASSWORD_HASH_ITERATIONS
+    except (IndexError, ValueError):
+        return True
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -53,49 +138,142 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def authenticate_user(db: Session, phone: str, password: str, learning_center_id: Optional[int] = None):
+def _find_login_user(db: Session, phone: str, learning_center_id: Optional[int] = None):
     if learning_center_id is None:  # Admin login
-        user = db.query(User).filter(User.phone == phone, User.role == "admin").first()
-    else:
-        user = db.query(User).filter(
-            User.phone == phone,
-            User.learning_center_id == learning_center_id
-        ).first()
+        return db.query(User).filter(User.phone == phone, User.role == "admin").first()
+    return db.query(User).filter(
+        User.phone == phone,
+        User.learning_center_id == learning_center_id
+    ).first()
+
+
+def _store_password_hash(db: Session, user: User, password_hash: str):
+    user.password = password_hash
+    db.commit()
+    invalidate_user(user.id)
+    db.refresh(user)
+
+
+def authenticate_user(db: Session, phone: str, password: str, learning_center_id: Optional[int] = None):
+    user = _find_login_user(db, phone, learning_center_id)
 
     if not user:
         return False
     if not verify_password(password, user.password):
         return False
+    if needs_rehash(user.password):
+        # Upgrade legacy/weaker hashes transparently while we know the plain password
+        _store_password_hash(db, user, get_password_hash(password))
     return user
 
 
-def get_current_user(token: str = Depends(security), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Kirish uchun qayta tizimga kiring",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_user_id(token) -> int:
     try:
         payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+            raise _credentials_exception()
+        return int(user_id)
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+
+class Principal:
+    """The signed-in user as authorization sees it: no password hash, not attached to any session.
+
+    Routes that change the user's own row load it with ``get_current_user_row``.
+    """
+
+    __slots__ = ("id", "role", "learning_center_id", "subject_id")
+
+    def __init__(self, id: int, role: str, learning_center_id: Optional[int], subject_id: Optional[int]):
+        self.id = id
+        self.role = role
+        self.learning_center_id = learning_center_id
+        self.subject_id = subject_id
+
+
+def _principal_statement(user_id: int):
+    return select(User.id, User.role, User.learning_center_id, User.subject_id).where(User.id == user_id)
+
+
+def _cache_principal(row, generation: int) -> Optional[Principal]:
+    """Principal of a _principal_statement row, cached unless a user was invalidated since ``generation``"""
+    if row is None:
+        return None
+    principal = Principal(*row)
+    principal_cache.set(principal.id, principal, generation)
+    return principal
 
-    user = db.query(User).filter(User.id == user_id).first()
+
+def _authorized(db, principal: Optional[Principal]) -> Principal:
+    if principal is None:
+        raise _credentials_exception()
+    # Bulk writes of this request are attributed to the user's center (see response_cache)
+    db.info["learning_center_id"] = principal.learning_center_id
+    return principal
+
+
+def get_current_user(token: str = Depends(security), db: Session = Depends(get_db)) -> Principal:
+    user_id = _token_user_id(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        # Read before the SELECT: an invalidation racing it keeps the possibly stale row out of the cache
+        generation = principal_cache.generation
+        principal = _cache_principal(db.execute(_principal_statement(user_id)).first(), generation)
+    return _authorized(db, principal)
+
+
+async def get_current_user_async(token: str = Depends(security),
+                                 db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """get_current_user for async routes, so they never hold a sync connection"""
+    user_id = _token_user_id(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        generation = principal_cache.generation
+        principal = _cache_principal((await db.execute(_principal_statement(user_id))).first(), generation)
+    return _authorized(db, principal)
+
+
+def get_current_user_row(principal: Principal = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+    """The signed-in user's row, for routes that change it"""
+    user = db.get(User, principal.id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 
+def invalidate_user(user_id: int):
+    """Drop a cached principal after its row was changed or deleted"""
+    principal_cache.invalidate(int(user_id))
+
+
+def _check_role(current_user: Principal, allowed_roles: list):
+    if current_user.role not in allowed_roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Bu amalni bajarish uchun ruxsatingiz yo'q"
+        )
+    return current_user
+
+
 def require_role(allowed_roles: list):
-    def role_checker(current_user: User = Depends(get_current_user)):
-        if current_user.role not in allowed_roles:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Bu amalni bajarish uchun ruxsatingiz yo'q"
-            )
-        return current_user
-
-    return role_checker
\ No newline at end of file
+    def role_checker(current_user: Principal = Depends(get_current_user)):
+        return _check_role(current_user, allowed_roles)
+
+    return role_checker
+
+
+def require_role_async(allowed_roles: list):
+    async def role_checker(current_user: Principal = Depends(get_current_user_async)):
+        return _check_role(current_user, allowed_roles)
+
+    return role_checker
@@ -0,0 +1,391 @@
+"""Recurring weekly availability rules, expanded on demand for a date window, and slot bitmaps.
+
+Rules describe an assistant's regular hours. Only slots that differ from them are stored in
+``availability``: booked slots, one-off extra slots ("available") and blocked rule slots ("busy").
+
+Reads combine both into one ``DayBitmap`` per assistant-day: slot starts on a SLOT_MINUTES grid are
+bits of an int, so expanding, overriding and "who is free at 15:00" are bitwise operations.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, or_, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import Availability, AvailabilityRule, AvailabilityRuleException
+
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M"
+
+# How far ahead rule slots are expanded when a read has no explicit end date
+AVAILABILITY_RULE_WINDOW_DAYS = int(os.getenv("AVAILABILITY_RULE_WINDOW_DAYS", "28"))
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES  # bits per DayBitmap mask
+
+
+def slot_index(time_slot: str) -> int:
+    """Bit of an HH:MM slot start; ValueError unless it lies on the SLOT_MINUTES grid"""
+    moment = datetime.strptime(time_slot, TIME_FORMAT)
+    minutes = moment.hour * 60 + moment.minute
+    if minutes % SLOT_MINUTES:
+        raise ValueError(f"{time_slot} is not on the {SLOT_MINUTES}-minute grid")
+    return minutes // SLOT_MINUTES
+
+
+def on_grid(time_slot: str) -> bool:
+    """Whether an HH:MM slot start has a bit; legacy stored rows may not"""
+    try:
+        slot_index(time_slot)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+
+def slot_time(index: int) -> str:
+    minutes = index * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slot_mask(time_slots) -> int:
+    mask = 0
+    for time_slot in time_slots:
+        mask |= 1 << slot_index(time_slot)
+    return mask
+
+
+def mask_slots(mask: int) -> list:
+    """HH:MM starts of the set bits, earliest first"""
+    slots = []
+    while mask:
+        lowest = mask & -mask
+        slots.append(slot_time(lowest.bit_length() - 1))
+        mask ^= lowest
+    return slots
+
+
+def time_range_mask(time_from: Optional[str] = None, time_to: Optional[str] = None) -> int:
+    """Slot starts between two HH:MM times, both inclusive; the whole day when unbounded"""
+    first, last = 0, SLOTS_PER_DAY - 1
+    if time_from is not None:
+        moment = datetime.strptime(time_from, TIME_FORMAT)
+        first = -(-(moment.hour * 60 + moment.minute) // SLOT_MINUTES)
+    if time_to is not None:
+        moment = datetime.strptime(time_to, TIME_FORMAT)
+        last = (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+    if last < first:
+        return 0
+    return ((1 << (last + 1)) - 1) & ~((1 << first) - 1)
+
+
+class DayBitmap:
+    """Free and booked slot starts of one assistant-day as two SLOTS_PER_DAY-bit masks.
+
+    Stored rows off the SLOT_MINUTES grid (written before the grid existed) have no bit; they are
+    kept by time in ``off_grid`` so reads still list them.
+    """
+
+    __slots__ = ("free", "booked", "off_grid")
+
+    def __init__(self, free: int = 0, booked: int = 0):
+        self.free = free
+        self.booked = booked
+        self.off_grid = {}
+
+    def apply(self, time_slot: str, state: str):
+        """Overlay one stored availability row; busy clears the slot"""
+        if not on_grid(time_slot):
+            self.off_grid[time_slot] = state
+            return
+        bit = 1 << slot_index(time_slot)
+        self.free &= ~bit
+        self.booked &= ~bit
+        if state == "available":
+            self.free |= bit
+        elif state == "booked":
+            self.booked |= bit
+
+    def is_free(self, time_slot: str) -> bool:
+        if not on_grid(time_slot):
+            return self.off_grid.get(time_slot) == "available"
+        return bool(self.free >> slot_index(time_slot) & 1)
+
+    def _with_off_grid(self, slots: list, state: str) -> list:
+        extra = [time_slot for time_slot, slot_state in self.off_grid.items() if slot_state == state]
+        return sorted(slots + extra) if extra else slots
+
+    def free_slots(self) -> list:
+        return self._with_off_grid(mask_slots(self.free), "available")
+
+    def booked_slots(self) -> list:
+        return self._with_off_grid(mask_slots(self.booked), "booked")
+
+    def offered_count(self) -> int:
+        """Free and booked slot starts, on the grid or not"""
+        extra = sum(state in ("available", "booked") for state in self.off_grid.values())
+        return (self.free | self.booked).bit_count() + extra
+
+    def __bool__(self):
+        return bool(self.free | self.booked) or any(
+            state in ("available", "booked") for state in self.off_grid.values()
+        )
+
+
+def common_free(bitmaps) -> int:
+    """Mask of the slot starts free in every bitmap"""
+    mask = (1 << SLOTS_PER_DAY) - 1
+    for bitmap in bitmaps:
+        mask &= bitmap.free
+    return mask
+
+
+def free_at(bitmaps: dict, time_slot: str) -> list:
+    """Keys of ``bitmaps`` whose day has ``time_slot`` free"""
+    bit = 1 << slot_index(time_slot)
+    return [key for key, bitmap in bitmaps.items() if bitmap.free & bit]
+
+
+def build_day_bitmaps(rule_days: dict, overrides) -> dict:
+    """{date: DayBitmap} from rule masks ({date: mask}) with stored (date, time_slot, status) rows on top"""
+    days = {day_key: DayBitmap(free=mask) for day_key, mask in rule_days.items()}
+    for slot_date, time_slot, is_available in overrides:
+        days.setdefault(slot_date, DayBitmap()).apply(time_slot, is_available)
+    return dict(sorted(days.items()))
+
+
+def rule_window(date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """(first, last) dates rule slots are expanded for; defaults to the next AVAILABILITY_RULE_WINDOW_DAYS"""
+    first = date_from or date.today()
+    return first, date_to or first + timedelta(days=AVAILABILITY_RULE_WINDOW_DAYS)
+
+
+def _bad_request(detail: str):
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except (ValueError, TypeError):
+        raise _bad_request("Sana YYYY-MM-DD formatida bo'lishi kerak")
+
+
+def parse_time(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except (ValueError, TypeError):
+        raise _bad_request("Vaqt HH:MM formatida bo'lishi kerak")
+
+
+def validate_time_slots(time_slots):
+    """Rule times must lie on the slot grid; stored one-off slots may be any time"""
+    for time_slot in time_slots:
+        if parse_time(time_slot).minute % SLOT_MINUTES:
+            raise _bad_request(f"Vaqt {SLOT_MINUTES} daqiqalik qadamda bo'lishi kerak")
+
+
+def validate_rule(weekday: int, start_time: str, end_time: str, slot_minutes: int,
+                  valid_from: str, valid_to: Optional[str], exceptions: List[str]):
+    if not 0 <= weekday <= 6:
+        raise _bad_request("Hafta kuni 0 (dushanba) dan 6 (yakshanba) gacha bo'lishi kerak")
+    validate_time_slots([start_time])
+    start, end = parse_time(start_time), parse_time(end_time)
+    if slot_minutes % SLOT_MINUTES:
+        raise _bad_request(f"Dars davomiyligi {SLOT_MINUTES} daqiqaga karrali bo'lishi kerak")
+    if slot_minutes <= 0 or start + timedelta(minutes=slot_minutes) > end:
+        raise _bad_request("Vaqt oralig'iga kamida bitta dars sig'ishi kerak")
+    if valid_to is not None and parse_date(valid_to) < parse_date(valid_from):
+        raise _bad_request("Tugash sanasi boshlanish sanasidan oldin bo'lishi mumkin emas")
+    for exception_date in exceptions:
+        parse_date(exception_date)
+
+
+def _rule_valid_between(first: str, last: str) -> tuple:
+    return (
+        AvailabilityRule.valid_from <= last,
+        or_(AvailabilityRule.valid_to.is_(None), AvailabilityRule.valid_to >= first)
+    )
+
+
+def _rule_exceptions_between(first: str, last: str):
+    return and_(
+        AvailabilityRuleException.rule_id == AvailabilityRule.id,
+        AvailabilityRuleException.date >= first,
+        AvailabilityRuleException.date <= last
+    )
+
+
+def rules_statement(filters, date_from: date, date_to: date):
+    """Rules valid somewhere in [date_from, date_to] with their exception dates in that window.
+
+    Rows are (rule, exception date or None); pass them to ``collect_rules``.
+    """
+    first, last = date_from.strftime(DATE_FORMAT), date_to.strftime(DATE_FORMAT)
+    return select(AvailabilityRule, AvailabilityRuleException.date).outerjoin(
+        AvailabilityRuleException, _rule_exceptions_between(first, last)
+    ).where(
+        *filters,
+        *_rule_valid_between(first, last)
+    ).order_by(AvailabilityRule.id)
+
+
+def with_rules_on(statement, assistant_id_column, day: date):
+    """Outer-join the rules an assistant has on ``day`` (with that day's exceptions) onto ``statement``.
+
+    Rows gain (rule or None, exception date or None); the ones with a rule go to ``collect_rules``.
+    """
+    day_key = day.strftime(DATE_FORMAT)
+    return statement.add_columns(AvailabilityRule, AvailabilityRuleException.date).outerjoin(
+        AvailabilityRule, and_(
+            AvailabilityRule.assistant_id == assistant_id_column,
+            AvailabilityRule.weekday == day.weekday(),
+            *_rule_valid_between(day_key, day_key)
+        )
+    ).outerjoin(
+        AvailabilityRuleException, _rule_exceptions_between(day_key, day_key)
+    )
+
+
+def collect_rules(rows) -> list:
+    """[(rule, {exception dates})] from rules_statement rows"""
+    rules = {}
+    for rule, exception_date in rows:
+        entry = rules.setdefault(rule.id, (rule, set()))
+        if exception_date:
+            entry[1].add(exception_date)
+    return list(rules.values())
+
+
+def rule_mask(rule) -> int:
+    """Slot starts a rule offers on each of its days"""
+    start, end = parse_time(rule.start_time), parse_time(rule.end_time)
+    length = timedelta(minutes=rule.slot_minutes)
+    mask = 0
+    while start + length <= end:
+        mask |= 1 << slot_index(start.strftime(TIME_FORMAT))
+        start += length
+    return mask
+
+
+def expand_rules(rules, date_from: date, date_to: date) -> dict:
+    """{assistant_id: {date: slot mask}} generated by ``rules`` in [date_from, date_to], in date order"""
+    expanded = {}
+    for rule, exception_dates in rules:
+        first = max(date_from, parse_date(rule.valid_from))
+        last = date_to if rule.valid_to is None else min(date_to, parse_date(rule.valid_to))
+        mask = rule_mask(rule)
+        day = first + timedelta(days=(rule.weekday - first.weekday()) % 7)
+        while day <= last:
+            day_key = day.strftime(DATE_FORMAT)
+            if day_key not in exception_dates:
+                days = expanded.setdefault(rule.assistant_id, {})
+                days[day_key] = days.get(day_key, 0) | mask
+            day += timedelta(days=7)
+
+    return {assistant_id: dict(sorted(days.items())) for assistant_id, days in expanded.items()}
+
+
+def offered_slot_counts(db: Session, assistant_ids, date_from: date, date_to: date) -> dict:
+    """{assistant_id: slot starts offered (free or booked) in [date_from, date_to]} from rules and stored rows.
+
+    ``assistant_ids`` may be a list or a select of user ids.
+    """
+    rules = collect_rules(db.execute(
+        rules_statement([AvailabilityRule.assistant_id.in_(assistant_ids)], date_from, date_to)
+    ).all())
+    rule_days = expand_rules(rules, date_from, date_to)
+
+    stored = {}
+    for assistant_id, slot_date, time_slot, is_available in db.execute(
+            select(Availability.assistant_id, Availability.date, Availability.time_slot, Availability.is_available)
+            .where(
+                Availability.assistant_id.in_(assistant_ids),
+                Availability.date >= date_from.strftime(DATE_FORMAT),
+                Availability.date <= date_to.strftime(DATE_FORMAT)
+            )
+    ):
+        stored.setdefault(assistant_id, []).append((slot_date, time_slot, is_available))
+
+    return {
+        assistant_id: sum(
+            bitmap.offered_count()
+            for bitmap in build_day_bitmaps(rule_days.get(assistant_id, {}), stored.get(assistant_id, [])).values()
+        )
+        for assistant_id in rule_days.keys() | stored.keys()
+    }
+
+
+def claim_rule_slot(db: Session, assistant_id: int, session_datetime: datetime, rules) -> bool:
+    """Book a slot that only exists through a rule by materializing it as "booked".
+
+    ``rules`` are the assistant's collect_rules() for that date, loaded along with the booking's first
+    query (``with_rules_on``), so a slot no rule offers fails here without touching the database.
+    Returns False then, or when a row for the slot already exists (booked or busy); the unique slot
+    index makes concurrent claims of the same slot fail here too.
+    """
+    day = session_datetime.date()
+    day_key = day.strftime(DATE_FORMAT)
+    time_slot = session_datetime.strftime(TIME_FORMAT)
+    try:
+        if not expand_rules(rules, day, day).get(assistant_id, {}).get(day_key, 0) >> slot_index(time_slot) & 1:
+            return False
+    except ValueError:
+        return False
+
+    try:
+        with db.begin_nested():
+            db.add(Availability(assistant_id=assistant_id, date=day_key, time_slot=time_slot, is_available="booked"))
+    except IntegrityError:
+        return False
+    return True
+
+
+def desired_slot_rows(assistant_id: int, day_key: str, time_slots, rule_day_mask: int, existing: dict) -> tuple:
+    """Diff of one date against its stored rows: (rows to upsert, ids of free rows to delete).
+
+    ``existing`` maps time_slot -> (id, status). Booked rows are never changed or deleted.
+    """
+    wanted_mask = slot_mask(time_slot for time_slot in time_slots if on_grid(time_slot))
+    wanted = dict.fromkeys(mask_slots(wanted_mask & ~rule_day_mask), "available")
+    wanted.update(dict.fromkeys(mask_slots(rule_day_mask & ~wanted_mask), "busy"))
+    # Times off the grid are kept as given; rules never offer them, so they are plain extra slots
+    wanted.update((time_slot, "available") for time_slot in time_slots if not on_grid(time_slot))
+
+    upserts = [
+        {"assistant_id": assistant_id, "date": day_key, "time_slot": time_slot, "is_available": state}
+        for time_slot, state in wanted.items()
+        if existing.get(time_slot, (None, None))[1] not in (state, "booked")
+    ]
+    deletes = [
+        row_id for time_slot, (row_id, state) in existing.items()
+        if state != "booked" and time_slot not in wanted
+    ]
+    return upserts, deletes
+
+
+def upsert_slots(db: Session, rows: list):
+    """Bulk INSERT ... ON CONFLICT of availability rows that never overwrites a booked slot"""
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(Availability).values(rows)
+        statement = statement.on_duplicate_key_update(is_available=case(
+            (Availability.is_available == "booked", Availability.is_available),
+            else_=statement.inserted.is_available
+        ))
+    elif dialect in ("postgresql", "sqlite"):
+        statement = (postgresql if dialect == "postgresql" else sqlite).insert(Availability).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["assistant_id", "date", "time_slot"],
+            set_={"is_available": statement.excluded.is_available},
+            where=Availability.is_available != "booked"
+        )
+    else:
+        raise ValueError(f"No availability upsert for {dialect!r}")
+
+    db.execute(statement)
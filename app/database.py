@@ -1,14 +1,154 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./learning_center.db")
 
-engine = create_engine(DATABASE_URL)
+# Engine profile: "sqlite" (WAL tuning), "server" (pooled PostgreSQL/MySQL) or "default" (SQLAlchemy defaults).
+# When unset it is picked from the DATABASE_URL scheme.
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE") or ("sqlite" if DATABASE_URL.startswith("sqlite") else "server")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # negative = KiB
+
+# Async drivers used for ASYNC_DATABASE_URL when it is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+class PoolMonitor:
+    """Connection pool checkout wait times and saturation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.capacity = None
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "profile": DB_ENGINE_PROFILE,
+                "capacity": self.capacity,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "saturation": round(self.checked_out / self.capacity, 4) if self.capacity else None,
+                "peak_saturation": round(self.peak_checked_out / self.capacity, 4) if self.capacity else None,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 3)
+            }
+
+
+pool_monitor = PoolMonitor()
+
+
+class MonitoredQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_monitor.record_timeout()
+            raise
+        pool_monitor.record_checkout(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, record):
+        pool_monitor.record_checkin()
+        super()._do_return_conn(record)
+
+
+def _pool_options():
+    pool_monitor.capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    return {
+        "poolclass": MonitoredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _create_sqlite_engine(url):
+    # In-memory databases live on a single connection; only tune file databases
+    options = {"connect_args": {"check_same_thread": False}}
+    if make_url(url).database not in (None, "", ":memory:"):
+        options.update(_pool_options())
+        options["pool_pre_ping"] = False
+
+    sqlite_engine = create_engine(url, **options)
+    event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+    return sqlite_engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def _create_server_engine(url):
+    return create_engine(url, **_pool_options())
+
+
+ENGINE_PROFILES = {
+    "sqlite": _create_sqlite_engine,
+    "server": _create_server_engine,
+    "default": create_engine,
+}
+
+if DB_ENGINE_PROFILE not in ENGINE_PROFILES:
+    raise ValueError(f"Unknown DB_ENGINE_PROFILE {DB_ENGINE_PROFILE!r}; expected one of {sorted(ENGINE_PROFILES)}")
+
+engine = ENGINE_PROFILES[DB_ENGINE_PROFILE](DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -20,6 +160,45 @@ def get_db():
     finally:
         db.close()
 
+
+def _async_database_url():
+    url = make_url(DATABASE_URL)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for {url.get_backend_name()!r}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=driver)
+
+
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    """Build the async engine on first use so the async driver stays optional"""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        url = os.getenv("ASYNC_DATABASE_URL") or _async_database_url()
+        if make_url(url).get_backend_name() == "sqlite":
+            async_engine = create_async_engine(url, connect_args={"check_same_thread": False})
+            if DB_ENGINE_PROFILE == "sqlite":
+                event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        else:
+            async_engine = create_async_engine(
+                url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING,
+            )
+        # expire_on_commit=False: attributes must stay readable without implicit async IO
+        _async_sessionmaker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
 def create_tables():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
@@ -31,4 +210,4 @@ def drop_tables():
 def reset_database():
     """Drop and recreate all tables"""
     drop_tables()
-    create_tables()
\ No newline at end of file
+    create_tables()
@@ -0,0 +1,109 @@
+"""Streaming exports: rows go from a server-side cursor to the response in fixed-size chunks"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from .database import engine
+from .models import User, Session as SessionModel, Rating
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",  # Starlette appends the charset to text/* types
+    "ndjson": "application/x-ndjson",
+}
+
+SESSION_EXPORT_COLUMNS = (
+    "session_id", "datetime", "status", "attendance",
+    "student_id", "student_name", "student_phone",
+    "assistant_id", "assistant_name", "assistant_phone",
+    "knowledge", "communication", "patience", "engagement", "problem_solving", "comments", "rated_at",
+)
+
+
+def session_export_statement(learning_center_id: int, date_from: Optional[date] = None,
+                             date_to: Optional[date] = None):
+    """The center's sessions with both participants and the rating, by assistant and then oldest first.
+
+    One statement for the whole center: sessions are picked with ``assistant_id IN (center assistants)``
+    and ordered along ix_sessions_assistant_id_datetime, so rows come off the index without a sort.
+    """
+    center_assistants = select(User.id).where(
+        User.learning_center_id == learning_center_id,
+        User.role == "assistant"
+    )
+    student = aliased(User)
+    assistant = aliased(User)
+    statement = select(
+        SessionModel.id, SessionModel.datetime, SessionModel.status, SessionModel.attendance,
+        student.id, student.fullname, student.phone,
+        assistant.id, assistant.fullname, assistant.phone,
+        Rating.knowledge, Rating.communication, Rating.patience, Rating.engagement, Rating.problem_solving,
+        Rating.comments, Rating.created_at
+    ).join(
+        assistant, assistant.id == SessionModel.assistant_id
+    ).join(
+        student, student.id == SessionModel.student_id
+    ).outerjoin(
+        Rating, Rating.session_id == SessionModel.id
+    ).where(
+        SessionModel.assistant_id.in_(center_assistants)
+    ).order_by(SessionModel.assistant_id, SessionModel.datetime, SessionModel.id)
+
+    if date_from:
+        statement = statement.where(SessionModel.datetime >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        statement = statement.where(
+            SessionModel.datetime < datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+        )
+    return statement
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(SESSION_EXPORT_COLUMNS, map(_plain, row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def stream_session_export(learning_center_id: int, fmt: str, gzip: bool = False,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Yield the center's sessions encoded as ``fmt``, EXPORT_CHUNK_ROWS rows at a time.
+
+    Uses its own connection so the stream does not depend on the request's session lifetime.
+    yield_per turns on server-side cursors where the driver has them.
+    """
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # 31: gzip container
+
+    def emit(chunk: str) -> bytes:
+        data = chunk.encode()
+        return compressor.compress(data) if compressor else data
+
+    with engine.connect() as connection:
+        if fmt == "csv":
+            yield emit(encode([SESSION_EXPORT_COLUMNS]))
+        result = connection.execution_options(yield_per=EXPORT_CHUNK_ROWS).execute(
+            session_export_statement(learning_center_id, date_from, date_to)
+        )
+        for rows in result.partitions():
+            yield emit(encode(rows))
+
+    if compressor:
+        yield compressor.flush()
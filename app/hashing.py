@@ -0,0 +1,85 @@
+"""Bounded worker pool for CPU-heavy password hashing"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+
+class HashingPool:
+    """Runs hashing jobs on dedicated threads, rejecting work beyond ``workers + max_pending``.
+
+    hashlib releases the GIL while deriving keys, so threads hash in parallel.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._admissions = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolSaturated()
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def admit(self) -> bool:
+        """Reserve room for a request that is about to hash; False (counted as rejected) when full.
+
+        Checked before the request is handed to a threadpool thread, so a burst beyond the pool's
+        capacity is turned away at once instead of queueing for threads. Pair with ``leave``.
+        """
+        if self._admissions.acquire(blocking=False):
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def leave(self):
+        self._admissions.release()
+
+    def run(self, fn, *args):
+        """Run a job and block the calling thread until it finishes"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        """Run a job without holding the event loop or a threadpool thread"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - self.workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
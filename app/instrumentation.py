@@ -0,0 +1,170 @@
+"""Per-request SQL instrumentation: statement counts, DB time, N+1 detection and slow-query log"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_METRICS_HEADERS = os.getenv("SQL_METRICS_HEADERS", "false").lower() in ("1", "true", "yes")
+SQL_NPLUSONE_THRESHOLD = int(os.getenv("SQL_NPLUSONE_THRESHOLD", "10"))
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+
+logger = logging.getLogger("app.sql")
+
+_current_stats: ContextVar = ContextVar("sql_request_stats", default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Strip literals and collapse IN lists so repeated queries compare equal"""
+    statement = _LITERALS.sub("?", statement)
+    statement = _IN_LISTS.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class RequestQueryStats:
+    """Statements executed while handling one request"""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.repeats = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+        self.repeats[normalize_statement(statement)] += 1
+
+    def repeated_statement(self):
+        """(statement, count) of the most repeated statement if it crosses the N+1 threshold"""
+        if not self.repeats:
+            return None
+        statement, count = self.repeats.most_common(1)[0]
+        return (statement, count) if count > SQL_NPLUSONE_THRESHOLD else None
+
+
+class RouteQueryMetrics:
+    """Per-route aggregates of RequestQueryStats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: str, stats: RequestQueryStats, n_plus_one: bool):
+        with self._lock:
+            entry = self._routes.setdefault(route, {
+                "requests": 0,
+                "statements": 0,
+                "max_statements": 0,
+                "db_time_ms": 0.0,
+                "max_db_time_ms": 0.0,
+                "n_plus_one_requests": 0,
+                "slowest_statement_ms": 0.0,
+                "slowest_statement": None
+            })
+            db_time_ms = stats.db_time * 1000
+            entry["requests"] += 1
+            entry["statements"] += stats.statements
+            entry["max_statements"] = max(entry["max_statements"], stats.statements)
+            entry["db_time_ms"] += db_time_ms
+            entry["max_db_time_ms"] = max(entry["max_db_time_ms"], db_time_ms)
+            entry["n_plus_one_requests"] += int(n_plus_one)
+            if stats.slowest_time * 1000 > entry["slowest_statement_ms"]:
+                entry["slowest_statement_ms"] = stats.slowest_time * 1000
+                entry["slowest_statement"] = _WHITESPACE.sub(" ", stats.slowest_statement)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    **entry,
+                    "avg_statements": round(entry["statements"] / entry["requests"], 2),
+                    "avg_db_time_ms": round(entry["db_time_ms"] / entry["requests"], 3),
+                    "db_time_ms": round(entry["db_time_ms"], 3),
+                    "max_db_time_ms": round(entry["max_db_time_ms"], 3),
+                    "slowest_statement_ms": round(entry["slowest_statement_ms"], 3)
+                }
+                for route, entry in self._routes.items()
+            }
+
+
+route_metrics = RouteQueryMetrics()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    if elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, _WHITESPACE.sub(" ", statement))
+
+
+class SQLInstrumentationMiddleware:
+    """ASGI middleware collecting RequestQueryStats for every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    def _route_name(self, scope) -> str:
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        path = self._route_paths.get(scope.get("endpoint"), "<unmatched>")
+        return f"{scope['method']} {path}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and SQL_METRICS_HEADERS:
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-db-statements", str(stats.statements).encode()),
+                    (b"x-db-time-ms", f"{stats.db_time * 1000:.3f}".encode()),
+                    (b"x-db-slowest-ms", f"{stats.slowest_time * 1000:.3f}".encode()),
+                ]
+                repeated = stats.repeated_statement()
+                if repeated:
+                    headers.append((b"x-db-repeated-statement-count", str(repeated[1]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_stats.reset(token)
+            route = self._route_name(scope)
+            repeated = stats.repeated_statement()
+            if repeated:
+                logger.warning("Possible N+1 on %s: statement executed %d times: %s",
+                               route, repeated[1], repeated[0])
+            route_metrics.record(route, stats, n_plus_one=repeated is not None)
@@ -8,13 +8,22 @@ import os
 from uuid import uuid4
 
 from .database import get_db, SessionLocal, create_tables
-from .models import User, LearningCenter
+from .models import User, LearningCenter, CenterStats, CenterDailyStats, Session as SessionModel
 from .schemas import *
 from .auth import *
-from .routes import admin, manager, assistant, student
+from .stats import rebuild_stats
+from .analytics import analytics_snapshots
+from .response_cache import response_cache
+from .subjects import resolve_subject_id
+from .instrumentation import SQLInstrumentationMiddleware
+from .pagination import NEXT_CURSOR_HEADER
+from .routes import admin, manager, assistant, student, assistant_async, student_async
 
 app = FastAPI(title="Learning Center API")
 
+# Serve the async variants of the busiest student/assistant endpoints
+ASYNC_ROUTES = os.getenv("ASYNC_ROUTES", "false").lower() in ("1", "true", "yes")
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -32,13 +41,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Per-request SQL statement counts, DB time and N+1 detection
+app.add_middleware(SQLInstrumentationMiddleware)
+
 # Create uploads directory
 os.makedirs("uploads/photos", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
-# Include routes
+# Include routes (async variants first so they take precedence over the sync ones)
+if ASYNC_ROUTES:
+    app.include_router(assistant_async.router, prefix="/assistant", tags=["assistant"])
+    app.include_router(student_async.router, prefix="/student", tags=["student"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(manager.router, prefix="/manager", tags=["manager"])
 app.include_router(assistant.router, prefix="/assistant", tags=["assistant"])
@@ -69,9 +85,23 @@ def startup_event():
     finally:
         db.close()
 
+    # Backfill dashboard counters for databases created before they existed
+    db = SessionLocal()
+    try:
+        counters_missing = not db.query(CenterStats).first() or not db.query(CenterDailyStats).first()
+        if counters_missing and db.query(SessionModel).first():
+            rebuild_stats(db)
+            db.commit()
+            print("✅ Dashboard stats rebuilt")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding stats: {e}")
+    finally:
+        db.close()
+
 
 # Auth endpoints
-@app.post("/auth/login")
+@app.post("/auth/login", dependencies=[Depends(hashing_admission)])
 def login(request: LoginRequest, db: Session = Depends(get_db)):
     user = authenticate_user(db, request.phone, request.password, request.learning_center_id)
     if not user:
@@ -99,8 +129,8 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
     }
 
 
-@app.put("/auth/change-password")
-def change_password(request: ChangePasswordRequest, current_user: User = Depends(get_current_user),
+@app.put("/auth/change-password", dependencies=[Depends(hashing_admission)])
+def change_password(request: ChangePasswordRequest, current_user: User = Depends(get_current_user_row),
                     db: Session = Depends(get_db)):
     if not verify_password(request.current_password, current_user.password):
         raise HTTPException(
@@ -110,19 +140,21 @@ def change_password(request: ChangePasswordRequest, current_user: User = Depends
 
     current_user.password = get_password_hash(request.new_password)
     db.commit()
+    invalidate_user(current_user.id)
 
     return {"success": True, "message": "Parol muvaffaqiyatli o'zgartirildi"}
 
 
 @app.put("/auth/update-profile")
-def update_profile(request: UpdateProfileRequest, current_user: User = Depends(get_current_user),
+def update_profile(request: UpdateProfileRequest, current_user: User = Depends(get_current_user_row),
                    db: Session = Depends(get_db)):
     if request.fullname:
         current_user.fullname = request.fullname
     if request.subject_field:
-        current_user.subject_field = request.subject_field
+        current_user.subject_id = resolve_subject_id(db, current_user.learning_center_id, request.subject_field)
 
     db.commit()
+    invalidate_user(current_user.id)
     db.refresh(current_user)
 
     return {
@@ -137,7 +169,7 @@ def update_profile(request: UpdateProfileRequest, current_user: User = Depends(g
 
 
 @app.post("/auth/upload-photo")
-def upload_photo(file: UploadFile = File(...), current_user: User = Depends(get_current_user),
+def upload_photo(file: UploadFile = File(...), current_user: User = Depends(get_current_user_row),
                  db: Session = Depends(get_db)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(
@@ -155,6 +187,7 @@ def upload_photo(file: UploadFile = File(...), current_user: User = Depends(get_
     photo_url = f"/uploads/photos/{filename}"
     current_user.photo_url = photo_url
     db.commit()
+    invalidate_user(current_user.id)
 
     return {"photo_url": photo_url}
 
@@ -170,6 +203,9 @@ def reset_database_endpoint():
     from .database import reset_database
     try:
         reset_database()
+        principal_cache.clear()
+        analytics_snapshots.clear()
+        response_cache.clear()
         startup_event()  # Recreate admin
         return {"message": "Database reset successfully"}
     except Exception as e:
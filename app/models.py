@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Float, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Text, Float, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -30,13 +30,25 @@ class User(Base):
     password = Column(String, nullable=False)
     role = Column(String, nullable=False)  # admin, manager, assistant, student
     learning_center_id = Column(Integer, ForeignKey("learning_centers.id"), nullable=True)
-    subject_field = Column(String, nullable=True)  # Keep this for now to avoid migration issues
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=True, index=True)
     photo_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=func.now())
 
+    # selectin: one extra IN query per loaded batch, safe with GROUP BY queries and async sessions
+    subject = relationship("Subject", lazy="selectin")
     assistant_sessions = relationship("Session", foreign_keys="Session.assistant_id", back_populates="assistant")
     student_sessions = relationship("Session", foreign_keys="Session.student_id", back_populates="student")
 
+    __table_args__ = (
+        Index("ix_users_learning_center_id_role", "learning_center_id", "role"),
+        Index("ux_users_phone_learning_center_id", "phone", "learning_center_id", unique=True),
+    )
+
+    @property
+    def subject_field(self):
+        """Subject name, as the API has always exposed it"""
+        return self.subject.name if self.subject else None
+
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -47,12 +59,20 @@ class Session(Base):
     datetime = Column(DateTime, nullable=False)
     status = Column(String, default="booked")  # booked, completed, cancelled
     attendance = Column(String, nullable=True)  # present, absent
+    # Assistant's subject when booked; fixes the session's stats bucket. Not a foreign key, so the
+    # session keeps it after the subject is deleted
+    subject_id = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=func.now())
 
     student = relationship("User", foreign_keys=[student_id], back_populates="student_sessions")
     assistant = relationship("User", foreign_keys=[assistant_id], back_populates="assistant_sessions")
     rating = relationship("Rating", back_populates="session", uselist=False)
 
+    __table_args__ = (
+        Index("ix_sessions_assistant_id_datetime", "assistant_id", "datetime"),
+        Index("ix_sessions_student_id_datetime", "student_id", "datetime"),
+    )
+
 
 class Rating(Base):
     __tablename__ = "ratings"
@@ -69,6 +89,10 @@ class Rating(Base):
 
     session = relationship("Session", back_populates="rating")
 
+    __table_args__ = (
+        Index("ux_ratings_session_id", "session_id", unique=True),
+    )
+
 
 class Availability(Base):
     __tablename__ = "availability"
@@ -77,5 +101,110 @@ class Availability(Base):
     assistant_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(String, nullable=False)  # YYYY-MM-DD
     time_slot = Column(String, nullable=False)  # HH:MM
-    is_available = Column(String, default="available")  # available, booked, busy
-    created_at = Column(DateTime, default=func.now())
\ No newline at end of file
+    is_available = Column(String, default="available")  # available, booked, busy (blocks a rule slot)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        # One row per slot; booking relies on it for its compare-and-set UPDATE
+        Index("ux_availability_assistant_id_date_time_slot", "assistant_id", "date", "time_slot", unique=True),
+        # Slot search reads free slots in time order across assistants
+        Index("ix_availability_is_available_date_time_slot", "is_available", "date", "time_slot", "assistant_id"),
+    )
+
+
+# Weekly recurring hours, expanded on demand; only overrides (booked/busy/extra slots) live in availability
+class AvailabilityRule(Base):
+    __tablename__ = "availability_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    assistant_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    weekday = Column(Integer, nullable=False)  # 0 = Monday ... 6 = Sunday
+    start_time = Column(String, nullable=False)  # HH:MM
+    end_time = Column(String, nullable=False)  # HH:MM, last slot ends at or before it
+    slot_minutes = Column(Integer, nullable=False, default=60)
+    valid_from = Column(String, nullable=False)  # YYYY-MM-DD
+    valid_to = Column(String, nullable=True)  # YYYY-MM-DD, open-ended when NULL
+    created_at = Column(DateTime, default=func.now())
+
+    exceptions = relationship("AvailabilityRuleException", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_availability_rules_assistant_id_weekday", "assistant_id", "weekday"),
+    )
+
+
+class AvailabilityRuleException(Base):
+    __tablename__ = "availability_rule_exceptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, ForeignKey("availability_rules.id"), nullable=False)
+    date = Column(String, nullable=False)  # YYYY-MM-DD on which the rule does not apply
+
+    __table_args__ = (
+        Index("ux_availability_rule_exceptions_rule_id_date", "rule_id", "date", unique=True),
+    )
+
+class CenterStats(Base):
+    __tablename__ = "center_stats"
+
+    learning_center_id = Column(Integer, ForeignKey("learning_centers.id"), primary_key=True)
+    total_sessions = Column(Integer, nullable=False, default=0)
+    present_sessions = Column(Integer, nullable=False, default=0)
+    rating_total = Column(Integer, nullable=False, default=0)  # sum of all five dimensions
+    rating_count = Column(Integer, nullable=False, default=0)
+
+
+class CenterMonthlyStats(Base):
+    __tablename__ = "center_monthly_stats"
+
+    learning_center_id = Column(Integer, ForeignKey("learning_centers.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+
+
+class CenterHourlyStats(Base):
+    __tablename__ = "center_hourly_stats"
+
+    learning_center_id = Column(Integer, ForeignKey("learning_centers.id"), primary_key=True)
+    hour = Column(Integer, primary_key=True)  # 0-23
+    sessions = Column(Integer, nullable=False, default=0)
+
+
+# Daily rollup behind arbitrary-range trends and peak hours; subject is the one the session was booked under
+class CenterDailyStats(Base):
+    __tablename__ = "center_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    learning_center_id = Column(Integer, ForeignKey("learning_centers.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    hour = Column(Integer, nullable=False)  # 0-23
+    assistant_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    subject_id = Column(Integer, nullable=False, default=0)  # stats.NO_SUBJECT (0) when there is no subject
+    sessions = Column(Integer, nullable=False, default=0)
+    present_sessions = Column(Integer, nullable=False, default=0)
+    absent_sessions = Column(Integer, nullable=False, default=0)
+    rating_total = Column(Integer, nullable=False, default=0)  # sum of all five dimensions
+    rating_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Timeseries reads are one range scan over (center, day)
+        Index("ux_center_daily_stats_bucket", "learning_center_id", "day", "hour", "assistant_id", "subject_id",
+              unique=True),
+    )
+
+
+class AssistantStats(Base):
+    __tablename__ = "assistant_stats"
+
+    assistant_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    learning_center_id = Column(Integer, ForeignKey("learning_centers.id"), nullable=False, index=True)
+    total_sessions = Column(Integer, nullable=False, default=0)
+    present_sessions = Column(Integer, nullable=False, default=0)
+    rating_total = Column(Integer, nullable=False, default=0)  # sum of all five dimensions
+    rating_count = Column(Integer, nullable=False, default=0)
+    knowledge_total = Column(Integer, nullable=False, default=0)
+    communication_total = Column(Integer, nullable=False, default=0)
+    patience_total = Column(Integer, nullable=False, default=0)
+    engagement_total = Column(Integer, nullable=False, default=0)
+    problem_solving_total = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,109 @@
+"""Keyset (cursor) pagination shared by the list endpoints"""
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Existing frontends call list endpoints without limit/cursor and expect the full list
+LEGACY_UNPAGED_LISTS = os.getenv("LEGACY_UNPAGED_LISTS", "true").lower() in ("1", "true", "yes")
+
+
+def encode_cursor(values) -> str:
+    """Opaque cursor for the ordering values of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime and value is not None else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Noto'g'ri cursor qiymati"
+        )
+
+
+def _after(columns, values, descending: bool):
+    """Rows strictly after ``values`` in (columns) order, expanded for portability"""
+    conditions = []
+    for i, column in enumerate(columns):
+        beyond = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*[columns[j] == values[j] for j in range(i)], beyond))
+    return or_(*conditions)
+
+
+def _attribute_key(columns):
+    return lambda row: [getattr(row, column.key) for column in columns]
+
+
+def keyset(query, columns, cursor: str = None, limit: Optional[int] = None, descending: bool = False):
+    """Apply keyset ordering, the cursor filter and limit + 1 to a Query or select().
+
+    ``columns`` must end with a unique column (or be a distinct key) so the ordering is stable.
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    return query.limit(limit + 1) if limit else query
+
+
+def split_page(rows, limit: Optional[int], key):
+    """Cut the extra row fetched by keyset(); returns (rows, next_cursor or None)"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(key(rows[limit - 1]))
+
+
+def paginate(query, columns, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, descending: bool = False,
+             key=None):
+    """Fetch one page of a Query; returns (rows, next_cursor)"""
+    rows = keyset(query, columns, cursor, limit, descending).all()
+    return split_page(rows, limit, key or _attribute_key(columns))
+
+
+class PageParams:
+    """``cursor``/``limit`` query parameters of a list endpoint.
+
+    The body keeps its list shape; the cursor of the next page goes into the X-Next-Cursor header.
+    """
+
+    def __init__(
+            self,
+            response: Response,
+            cursor: Optional[str] = Query(None, description="Oldingi sahifadagi X-Next-Cursor qiymati"),
+            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+    ):
+        self.response = response
+        self.cursor = cursor
+        if limit is None and cursor is None and LEGACY_UNPAGED_LISTS:
+            self.limit = None
+        else:
+            self.limit = limit or DEFAULT_PAGE_SIZE
+
+    def keyset(self, query, columns, descending: bool = False):
+        return keyset(query, columns, self.cursor, self.limit, descending)
+
+    def finish(self, rows, key):
+        rows, next_cursor = split_page(rows, self.limit, key)
+        if next_cursor:
+            self.response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return rows
+
+    def paginate(self, query, columns, descending: bool = False, key=None):
+        return self.finish(self.keyset(query, columns, descending).all(), key or _attribute_key(columns))
@@ -0,0 +1,266 @@
+"""Cached responses of read-heavy endpoints, invalidated by the writes that change them.
+
+Entries are keyed by (route, learning center, query params) and remember the tables they were
+computed from. ORM flushes and bulk INSERT/UPDATE/DELETE statements on those tables record which
+center they touched; the matching entries are dropped when the transaction commits. Entries not
+tied to a center (admin lists) are dropped by a write in any center.
+
+Invalidation only reaches this process, so RESPONSE_CACHE_TTL_SECONDS bounds how stale another
+worker's copy can get.
+
+Concurrent identical requests are coalesced: one computes while the rest wait and share its body
+and headers (``coalesce``). Only requests that saw the same write generation share a computation,
+so a caller never receives a result started before its own committed write. Async routes get
+the same on their event loop (``coalesce_async``).
+
+Routes opt in with the ``cached_response`` decorator, which declares their key and tables once.
+"""
+
+import functools
+import inspect
+import os
+import threading
+from itertools import chain
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, attributes
+from .cache import TTLCache, SingleFlight
+from .pagination import NEXT_CURSOR_HEADER, PageParams
+from .models import (
+    LearningCenter, User, Subject, Session as SessionModel, Rating,
+    Availability, AvailabilityRule, AvailabilityRuleException
+)
+
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+# Response headers that are part of a cached response
+CACHED_HEADERS = (NEXT_CURSOR_HEADER,)
+
+# Writes to these tables invalidate responses
+TRACKED_MODELS = (
+    LearningCenter, User, Subject, SessionModel, Rating, Availability, AvailabilityRule, AvailabilityRuleException
+)
+TRACKED_TABLES = frozenset(model.__tablename__ for model in TRACKED_MODELS)
+
+# A write whose center is unknown (bulk statements outside a center user's request)
+ANY_CENTER = "*"
+
+MISSING = object()
+
+
+def _cached_headers(response) -> dict:
+    if response is None:
+        return {}
+    return {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+
+_PENDING_KEY = "response_cache_invalidations"
+
+
+class ResponseCache:
+    """LRU of (body, headers, tables) entries with write-driven invalidation"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl)
+        # Bumped by every invalidation; a response computed across one is not stored
+        self.generation = 0
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+
+    @staticmethod
+    def key(route: str, learning_center_id, **params) -> tuple:
+        return route, learning_center_id, tuple(sorted(params.items()))
+
+    def get(self, key, response=None):
+        """The cached body (restoring its headers on ``response``) or MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        body, headers, _ = entry
+        if response is not None:
+            response.headers.update(headers)
+        return body
+
+    def set(self, key, tables, body, generation: int, response=None):
+        """Store a body computed while ``generation`` was current, unless a write happened meanwhile"""
+        headers = _cached_headers(response)
+        with self._lock:
+            if generation == self.generation:
+                self._entries.set(key, (body, headers, frozenset(tables)))
+
+    def coalesce(self, key, compute, response=None):
+        """``compute()`` once for concurrent requests with the same key; the others wait and share its result"""
+        body, headers = self.flights.do((key, self.generation), lambda: (compute(), _cached_headers(response)))
+        if response is not None:
+            response.headers.update(headers)
+        return body
+
+    def get_or_compute(self, key, tables, compute, response=None):
+        body = self.get(key, response)
+        if body is MISSING:
+            generation = self.generation
+
+            def compute_and_store():
+                body = compute()
+                self.set(key, tables, body, generation, response)
+                return body
+
+            body = self.coalesce(key, compute_and_store, response)
+        return body
+
+    async def coalesce_async(self, key, compute, response=None):
+        """``coalesce`` for async routes: ``compute`` is a coroutine function, awaited once per key"""
+        async def compute_with_headers():
+            return await compute(), _cached_headers(response)
+
+        body, headers = await self.flights.do_async((key, self.generation), compute_with_headers)
+        if response is not None:
+            response.headers.update(headers)
+        return body
+
+    async def get_or_compute_async(self, key, tables, compute, response=None):
+        body = self.get(key, response)
+        if body is MISSING:
+            generation = self.generation
+
+            async def compute_and_store():
+                body = await compute()
+                self.set(key, tables, body, generation, response)
+                return body
+
+            body = await self.coalesce_async(key, compute_and_store, response)
+        return body
+
+    def invalidate(self, changes):
+        """Drop entries built from any of ``changes``: {(table, learning center id or ANY_CENTER)}"""
+        if not changes:
+            return
+        changed_anywhere = {table for table, _ in changes}
+        changed_centers = {(table, center) for table, center in changes if center != ANY_CENTER}
+        changed_everywhere = {table for table, center in changes if center == ANY_CENTER}
+
+        def affected(key, entry):
+            center, tables = key[1], entry[2]
+            if center is None:
+                return not tables.isdisjoint(changed_anywhere)
+            return not tables.isdisjoint(changed_everywhere) or any(
+                (table, center) in changed_centers for table in tables
+            )
+
+        with self._lock:
+            self.generation += 1
+            self._entries.invalidate_matching(affected)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+
+
+def cached_response(route: str, tables=None, params=(), extra=None, per_center: bool = True):
+    """Decorate a route handler so identical requests share one computation of its response.
+
+    The key is ``route``, the caller's learning center (``current_user``; None when not
+    ``per_center``), the handler arguments named in ``params``, the cursor and limit of a PageParams
+    argument and the values ``extra()`` returns. With ``tables`` the response is also cached until a
+    write to one of them; without, concurrent requests are only coalesced. Works on async handlers too.
+    """
+    def decorate(handler):
+        def key_and_response(kwargs):
+            values = {name: kwargs[name] for name in params}
+            response = None
+            page = next((value for value in kwargs.values() if isinstance(value, PageParams)), None)
+            if page is not None:
+                values.update(cursor=page.cursor, limit=page.limit)
+                response = page.response
+            if extra is not None:
+                values.update(extra())
+            center = kwargs["current_user"].learning_center_id if per_center else None
+            return response_cache.key(route, center, **values), response
+
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def cached_async(**kwargs):
+                key, response = key_and_response(kwargs)
+                compute = functools.partial(handler, **kwargs)
+                if tables is None:
+                    return await response_cache.coalesce_async(key, compute, response)
+                return await response_cache.get_or_compute_async(key, tables, compute, response)
+            return cached_async
+
+        @functools.wraps(handler)
+        def cached(**kwargs):
+            key, response = key_and_response(kwargs)
+            compute = functools.partial(handler, **kwargs)
+            if tables is None:
+                return response_cache.coalesce(key, compute, response)
+            return response_cache.get_or_compute(key, tables, compute, response)
+        return cached
+
+    return decorate
+
+
+# ---- write tracking ----
+
+def _user_center(session: Session, user_id: int):
+    """Learning center of a user, from the identity map when loaded (no SQL inside a flush otherwise)"""
+    user = session.identity_map.get(session.identity_key(User, user_id))
+    if user is not None and "learning_center_id" in attributes.instance_dict(user):
+        return user.learning_center_id
+    return session.connection().scalar(select(User.learning_center_id).where(User.id == user_id))
+
+
+def _center_of(session: Session, instance):
+    if isinstance(instance, LearningCenter):
+        return instance.id
+    if isinstance(instance, (User, Subject)):
+        return instance.learning_center_id
+    if isinstance(instance, (SessionModel, Availability, AvailabilityRule)):
+        return _user_center(session, instance.assistant_id)
+    if isinstance(instance, Rating):
+        return session.connection().scalar(
+            select(User.learning_center_id).join(SessionModel, SessionModel.assistant_id == User.id)
+            .where(SessionModel.id == instance.session_id)
+        )
+    return session.connection().scalar(  # AvailabilityRuleException
+        select(User.learning_center_id).join(AvailabilityRule, AvailabilityRule.assistant_id == User.id)
+        .where(AvailabilityRule.id == instance.rule_id)
+    )
+
+
+def _pending(session: Session) -> set:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed(session, flush_context):
+    pending = _pending(session)
+    for instance in chain(session.new, session.deleted, session.dirty):
+        if not isinstance(instance, TRACKED_MODELS):
+            continue
+        if instance in session.dirty and not session.is_modified(instance, include_collections=False):
+            continue
+        center = _center_of(session, instance)
+        pending.add((instance.__tablename__, ANY_CENTER if center is None else center))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.local_table.name not in TRACKED_TABLES:
+        return
+    # Bulk statements carry no instances; they run on behalf of the requesting user's center
+    center = orm_execute_state.session.info.get("learning_center_id")
+    _pending(orm_execute_state.session).add((mapper.local_table.name, ANY_CENTER if center is None else center))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    response_cache.invalidate(session.info.pop(_PENDING_KEY, None))
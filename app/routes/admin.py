@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from ..database import get_db
+from ..database import get_db, pool_monitor
+from ..instrumentation import route_metrics
+from ..pagination import PageParams
 from ..models import User, LearningCenter
 from ..schemas import LearningCenterCreate, UserCreate
-from ..auth import require_role, get_password_hash
+from ..auth import Principal, require_role, get_password_hash, invalidate_user, principal_cache, hashing_pool
+from ..analytics import analytics_snapshots
+from ..response_cache import response_cache, cached_response
 
 router = APIRouter()
 
@@ -12,7 +16,7 @@ router = APIRouter()
 @router.post("/users", response_model=dict)
 def create_manager(
         request: UserCreate,
-        current_user: User = Depends(require_role(["admin"])),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
     # Check if phone already exists
@@ -66,20 +70,26 @@ def create_manager(
 
 @router.get("/users")
 def get_managers(
-        current_user: User = Depends(require_role(["admin"])),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
-    managers = db.query(User).filter(User.role == "manager").all()
+    managers = page.paginate(
+        db.query(User, LearningCenter.name).outerjoin(
+            LearningCenter, LearningCenter.id == User.learning_center_id
+        ).filter(User.role == "manager"),
+        [User.id],
+        key=lambda row: [row[0].id]
+    )
 
     result = []
-    for manager in managers:
-        center = db.query(LearningCenter).filter(LearningCenter.id == manager.learning_center_id).first()
+    for manager, center_name in managers:
         result.append({
             "id": manager.id,
             "fullname": manager.fullname,
             "phone": manager.phone,
             "learning_center_id": manager.learning_center_id,
-            "learning_center_name": center.name if center else "N/A",
+            "learning_center_name": center_name or "N/A",
             "created_at": manager.created_at
         })
 
@@ -90,7 +100,7 @@ def get_managers(
 def update_manager(
         user_id: int,
         request: dict,
-        current_user: User = Depends(require_role(["admin"])),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
     manager = db.query(User).filter(User.id == user_id, User.role == "manager").first()
@@ -109,6 +119,7 @@ def update_manager(
         manager.learning_center_id = request["learning_center_id"]
 
     db.commit()
+    invalidate_user(user_id)
     db.refresh(manager)
 
     return {
@@ -120,7 +131,7 @@ def update_manager(
 @router.delete("/users/{user_id}")
 def delete_manager(
         user_id: int,
-        current_user: User = Depends(require_role(["admin"])),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
     manager = db.query(User).filter(User.id == user_id, User.role == "manager").first()
@@ -132,6 +143,7 @@ def delete_manager(
 
     db.delete(manager)
     db.commit()
+    invalidate_user(user_id)
 
     return {
         "success": True,
@@ -142,7 +154,7 @@ def delete_manager(
 @router.post("/learning-centers", response_model=dict)
 def create_learning_center(
         request: LearningCenterCreate,
-        current_user: User = Depends(require_role(["admin"])),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
     # Check if learning center name already exists
@@ -168,22 +180,28 @@ def create_learning_center(
 
 
 @router.get("/learning-centers")
+@cached_response("admin.learning_centers", ("learning_centers", "users"), per_center=False)
 def get_learning_centers(
-        current_user: User = Depends(require_role(["admin"])),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
-    centers = db.query(LearningCenter).all()
-    result = []
+    centers = page.paginate(
+        db.query(LearningCenter, func.count(User.id)).outerjoin(
+            User, User.learning_center_id == LearningCenter.id
+        ).group_by(LearningCenter.id),
+        [LearningCenter.id],
+        key=lambda row: [row[0].id]
+    )
 
-    for center in centers:
-        total_users = db.query(func.count(User.id)).filter(User.learning_center_id == center.id).scalar()
+    result = []
+    for center, total_users in centers:
         result.append({
             "id": center.id,
             "name": center.name,
             "total_users": total_users,
             "created_date": center.created_at.strftime("%d.%m.%Y") if center.created_at else "N/A"
         })
-
     return result
 
 
@@ -191,7 +209,7 @@ def get_learning_centers(
 def update_learning_center(
         center_id: int,
         request: dict,
-        current_user: User = Depends(require_role(["admin"])),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
     center = db.query(LearningCenter).filter(LearningCenter.id == center_id).first()
@@ -216,7 +234,7 @@ def update_learning_center(
 @router.delete("/learning-centers/{center_id}")
 def delete_learning_center(
         center_id: int,
-        current_user: User = Depends(require_role(["admin"])),
+        current_user: Principal = Depends(require_role(["admin"])),
         db: Session = Depends(get_db)
 ):
     center = db.query(LearningCenter).filter(LearningCenter.id == center_id).first()
@@ -240,4 +258,21 @@ def delete_learning_center(
     return {
         "success": True,
         "message": "O'quv markaz muvaffaqiyatli o'chirildi"
-    }
\ No newline at end of file
+    }
+
+
+# =============== METRICS ===============
+
+@router.get("/metrics")
+def get_metrics(
+        current_user: Principal = Depends(require_role(["admin"]))
+):
+    return {
+        "principal_cache": principal_cache.stats(),
+        "analytics_snapshots": analytics_snapshots.stats(),
+        "response_cache": response_cache.stats(),
+        "request_coalescing": response_cache.flights.stats(),
+        "password_hashing": hashing_pool.stats(),
+        "db_pool": pool_monitor.stats(),
+        "sql": route_metrics.stats()
+    }
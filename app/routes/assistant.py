@@ -1,80 +1,246 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
 from ..database import get_db
-from ..models import User, Availability, Session as SessionModel
-from ..schemas import AvailabilityCreate
-from ..auth import require_role
+from ..models import User, Availability, AvailabilityRule, AvailabilityRuleException, Session as SessionModel
+from ..schemas import AvailabilityCreate, AvailabilityBulkCreate, AvailabilityRuleCreate, AvailabilityRuleExceptionsCreate
+from ..auth import Principal, require_role
+from ..stats import record_attendance
+from ..pagination import PageParams, decode_cursor
+from ..availability import (
+    DATE_FORMAT, rule_window, parse_date, validate_rule, rules_statement, collect_rules, expand_rules,
+    build_day_bitmaps, desired_slot_rows, upsert_slots
+)
 
 router = APIRouter()
 
 
 @router.post("/availability")
 def set_availability(
-        request: AvailabilityCreate,
-        current_user: User = Depends(require_role(["assistant"])),
+        request: Union[AvailabilityBulkCreate, AvailabilityCreate],
+        current_user: Principal = Depends(require_role(["assistant"])),
         db: Session = Depends(get_db)
 ):
-    # Delete existing availability for this date
-    db.query(Availability).filter(
+    # One date, or a week of dates in one transaction; a repeated date keeps its last slot list
+    days = request.days if isinstance(request, AvailabilityBulkCreate) else [request]
+    wanted = {day.date: dict.fromkeys(day.time_slots) for day in days}
+    if not wanted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Kamida bitta sana kerak"
+        )
+    parsed_dates = [parse_date(day_key) for day_key in wanted]
+
+    window = (min(parsed_dates), max(parsed_dates))
+    rules = collect_rules(db.execute(
+        rules_statement([AvailabilityRule.assistant_id == current_user.id], *window)
+    ).all())
+    rule_days = expand_rules(rules, *window).get(current_user.id, {})
+
+    existing = {}
+    for row_id, slot_date, time_slot, is_available in db.query(
+            Availability.id, Availability.date, Availability.time_slot, Availability.is_available
+    ).filter(
         Availability.assistant_id == current_user.id,
-        Availability.date == request.date
-    ).delete()
-
-    # Add new time slots
-    for time_slot in request.time_slots:
-        availability = Availability(
-            assistant_id=current_user.id,
-            date=request.date,
-            time_slot=time_slot,
-            is_available="available"
+        Availability.date.in_(wanted)
+    ):
+        existing.setdefault(slot_date, {})[time_slot] = (row_id, is_available)
+
+    # Store only the difference from the weekly rules and leave booked slots alone
+    upserts, deletes = [], []
+    for day_key, time_slots in wanted.items():
+        day_upserts, day_deletes = desired_slot_rows(
+            current_user.id, day_key, time_slots, rule_days.get(day_key, 0), existing.get(day_key, {})
         )
-        db.add(availability)
+        upserts += day_upserts
+        deletes += day_deletes
+
+    if deletes:
+        db.query(Availability).filter(
+            Availability.id.in_(deletes),
+            Availability.is_available != "booked"
+        ).delete(synchronize_session=False)
+    upsert_slots(db, upserts)
 
     db.commit()
 
+    if len(wanted) == 1:
+        message = f"{next(iter(wanted))} sanasi uchun jadval muvaffaqiyatli saqlandi"
+    else:
+        message = f"{len(wanted)} kun uchun jadval muvaffaqiyatli saqlandi"
     return {
         "success": True,
-        "message": f"{request.date} sanasi uchun jadval muvaffaqiyatli saqlandi"
+        "message": message
     }
 
 
 @router.get("/availability")
 def get_availability(
-        current_user: User = Depends(require_role(["assistant"])),
+        date_from: Optional[date] = Query(None, description="YYYY-MM-DD, shu kundan boshlab"),
+        date_to: Optional[date] = Query(None, description="YYYY-MM-DD, shu kungacha (shu kun ham)"),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["assistant"])),
         db: Session = Depends(get_db)
 ):
-    availability = db.query(Availability).filter(
-        Availability.assistant_id == current_user.id
+    filters = [Availability.assistant_id == current_user.id]
+    if date_from:
+        filters.append(Availability.date >= date_from.strftime(DATE_FORMAT))
+    if date_to:
+        filters.append(Availability.date <= date_to.strftime(DATE_FORMAT))
+
+    # Dates come from stored slots (one page plus one, in SQL) and from the weekly rules expanded
+    # over the window; a date's slots never split across pages
+    stored_dates = db.execute(
+        page.keyset(select(Availability.date).where(*filters).distinct(), [Availability.date])
+    ).scalars().all()
+
+    window = rule_window(date_from, date_to)
+    rules = collect_rules(db.execute(
+        rules_statement([AvailabilityRule.assistant_id == current_user.id], *window)
+    ).all())
+    rule_days = expand_rules(rules, *window).get(current_user.id, {})
+    after = decode_cursor(page.cursor, [Availability.date])[0] if page.cursor else None
+
+    page_dates = sorted(set(stored_dates) | {day for day in rule_days if after is None or day > after})
+    if page.limit:
+        page_dates = page_dates[:page.limit + 1]
+    if not page_dates:
+        return []
+
+    overrides = db.query(Availability.date, Availability.time_slot, Availability.is_available).filter(
+        *filters,
+        Availability.date >= page_dates[0],
+        Availability.date <= page_dates[-1]
     ).all()
+    days = build_day_bitmaps({day: rule_days.get(day, 0) for day in page_dates}, overrides)
 
-    # Group by date
-    dates = {}
-    for slot in availability:
-        if slot.date not in dates:
-            dates[slot.date] = {"available_slots": [], "booked_slots": []}
+    result = [
+        {"date": day, "available_slots": bitmap.free_slots(), "booked_slots": bitmap.booked_slots()}
+        for day, bitmap in days.items()
+    ]
+    result = page.finish(result, key=lambda day: [day["date"]])
+    return [day for day in result if day["available_slots"] or day["booked_slots"]]
 
-        if slot.is_available == "available":
-            dates[slot.date]["available_slots"].append(slot.time_slot)
-        else:
-            dates[slot.date]["booked_slots"].append(slot.time_slot)
 
-    result = []
-    for date, slots in dates.items():
-        result.append({
-            "date": date,
-            "available_slots": slots["available_slots"],
-            "booked_slots": slots["booked_slots"]
-        })
+def format_availability_rule(rule: AvailabilityRule) -> dict:
+    return {
+        "id": rule.id,
+        "weekday": rule.weekday,
+        "start_time": rule.start_time,
+        "end_time": rule.end_time,
+        "slot_minutes": rule.slot_minutes,
+        "valid_from": rule.valid_from,
+        "valid_to": rule.valid_to,
+        "exceptions": sorted(exception.date for exception in rule.exceptions)
+    }
+
+
+def get_own_rule(db: Session, assistant_id: int, rule_id: int) -> AvailabilityRule:
+    rule = db.query(AvailabilityRule).filter(
+        AvailabilityRule.id == rule_id,
+        AvailabilityRule.assistant_id == assistant_id
+    ).first()
+
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Haftalik jadval topilmadi"
+        )
+    return rule
 
-    return result
+
+@router.post("/availability/rules")
+def create_availability_rule(
+        request: AvailabilityRuleCreate,
+        current_user: Principal = Depends(require_role(["assistant"])),
+        db: Session = Depends(get_db)
+):
+    valid_from = request.valid_from or date.today().strftime(DATE_FORMAT)
+    validate_rule(request.weekday, request.start_time, request.end_time, request.slot_minutes,
+                  valid_from, request.valid_to, request.exceptions)
+
+    rule = AvailabilityRule(
+        assistant_id=current_user.id,
+        weekday=request.weekday,
+        start_time=request.start_time,
+        end_time=request.end_time,
+        slot_minutes=request.slot_minutes,
+        valid_from=valid_from,
+        valid_to=request.valid_to,
+        exceptions=[AvailabilityRuleException(date=day) for day in dict.fromkeys(request.exceptions)]
+    )
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+
+    return {
+        "success": True,
+        "message": "Haftalik jadval muvaffaqiyatli saqlandi",
+        "rule": format_availability_rule(rule)
+    }
+
+
+@router.get("/availability/rules")
+def get_availability_rules(
+        current_user: Principal = Depends(require_role(["assistant"])),
+        db: Session = Depends(get_db)
+):
+    rules = db.query(AvailabilityRule).options(selectinload(AvailabilityRule.exceptions)).filter(
+        AvailabilityRule.assistant_id == current_user.id
+    ).order_by(AvailabilityRule.weekday, AvailabilityRule.start_time, AvailabilityRule.id).all()
+
+    return [format_availability_rule(rule) for rule in rules]
+
+
+@router.post("/availability/rules/{rule_id}/exceptions")
+def add_availability_rule_exceptions(
+        rule_id: int,
+        request: AvailabilityRuleExceptionsCreate,
+        current_user: Principal = Depends(require_role(["assistant"])),
+        db: Session = Depends(get_db)
+):
+    rule = get_own_rule(db, current_user.id, rule_id)
+    for day in request.dates:
+        parse_date(day)
+
+    existing = {exception.date for exception in rule.exceptions}
+    for day in dict.fromkeys(request.dates):
+        if day not in existing:
+            rule.exceptions.append(AvailabilityRuleException(date=day))
+
+    db.commit()
+    db.refresh(rule)
+
+    return {
+        "success": True,
+        "message": "Istisno kunlar saqlandi",
+        "rule": format_availability_rule(rule)
+    }
+
+
+@router.delete("/availability/rules/{rule_id}")
+def delete_availability_rule(
+        rule_id: int,
+        current_user: Principal = Depends(require_role(["assistant"])),
+        db: Session = Depends(get_db)
+):
+    # Slots already booked from the rule stay in availability
+    db.delete(get_own_rule(db, current_user.id, rule_id))
+    db.commit()
+
+    return {
+        "success": True,
+        "message": "Haftalik jadval o'chirildi"
+    }
 
 
 @router.get("/sessions/{date}/{time}")
 def get_sessions_by_time(
         date: str = Path(...),
         time: str = Path(...),
-        current_user: User = Depends(require_role(["assistant"])),
+        current_user: Principal = Depends(require_role(["assistant"])),
         db: Session = Depends(get_db)
 ):
     # Parse datetime
@@ -109,7 +275,7 @@ def get_sessions_by_time(
 def mark_attendance(
         session_id: int,
         attendance_data: dict,
-        current_user: User = Depends(require_role(["assistant"])),
+        current_user: Principal = Depends(require_role(["assistant"])),
         db: Session = Depends(get_db)
 ):
     # Find session by ID and verify it belongs to current assistant
@@ -131,8 +297,10 @@ def mark_attendance(
             detail="Davomat 'present' yoki 'absent' bo'lishi kerak"
         )
 
+    previous_attendance = session.attendance
     session.attendance = attendance
     session.status = "completed"
+    record_attendance(db, session, previous_attendance, current_user.learning_center_id)
     db.commit()
 
     return {
@@ -141,43 +309,46 @@ def mark_attendance(
     }
 
 
-@router.get("/sessions")
-def get_sessions(
-        status: str = Query("upcoming", description="upcoming yoki past"),
-        current_user: User = Depends(require_role(["assistant"])),
-        db: Session = Depends(get_db)
-):
-    now = datetime.now()
-
-    if status == "upcoming":
-        sessions = db.query(SessionModel).filter(
-            SessionModel.assistant_id == current_user.id,
-            SessionModel.datetime >= now
-        ).all()
-    else:
-        sessions = db.query(SessionModel).filter(
-            SessionModel.assistant_id == current_user.id,
-            SessionModel.datetime < now
-        ).all()
-
-    # Group sessions by date and time
-    grouped_sessions = {}
-
-    for session in sessions:
-        student = db.query(User).filter(User.id == session.student_id).first()
-        date_str = session.datetime.strftime("%Y-%m-%d")
-        time_str = session.datetime.strftime("%H:%M")
-        key = f"{date_str}_{time_str}"
+def assistant_sessions_query(assistant_id: int, status: str, page: PageParams,
+                             date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Assistant's sessions joined to their students for one page of session times, in display order.
 
-        if key not in grouped_sessions:
-            grouped_sessions[key] = {
+    ``date_from``/``date_to`` bound the session dates inclusively on top of the upcoming/past split.
+    """
+    now = datetime.now()
+    time_filter = SessionModel.datetime >= now if status == "upcoming" else SessionModel.datetime < now
+    filters = [SessionModel.assistant_id == assistant_id, time_filter]
+    if date_from:
+        filters.append(SessionModel.datetime >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        filters.append(SessionModel.datetime < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    # Page over distinct session times so a group never splits across pages
+    page_times = page.keyset(
+        select(SessionModel.datetime).where(*filters).distinct(),
+        [SessionModel.datetime]
+    ).subquery()
+
+    return select(SessionModel, User).join(
+        page_times, page_times.c.datetime == SessionModel.datetime
+    ).join(
+        User, User.id == SessionModel.student_id
+    ).where(*filters).order_by(SessionModel.datetime, SessionModel.id)
+
+
+def group_assistant_sessions(rows):
+    """Group (session, student) rows sorted by datetime into (datetime, group) pairs in one pass"""
+    groups = []
+    for session, student in rows:
+        if not groups or groups[-1][0] != session.datetime:
+            groups.append((session.datetime, {
                 "id": session.id,
-                "date": date_str,
-                "time": time_str,
+                "date": session.datetime.strftime("%Y-%m-%d"),
+                "time": session.datetime.strftime("%H:%M"),
                 "students": []
-            }
+            }))
 
-        grouped_sessions[key]["students"].append({
+        groups[-1][1]["students"].append({
             "id": student.id,
             "student_id": student.id,
             "name": student.fullname,
@@ -189,9 +360,21 @@ def get_sessions(
             "attendance": session.attendance or "kutilmoqda"
         })
 
-    result = list(grouped_sessions.values())
+    return groups
+
 
-    # Sort by datetime
-    result.sort(key=lambda x: datetime.strptime(f"{x['date']} {x['time']}", "%Y-%m-%d %H:%M"))
+def finish_session_groups(page: PageParams, groups):
+    return [group for _, group in page.finish(groups, key=lambda pair: [pair[0]])]
 
-    return result
\ No newline at end of file
+
+@router.get("/sessions")
+def get_sessions(
+        status: str = Query("upcoming", description="upcoming yoki past"),
+        date_from: Optional[date] = Query(None, description="YYYY-MM-DD, shu kundan boshlab"),
+        date_to: Optional[date] = Query(None, description="YYYY-MM-DD, shu kungacha (shu kun ham)"),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["assistant"])),
+        db: Session = Depends(get_db)
+):
+    rows = db.execute(assistant_sessions_query(current_user.id, status, page, date_from, date_to)).all()
+    return finish_session_groups(page, group_assistant_sessions(rows))
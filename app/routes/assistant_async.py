@@ -0,0 +1,28 @@
+"""Async variants of the busiest assistant endpoints (enabled with ASYNC_ROUTES=true).
+
+Responses match app/routes/assistant.py exactly.
+"""
+
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..auth import Principal, require_role_async
+from ..pagination import PageParams
+from .assistant import assistant_sessions_query, group_assistant_sessions, finish_session_groups
+
+router = APIRouter()
+
+
+@router.get("/sessions")
+async def get_sessions_async(
+        status: str = Query("upcoming", description="upcoming yoki past"),
+        date_from: Optional[date] = Query(None, description="YYYY-MM-DD, shu kundan boshlab"),
+        date_to: Optional[date] = Query(None, description="YYYY-MM-DD, shu kungacha (shu kun ham)"),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role_async(["assistant"])),
+        db: AsyncSession = Depends(get_async_db)
+):
+    rows = (await db.execute(assistant_sessions_query(current_user.id, status, page, date_from, date_to))).all()
+    return finish_session_groups(page, group_assistant_sessions(rows))
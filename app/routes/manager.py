@@ -1,21 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, desc
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, desc, case
+from datetime import date, datetime, timedelta
+from typing import Optional
 from ..database import get_db
-from ..models import User, Session as SessionModel, Rating, Subject, Availability
+from ..models import (
+    User, Session as SessionModel, Rating, Subject, Availability,
+    CenterStats, CenterMonthlyStats, CenterHourlyStats, CenterDailyStats, AssistantStats
+)
 from ..schemas import UserCreate, ChangePasswordRequest
-from ..auth import require_role, get_password_hash
+from ..auth import Principal, require_role, get_password_hash, get_password_hashes, invalidate_user
+from ..pagination import PageParams
+from ..stats import (
+    RATING_POINTS, RATING_DIMENSIONS, ASSISTANT_AVG_RATING, TIMESERIES_GRANULARITIES, period_start, period_count,
+    period_starts
+)
+from ..subjects import resolve_subject_id, subject_ids_by_name
+from ..user_import import import_format, read_import_rows, import_chunks, validate_import_rows, insert_import_chunk
+from ..export import EXPORT_MEDIA_TYPES, stream_session_export
+from ..analytics import center_snapshot
+from ..availability import offered_slot_counts
+from ..response_cache import cached_response
 
 router = APIRouter()
 
+# Upper bound on the points one timeseries request may return
+TIMESERIES_MAX_POINTS = 1000
+# Fill rate expands availability day by day, so its range is capped
+FILL_RATE_MAX_DAYS = 92
+# The stats rollups change together with these tables (app/stats.py), so they key the cached overview
+STATS_TABLES = ("users", "subjects", "sessions", "ratings")
+
 
 # =============== USERS MANAGEMENT ===============
 
 @router.post("/users")
 def create_user(
         request: UserCreate,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     # Check if phone already exists in this learning center
@@ -36,13 +59,15 @@ def create_user(
             detail="Faqat yordamchi yoki talaba hisobi yaratish mumkin"
         )
 
+    subject_id = resolve_subject_id(db, current_user.learning_center_id, request.subject_field)
+
     user = User(
         fullname=request.fullname,
         phone=request.phone,
         password=get_password_hash(request.password),
         role=request.role,
         learning_center_id=current_user.learning_center_id,
-        subject_field=request.subject_field
+        subject_id=subject_id
     )
 
     db.add(user)
@@ -56,10 +81,50 @@ def create_user(
     }
 
 
+@router.post("/users/import")
+def import_users(
+        file: UploadFile = File(...),
+        format: Optional[str] = Query(None, description="csv yoki ndjson; bo'lmasa fayl nomidan aniqlanadi"),
+        current_user: Principal = Depends(require_role(["manager"])),
+        db: Session = Depends(get_db)
+):
+    """Create many assistants/students from a CSV or NDJSON upload, committed chunk by chunk as it is read.
+
+    Valid rows are created; invalid ones, and rows whose phone another request registered meanwhile,
+    are reported back with their row numbers.
+    """
+    subjects = subject_ids_by_name(db, current_user.learning_center_id)
+    first_row_by_phone = {}
+    created, errors = 0, []
+
+    for chunk in import_chunks(read_import_rows(file, import_format(file, format))):
+        valid, chunk_errors = validate_import_rows(
+            db, current_user.learning_center_id, chunk, subjects, first_row_by_phone
+        )
+        password_hashes = get_password_hashes([values["password"] for _, values in valid])
+        for (_, values), password_hash in zip(valid, password_hashes):
+            values["password"] = password_hash
+
+        conflicts = insert_import_chunk(db, valid)
+        created += len(valid) - len(conflicts)
+        errors.extend(sorted(chunk_errors + conflicts, key=lambda error: error["row"]))
+
+    return {
+        "success": True,
+        "message": f"{created} ta foydalanuvchi yaratildi",
+        "created": created,
+        "failed": len(errors),
+        "errors": errors
+    }
+
+
+# Not cached (student totals are read live), but identical concurrent requests share one query
 @router.get("/users")
+@cached_response("manager.users", params=("role",))
 def get_users(
         role: str = Query(..., description="assistant yoki student"),
-        current_user: User = Depends(require_role(["manager"])),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     if role not in ["assistant", "student"]:
@@ -68,57 +133,52 @@ def get_users(
             detail="Faqat assistant yoki student roli mumkin"
         )
 
-    users = db.query(User).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        User.role == role
-    ).all()
+    if role == "assistant":
+        # Assistants read the counters maintained on write in AssistantStats
+        query = db.query(
+            User,
+            ASSISTANT_AVG_RATING.label("avg_rating"),
+            func.coalesce(AssistantStats.total_sessions, 0).label("total_sessions")
+        ).outerjoin(AssistantStats, AssistantStats.assistant_id == User.id)
+    else:
+        query = db.query(
+            User,
+            func.avg(RATING_POINTS / 5.0).label("avg_rating"),
+            func.count(func.distinct(SessionModel.id)).label("total_sessions")
+        ).outerjoin(SessionModel, SessionModel.student_id == User.id).outerjoin(
+            Rating, Rating.session_id == SessionModel.id
+        ).group_by(User.id)
+
+    users = page.paginate(
+        query.filter(
+            User.learning_center_id == current_user.learning_center_id,
+            User.role == role
+        ),
+        [User.id],
+        key=lambda row: [row[0].id]
+    )
 
     result = []
-    for user in users:
-        # Calculate stats based on role
-        if role == "assistant":
-            # Average rating received
-            avg_rating = db.query(
-                func.avg((Rating.knowledge + Rating.communication + Rating.patience +
-                          Rating.engagement + Rating.problem_solving) / 5.0)
-            ).join(SessionModel).filter(SessionModel.assistant_id == user.id).scalar() or 0
-
-            # Total sessions given
-            total_sessions = db.query(func.count(SessionModel.id)).filter(
-                SessionModel.assistant_id == user.id
-            ).scalar()
-
-        else:  # student
-            # Average rating given by student
-            avg_rating = db.query(
-                func.avg((Rating.knowledge + Rating.communication + Rating.patience +
-                          Rating.engagement + Rating.problem_solving) / 5.0)
-            ).join(SessionModel).filter(SessionModel.student_id == user.id).scalar() or 0
-
-            # Total sessions attended
-            total_sessions = db.query(func.count(SessionModel.id)).filter(
-                SessionModel.student_id == user.id
-            ).scalar()
-
+    for user, avg_rating, total_sessions in users:
         result.append({
             "id": user.id,
             "fullname": user.fullname,
             "phone": user.phone,
             "subject_field": user.subject_field,
             "photo_url": user.photo_url,
-            "avg_rating": round(avg_rating, 2),
+            "avg_rating": round(avg_rating or 0, 2),
             "total_sessions": total_sessions,
             "created_at": user.created_at.strftime("%d.%m.%Y") if user.created_at else "N/A",
             "active_status": "faol"
         })
-
     return result
 
 
 @router.get("/users/{user_id}")
 def get_user_detail(
         user_id: int,
-        current_user: User = Depends(require_role(["manager"])),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(
@@ -133,41 +193,43 @@ def get_user_detail(
             detail="Foydalanuvchi topilmadi"
         )
 
-    # Get sessions based on role
+    # Sessions on the user's side, with the other participant shown in the history
     if user.role == "assistant":
-        sessions = db.query(SessionModel).filter(SessionModel.assistant_id == user.id).all()
+        user_filter = SessionModel.assistant_id == user.id
+        related_user = SessionModel.student
     else:
-        sessions = db.query(SessionModel).filter(SessionModel.student_id == user.id).all()
+        user_filter = SessionModel.student_id == user.id
+        related_user = SessionModel.assistant
+
+    # Overall stats in one aggregate query
+    summary = db.query(
+        func.count(SessionModel.id),
+        func.sum(case((SessionModel.status == "completed", 1), else_=0)),
+        func.avg(RATING_POINTS / 5.0)
+    ).outerjoin(Rating, Rating.session_id == SessionModel.id).filter(user_filter).one()
+    total_sessions, completed_sessions, avg_rating = summary
+
+    # Newest sessions first, one page at a time, with related user and rating loaded in the same query
+    sessions = page.paginate(
+        db.query(SessionModel).options(
+            joinedload(related_user), joinedload(SessionModel.rating)
+        ).filter(user_filter),
+        [SessionModel.datetime, SessionModel.id],
+        descending=True
+    )
 
-    # Format sessions
     session_list = []
-    total_rating = 0
-    rating_count = 0
-
     for session in sessions:
-        # Get related user (student if user is assistant, assistant if user is student)
-        if user.role == "assistant":
-            related_user = db.query(User).filter(User.id == session.student_id).first()
-        else:
-            related_user = db.query(User).filter(User.id == session.assistant_id).first()
-
-        # Get rating
-        rating = db.query(Rating).filter(Rating.session_id == session.id).first()
-        session_rating = None
-        if rating:
-            avg_rating = (rating.knowledge + rating.communication + rating.patience +
-                          rating.engagement + rating.problem_solving) / 5.0
-            session_rating = round(avg_rating, 2)
-            total_rating += avg_rating
-            rating_count += 1
+        related = session.student if user.role == "assistant" else session.assistant
+        rating = session.rating
 
         session_list.append({
             "id": session.id,
             "datetime": session.datetime.strftime("%d.%m.%Y %H:%M"),
-            "related_user_name": related_user.fullname if related_user else "N/A",
+            "related_user_name": related.fullname if related else "N/A",
             "attendance": session.attendance or "kutilmoqda",
             "status": session.status,
-            "rating": session_rating,
+            "rating": round(_rating_average(rating), 2) if rating else None,
             "rating_details": {
                 "knowledge": rating.knowledge,
                 "communication": rating.communication,
@@ -178,9 +240,6 @@ def get_user_detail(
             } if rating else None
         })
 
-    # Calculate overall stats
-    avg_rating = round(total_rating / rating_count, 2) if rating_count > 0 else 0
-
     return {
         "id": user.id,
         "fullname": user.fullname,
@@ -189,18 +248,23 @@ def get_user_detail(
         "subject_field": user.subject_field,
         "photo_url": user.photo_url,
         "created_at": user.created_at.strftime("%d.%m.%Y") if user.created_at else "N/A",
-        "avg_rating": avg_rating,
-        "total_sessions": len(sessions),
-        "completed_sessions": len([s for s in sessions if s.status == "completed"]),
-        "sessions": sorted(session_list, key=lambda x: datetime.strptime(x["datetime"], "%d.%m.%Y %H:%M"), reverse=True)
+        "avg_rating": round(avg_rating, 2) if avg_rating is not None else 0,
+        "total_sessions": total_sessions,
+        "completed_sessions": completed_sessions or 0,
+        "sessions": session_list
     }
 
 
+def _rating_average(rating: Rating) -> float:
+    return (rating.knowledge + rating.communication + rating.patience +
+            rating.engagement + rating.problem_solving) / 5.0
+
+
 @router.put("/users/{user_id}")
 def update_user(
         user_id: int,
         request: dict,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(
@@ -232,9 +296,10 @@ def update_user(
             )
         user.phone = request["phone"]
     if "subject_field" in request:
-        user.subject_field = request["subject_field"]
+        user.subject_id = resolve_subject_id(db, current_user.learning_center_id, request["subject_field"])
 
     db.commit()
+    invalidate_user(user_id)
     db.refresh(user)
 
     return {
@@ -246,7 +311,7 @@ def update_user(
 @router.delete("/users/{user_id}")
 def delete_user(
         user_id: int,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(
@@ -274,6 +339,7 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
 
     return {
         "success": True,
@@ -285,7 +351,7 @@ def delete_user(
 def change_user_password(
         user_id: int,
         request: dict,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(
@@ -308,6 +374,7 @@ def change_user_password(
 
     user.password = get_password_hash(request["new_password"])
     db.commit()
+    invalidate_user(user_id)
 
     return {
         "success": True,
@@ -320,7 +387,7 @@ def change_user_password(
 @router.post("/subjects")
 def create_subject(
         request: dict,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     if "name" not in request:
@@ -358,45 +425,42 @@ def create_subject(
 
 
 @router.get("/subjects")
+@cached_response("manager.subjects", ("subjects", "users"))
 def get_subjects(
-        current_user: User = Depends(require_role(["manager"])),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
-    subjects = db.query(Subject).filter(
-        Subject.learning_center_id == current_user.learning_center_id
-    ).all()
-
-    result = []
-    for subject in subjects:
-        # Count assistants and students for this subject
-        assistant_count = db.query(func.count(User.id)).filter(
-            User.learning_center_id == current_user.learning_center_id,
-            User.role == "assistant",
-            User.subject_field == subject.name
-        ).scalar()
-
-        student_count = db.query(func.count(User.id)).filter(
-            User.learning_center_id == current_user.learning_center_id,
-            User.role == "student",
-            User.subject_field == subject.name
-        ).scalar()
+    # Assistant and student counts per subject in one grouped query
+    subjects = page.paginate(
+        db.query(
+            Subject,
+            func.count(case((User.role == "assistant", User.id))).label("assistant_count"),
+            func.count(case((User.role == "student", User.id))).label("student_count")
+        ).outerjoin(User, User.subject_id == Subject.id).filter(
+            Subject.learning_center_id == current_user.learning_center_id
+        ).group_by(Subject.id),
+        [Subject.id],
+        key=lambda row: [row[0].id]
+    )
 
-        result.append({
+    return [
+        {
             "id": subject.id,
             "name": subject.name,
             "assistant_count": assistant_count,
             "student_count": student_count,
             "created_at": subject.created_at.strftime("%d.%m.%Y") if subject.created_at else "N/A"
-        })
-
-    return result
+        }
+        for subject, assistant_count, student_count in subjects
+    ]
 
 
 @router.put("/subjects/{subject_id}")
 def update_subject(
         subject_id: int,
         request: dict,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     subject = db.query(Subject).filter(
@@ -424,15 +488,9 @@ def update_subject(
                 detail="Bu fan nomi allaqachon mavjud"
             )
 
-        old_name = subject.name
+        # Users reference the subject by id, so a rename touches this row only
         subject.name = request["name"]
 
-        # Update all users with this subject
-        db.query(User).filter(
-            User.learning_center_id == current_user.learning_center_id,
-            User.subject_field == old_name
-        ).update({"subject_field": request["name"]})
-
     db.commit()
     db.refresh(subject)
 
@@ -445,7 +503,7 @@ def update_subject(
 @router.delete("/subjects/{subject_id}")
 def delete_subject(
         subject_id: int,
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
     subject = db.query(Subject).filter(
@@ -460,10 +518,7 @@ def delete_subject(
         )
 
     # Check if any users are assigned to this subject
-    user_count = db.query(func.count(User.id)).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        User.subject_field == subject.name
-    ).scalar()
+    user_count = db.query(func.count(User.id)).filter(User.subject_id == subject.id).scalar()
 
     if user_count > 0:
         raise HTTPException(
@@ -482,77 +537,64 @@ def delete_subject(
 
 # =============== ENHANCED STATS ===============
 
+# The day is part of the key: "this month" and the monthly trend move with the calendar
 @router.get("/stats")
+@cached_response("manager.stats", STATS_TABLES, extra=lambda: {"day": date.today()})
 def get_stats(
-        current_user: User = Depends(require_role(["manager"])),
+        current_user: Principal = Depends(require_role(["manager"])),
         db: Session = Depends(get_db)
 ):
+    return center_stats_overview(db, current_user.learning_center_id)
+
+
+def center_stats_overview(db: Session, center_id: int) -> dict:
     # Basic counts
-    total_assistants = db.query(func.count(User.id)).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        User.role == "assistant"
-    ).scalar()
+    user_counts = dict(db.query(User.role, func.count(User.id)).filter(
+        User.learning_center_id == center_id,
+        User.role.in_(["assistant", "student"])
+    ).group_by(User.role).all())
 
-    total_students = db.query(func.count(User.id)).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        User.role == "student"
-    ).scalar()
+    total_assistants = user_counts.get("assistant", 0)
+    total_students = user_counts.get("student", 0)
 
     total_subjects = db.query(func.count(Subject.id)).filter(
-        Subject.learning_center_id == current_user.learning_center_id
+        Subject.learning_center_id == center_id
     ).scalar()
 
-    # Session stats
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    sessions_this_month = db.query(func.count(SessionModel.id)).join(
-        User, SessionModel.assistant_id == User.id
-    ).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        extract('month', SessionModel.datetime) == current_month,
-        extract('year', SessionModel.datetime) == current_year
-    ).scalar()
+    # Session and rating totals are maintained on write (see app/stats.py)
+    center_stats = db.query(CenterStats).filter(CenterStats.learning_center_id == center_id).first()
+    total_sessions = center_stats.total_sessions if center_stats else 0
+    present_sessions = center_stats.present_sessions if center_stats else 0
+    avg_rating = (center_stats.rating_total / (5.0 * center_stats.rating_count)
+                  if center_stats and center_stats.rating_count else 0)
 
-    total_sessions = db.query(func.count(SessionModel.id)).join(
-        User, SessionModel.assistant_id == User.id
-    ).filter(
-        User.learning_center_id == current_user.learning_center_id
-    ).scalar()
+    # Monthly session trends (last 6 months)
+    sessions_by_month = {
+        (stat.year, stat.month): stat.sessions
+        for stat in db.query(CenterMonthlyStats).filter(
+            CenterMonthlyStats.learning_center_id == center_id,
+            CenterMonthlyStats.year >= datetime.now().year - 1
+        )
+    }
 
-    # Average rating across all sessions
-    avg_rating = db.query(
-        func.avg((Rating.knowledge + Rating.communication + Rating.patience +
-                  Rating.engagement + Rating.problem_solving) / 5.0)
-    ).join(SessionModel).join(User, SessionModel.assistant_id == User.id).filter(
-        User.learning_center_id == current_user.learning_center_id
-    ).scalar() or 0
+    now = datetime.now()
+    sessions_this_month = sessions_by_month.get((now.year, now.month), 0)
 
-    # Monthly session trends (last 6 months)
     monthly_trends = []
     for i in range(6):
-        target_date = datetime.now() - timedelta(days=30 * i)
-        month_sessions = db.query(func.count(SessionModel.id)).join(
-            User, SessionModel.assistant_id == User.id
-        ).filter(
-            User.learning_center_id == current_user.learning_center_id,
-            extract('month', SessionModel.datetime) == target_date.month,
-            extract('year', SessionModel.datetime) == target_date.year
-        ).scalar()
-
+        year, month_index = divmod(now.year * 12 + now.month - 1 - i, 12)
         monthly_trends.append({
-            "month": target_date.strftime("%B"),
-            "sessions": month_sessions
+            "month": datetime(year, month_index + 1, 1).strftime("%B"),
+            "sessions": sessions_by_month.get((year, month_index + 1), 0)
         })
 
     # Subject popularity
     subject_stats = db.query(
-        User.subject_field,
-        func.count(SessionModel.id).label("session_count")
-    ).join(SessionModel, SessionModel.assistant_id == User.id).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        User.subject_field.isnot(None)
-    ).group_by(User.subject_field).all()
+        Subject.name,
+        func.sum(AssistantStats.total_sessions).label("session_count")
+    ).join(User, User.subject_id == Subject.id).join(AssistantStats, AssistantStats.assistant_id == User.id).filter(
+        User.learning_center_id == center_id
+    ).group_by(Subject.id, Subject.name).having(func.sum(AssistantStats.total_sessions) > 0).all()
 
     subject_popularity = [
         {"subject": stat[0], "sessions": stat[1]}
@@ -560,19 +602,16 @@ def get_stats(
     ]
 
     # Top assistants by rating
+    assistant_rating = (AssistantStats.rating_total / (5.0 * AssistantStats.rating_count)).label("avg_rating")
     top_assistants = db.query(
         User.fullname,
-        func.avg((Rating.knowledge + Rating.communication + Rating.patience +
-                  Rating.engagement + Rating.problem_solving) / 5.0).label("avg_rating"),
-        func.count(SessionModel.id).label("session_count")
-    ).join(SessionModel, SessionModel.assistant_id == User.id).join(
-        Rating, Rating.session_id == SessionModel.id
-    ).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        User.role == "assistant"
-    ).group_by(User.id).having(func.count(SessionModel.id) >= 3).order_by(
-        desc("avg_rating")
-    ).limit(5).all()
+        assistant_rating,
+        AssistantStats.rating_count
+    ).join(AssistantStats, AssistantStats.assistant_id == User.id).filter(
+        User.learning_center_id == center_id,
+        User.role == "assistant",
+        AssistantStats.rating_count >= 3
+    ).order_by(desc("avg_rating"), User.id).limit(5).all()
 
     top_assistants_list = [
         {
@@ -584,12 +623,10 @@ def get_stats(
     ]
 
     # Peak hours analysis
-    peak_hours = db.query(
-        extract('hour', SessionModel.datetime).label('hour'),
-        func.count(SessionModel.id).label('session_count')
-    ).join(User, SessionModel.assistant_id == User.id).filter(
-        User.learning_center_id == current_user.learning_center_id
-    ).group_by('hour').order_by('hour').all()
+    peak_hours = db.query(CenterHourlyStats.hour, CenterHourlyStats.sessions).filter(
+        CenterHourlyStats.learning_center_id == center_id,
+        CenterHourlyStats.sessions > 0
+    ).order_by(CenterHourlyStats.hour).all()
 
     peak_hours_list = [
         {"hour": f"{int(stat[0])}:00", "sessions": stat[1]}
@@ -597,14 +634,7 @@ def get_stats(
     ]
 
     # Attendance rate
-    completed_sessions = db.query(func.count(SessionModel.id)).join(
-        User, SessionModel.assistant_id == User.id
-    ).filter(
-        User.learning_center_id == current_user.learning_center_id,
-        SessionModel.attendance == "present"
-    ).scalar()
-
-    attendance_rate = round((completed_sessions / total_sessions * 100), 2) if total_sessions > 0 else 0
+    attendance_rate = round((present_sessions / total_sessions * 100), 2) if total_sessions > 0 else 0
 
     return {
         "overview": {
@@ -620,4 +650,251 @@ def get_stats(
         "subject_popularity": subject_popularity,
         "top_assistants": top_assistants_list,
         "peak_hours": peak_hours_list
-    }
\ No newline at end of file
+    }
+
+
+
+@router.get("/stats/timeseries")
+def get_stats_timeseries(
+        date_from: Optional[date] = Query(None, alias="from", description="YYYY-MM-DD, standart: 30 kun oldin"),
+        date_to: Optional[date] = Query(None, alias="to", description="YYYY-MM-DD, standart: bugun"),
+        granularity: str = Query("day", description="day, week yoki month"),
+        assistant_id: Optional[int] = Query(None),
+        subject_id: Optional[int] = Query(None),
+        current_user: Principal = Depends(require_role(["manager"])),
+        db: Session = Depends(get_db)
+):
+    """Session, attendance and rating series plus peak hours over any range, read from the daily rollup"""
+    if granularity not in TIMESERIES_GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="granularity day, week yoki month bo'lishi kerak"
+        )
+
+    date_to = date_to or date.today()
+    date_from = date_from or date.fromordinal(max(1, date_to.toordinal() - 29))
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Boshlanish sanasi tugash sanasidan keyin bo'lishi mumkin emas"
+        )
+
+    # Counted before anything is built: a range like 0001-01-01..9999-12-31 is rejected in O(1)
+    if period_count(date_from, date_to, granularity) > TIMESERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Oraliq juda katta: ko'pi bilan {TIMESERIES_MAX_POINTS} ta nuqta"
+        )
+    periods = period_starts(date_from, date_to, granularity)
+
+    # One range scan over (center, day); buckets are folded into periods here
+    query = db.query(
+        CenterDailyStats.day,
+        CenterDailyStats.hour,
+        func.sum(CenterDailyStats.sessions),
+        func.sum(CenterDailyStats.present_sessions),
+        func.sum(CenterDailyStats.absent_sessions),
+        func.sum(CenterDailyStats.rating_total),
+        func.sum(CenterDailyStats.rating_count)
+    ).filter(
+        CenterDailyStats.learning_center_id == current_user.learning_center_id,
+        CenterDailyStats.day >= date_from,
+        CenterDailyStats.day <= date_to
+    )
+    if assistant_id is not None:
+        query = query.filter(CenterDailyStats.assistant_id == assistant_id)
+    if subject_id is not None:
+        query = query.filter(CenterDailyStats.subject_id == subject_id)
+
+    counters = ("sessions", "present", "absent", "rating_total", "rating_count")
+    series = {period: dict.fromkeys(counters, 0) for period in periods}
+    sessions_by_hour = {}
+    for day, hour, *values in query.group_by(CenterDailyStats.day, CenterDailyStats.hour):
+        bucket = series[period_start(day, granularity)]
+        for counter, value in zip(counters, values):
+            bucket[counter] += value or 0
+        sessions_by_hour[hour] = sessions_by_hour.get(hour, 0) + (values[0] or 0)
+
+    def summary(bucket: dict) -> dict:
+        return {
+            "sessions": bucket["sessions"],
+            "present": bucket["present"],
+            "absent": bucket["absent"],
+            "rating_count": bucket["rating_count"],
+            "avg_rating": round(bucket["rating_total"] / (5.0 * bucket["rating_count"]), 2)
+            if bucket["rating_count"] else 0
+        }
+
+    totals = dict.fromkeys(counters, 0)
+    for bucket in series.values():
+        for counter in counters:
+            totals[counter] += bucket[counter]
+
+    return {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "granularity": granularity,
+        "series": [{"period": period.isoformat(), **summary(bucket)} for period, bucket in series.items()],
+        "totals": summary(totals),
+        "peak_hours": [
+            {"hour": f"{hour}:00", "sessions": sessions}
+            for hour, sessions in sorted(sessions_by_hour.items())
+            if sessions > 0
+        ]
+    }
+
+
+# =============== ANALYTICS ===============
+
+def analytics_range(date_from: Optional[date], date_to: Optional[date]):
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Boshlanish sanasi tugash sanasidan keyin bo'lishi mumkin emas"
+        )
+
+
+def center_assistants(db: Session, learning_center_id: int):
+    return db.query(User).filter(
+        User.learning_center_id == learning_center_id,
+        User.role == "assistant"
+    ).order_by(User.id).all()
+
+
+def center_subject_names(db: Session, learning_center_id: int) -> dict:
+    return dict(db.query(Subject.id, Subject.name).filter(Subject.learning_center_id == learning_center_id))
+
+
+@router.get("/analytics/heatmap")
+def get_analytics_heatmap(
+        date_from: Optional[date] = Query(None, alias="from", description="YYYY-MM-DD"),
+        date_to: Optional[date] = Query(None, alias="to", description="YYYY-MM-DD"),
+        assistant_id: Optional[int] = Query(None),
+        subject_id: Optional[int] = Query(None),
+        current_user: Principal = Depends(require_role(["manager"])),
+        db: Session = Depends(get_db)
+):
+    """Sessions per weekday (Monday first) x hour over the whole history or a date range.
+
+    ``subject_id`` selects sessions booked under that subject, whatever the assistant teaches now.
+    """
+    analytics_range(date_from, date_to)
+
+    assistant_ids = [assistant_id] if assistant_id is not None else None
+    heatmap = center_snapshot(db, current_user.learning_center_id).heatmap(
+        date_from, date_to, assistant_ids, subject_id
+    )
+    return {
+        "weekdays": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+        "hours": list(range(24)),
+        **heatmap
+    }
+
+
+@router.get("/analytics/fill-rate")
+def get_analytics_fill_rate(
+        date_from: Optional[date] = Query(None, alias="from", description="YYYY-MM-DD, standart: 30 kun oldin"),
+        date_to: Optional[date] = Query(None, alias="to", description="YYYY-MM-DD, standart: bugun"),
+        current_user: Principal = Depends(require_role(["manager"])),
+        db: Session = Depends(get_db)
+):
+    """Offered slots vs booked sessions per assistant, with attendance"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    analytics_range(date_from, date_to)
+    if (date_to - date_from).days >= FILL_RATE_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Oraliq ko'pi bilan {FILL_RATE_MAX_DAYS} kun bo'lishi mumkin"
+        )
+
+    assistants = center_assistants(db, current_user.learning_center_id)
+    offered = offered_slot_counts(db, [assistant.id for assistant in assistants], date_from, date_to)
+    counts = center_snapshot(db, current_user.learning_center_id).assistant_counts(date_from, date_to)
+    subject_names = center_subject_names(db, current_user.learning_center_id)
+
+    result = []
+    for assistant in assistants:
+        booked = counts.get(assistant.id, {"sessions": 0, "present": 0, "absent": 0, "subjects": {}})
+        slots = offered.get(assistant.id, 0)
+        marked = booked["present"] + booked["absent"]
+        result.append({
+            "assistant_id": assistant.id,
+            "fullname": assistant.fullname,
+            "subject": assistant.subject_field,
+            "offered_slots": slots,
+            "booked_sessions": booked["sessions"],
+            "present": booked["present"],
+            "absent": booked["absent"],
+            "fill_rate": round(booked["sessions"] / slots * 100, 2) if slots else 0,
+            "attendance_rate": round(booked["present"] / marked * 100, 2) if marked else 0,
+            # Booked sessions by the subject they were booked under
+            "sessions_by_subject": [
+                {"subject_id": subject_id, "subject": subject_names.get(subject_id), "sessions": sessions}
+                for subject_id, sessions in booked["subjects"].items()
+            ]
+        })
+
+    return {"from": date_from.isoformat(), "to": date_to.isoformat(), "assistants": result}
+
+
+@router.get("/analytics/ratings")
+def get_analytics_ratings(
+        date_from: Optional[date] = Query(None, alias="from", description="YYYY-MM-DD"),
+        date_to: Optional[date] = Query(None, alias="to", description="YYYY-MM-DD"),
+        current_user: Principal = Depends(require_role(["manager"])),
+        db: Session = Depends(get_db)
+):
+    """Distribution of 1-5 scores per rating dimension and the subject each session was booked under"""
+    analytics_range(date_from, date_to)
+
+    distributions = center_snapshot(db, current_user.learning_center_id).rating_distribution(date_from, date_to)
+    subject_names = center_subject_names(db, current_user.learning_center_id)
+
+    subjects = []
+    for subject_id, dimensions in distributions.items():
+        count = sum(dimensions[RATING_DIMENSIONS[0]])
+        points = sum(
+            score * amount
+            for distribution in dimensions.values()
+            for score, amount in enumerate(distribution, start=1)
+        )
+        subjects.append({
+            "subject_id": subject_id,
+            "subject": subject_names.get(subject_id),
+            "ratings": count,
+            "avg_rating": round(points / (5.0 * count), 2),
+            "dimensions": {
+                dimension: {
+                    "distribution": distribution,
+                    "avg": round(sum(score * amount for score, amount in enumerate(distribution, start=1)) / count, 2)
+                }
+                for dimension, distribution in dimensions.items()
+            }
+        })
+
+    return {"subjects": sorted(subjects, key=lambda subject: -subject["ratings"])}
+
+# =============== EXPORT ===============
+
+@router.get("/export/sessions")
+def export_sessions(
+        format: str = Query("csv", description="csv yoki ndjson"),
+        gzip: bool = Query(False, description="Faylni gzip bilan siqish"),
+        date_from: Optional[date] = Query(None, description="YYYY-MM-DD, shu kundan boshlab"),
+        date_to: Optional[date] = Query(None, description="YYYY-MM-DD, shu kungacha (shu kun ham)"),
+        current_user: Principal = Depends(require_role(["manager"]))
+):
+    """Sessions with student, assistant and rating, streamed in chunks instead of built in memory"""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format csv yoki ndjson bo'lishi kerak"
+        )
+
+    filename = f"sessions.{format}.gz" if gzip else f"sessions.{format}"
+    return StreamingResponse(
+        stream_session_export(current_user.learning_center_id, format, gzip, date_from, date_to),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
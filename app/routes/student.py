@@ -1,102 +1,328 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime
+from sqlalchemy.orm import Session, lazyload
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
+from typing import Optional
+from itertools import islice
+import heapq
 from ..database import get_db
-from ..models import User, Session as SessionModel, Rating, Availability
+from ..models import (
+    User, Session as SessionModel, Rating, Subject, Availability, AvailabilityRule, AssistantStats
+)
 from ..schemas import SessionCreate, RatingCreate
-from ..auth import require_role
+from ..auth import Principal, require_role
+from ..stats import ASSISTANT_AVG_RATING, record_session_booked, record_rating
+from ..pagination import PageParams, MAX_PAGE_SIZE
+from ..availability import (
+    DATE_FORMAT, TIME_FORMAT, rule_window, parse_time, time_range_mask, mask_slots, rules_statement, collect_rules,
+    expand_rules, build_day_bitmaps, claim_rule_slot, with_rules_on
+)
+from ..response_cache import cached_response
 
 router = APIRouter()
 
 
+# Future slots shown per assistant in the catalogue
+CATALOGUE_SLOTS_PER_ASSISTANT = 20
+# Tables the catalogue is built from (ratings and bookings through the stats and slot rows they update)
+CATALOGUE_TABLES = (
+    "users", "subjects", "sessions", "ratings", "availability", "availability_rules", "availability_rule_exceptions"
+)
+
+
+def catalogue_window() -> tuple:
+    """Dependency: the days the catalogue expands rules over, also part of its cache key"""
+    return rule_window()
+
+
+def assistant_catalogue_queries(learning_center_id: int, window):
+    """Statements for the assistant catalogue: assistants with avg rating, their future free stored slots,
+    their weekly rules and the booked/busy rows overriding rule slots inside ``window``"""
+    assistants = select(User, ASSISTANT_AVG_RATING).outerjoin(
+        AssistantStats, AssistantStats.assistant_id == User.id
+    ).where(
+        User.learning_center_id == learning_center_id,
+        User.role == "assistant"
+    ).order_by(User.id)
+
+    center_assistants = select(User.id).where(
+        User.learning_center_id == learning_center_id,
+        User.role == "assistant"
+    )
+
+    # Earliest free slots per assistant, ranked in SQL so one query serves every assistant
+    ranked_slots = select(
+        Availability.assistant_id,
+        Availability.date,
+        Availability.time_slot,
+        func.row_number().over(
+            partition_by=Availability.assistant_id,
+            order_by=(Availability.date, Availability.time_slot)
+        ).label("slot_rank")
+    ).where(
+        Availability.assistant_id.in_(center_assistants),
+        Availability.is_available == "available",
+        Availability.date >= window[0].strftime(DATE_FORMAT)
+    ).subquery()
+
+    slots = select(ranked_slots.c.assistant_id, ranked_slots.c.date, ranked_slots.c.time_slot).where(
+        ranked_slots.c.slot_rank <= CATALOGUE_SLOTS_PER_ASSISTANT
+    ).order_by(ranked_slots.c.assistant_id, ranked_slots.c.slot_rank)
+
+    rules = rules_statement([AvailabilityRule.assistant_id.in_(center_assistants)], *window)
+
+    overrides = select(
+        Availability.assistant_id, Availability.date, Availability.time_slot, Availability.is_available
+    ).where(
+        Availability.assistant_id.in_(select(AvailabilityRule.assistant_id).where(
+            AvailabilityRule.assistant_id.in_(center_assistants)
+        )),
+        Availability.is_available != "available",
+        Availability.date >= window[0].strftime(DATE_FORMAT),
+        Availability.date <= window[1].strftime(DATE_FORMAT)
+    )
+
+    return assistants, slots, rules, overrides
+
+
+def format_assistant_catalogue(window, assistants, slots, rules, overrides):
+    rule_days = expand_rules(collect_rules(rules), *window)
+    rows_by_assistant = {}
+    for assistant_id, slot_date, time_slot in slots:
+        rows_by_assistant.setdefault(assistant_id, []).append((slot_date, time_slot, "available"))
+    for assistant_id, slot_date, time_slot, is_available in overrides:
+        rows_by_assistant.setdefault(assistant_id, []).append((slot_date, time_slot, is_available))
+
+    # Earliest free slots from each assistant's day bitmaps (rules with stored rows applied on top)
+    slots_by_assistant = {}
+    for assistant_id in rule_days.keys() | rows_by_assistant.keys():
+        days = build_day_bitmaps(rule_days.get(assistant_id, {}), rows_by_assistant.get(assistant_id, []))
+        free = (f"{day} {time_slot}" for day, bitmap in days.items() for time_slot in bitmap.free_slots())
+        slots_by_assistant[assistant_id] = list(islice(free, CATALOGUE_SLOTS_PER_ASSISTANT))
+
+    return [
+        {
+            "id": assistant.id,
+            "fullname": assistant.fullname,
+            "subject": assistant.subject_field,
+            "avg_rating": round(avg_rating or 0, 2),
+            "photo_url": assistant.photo_url,
+            "available_slots": slots_by_assistant.get(assistant.id, [])
+        }
+        for assistant, avg_rating in assistants
+    ]
+
+
 @router.get("/assistants")
+@cached_response("student.assistants", CATALOGUE_TABLES, params=("window",))
 def get_assistants(
-        current_user: User = Depends(require_role(["student"])),
+        window: tuple = Depends(catalogue_window),
+        current_user: Principal = Depends(require_role(["student"])),
         db: Session = Depends(get_db)
 ):
     # Get ALL assistants in same learning center (not filtered by subject)
-    assistants = db.query(User).filter(
-        User.learning_center_id == current_user.learning_center_id,
+    queries = assistant_catalogue_queries(current_user.learning_center_id, window)
+    return format_assistant_catalogue(window, *[db.execute(query).all() for query in queries])
+
+
+# Days of rule slots expanded per step of the slot search; it stops once enough slots are found
+SLOT_SEARCH_CHUNK_DAYS = 7
+
+
+def slot_search_assistants(learning_center_id: int, subject: Optional[str], min_rating: Optional[float]):
+    """Ids of the center's assistants matching the slot search's subject and rating filters"""
+    assistants = select(User.id).outerjoin(AssistantStats, AssistantStats.assistant_id == User.id).where(
+        User.learning_center_id == learning_center_id,
         User.role == "assistant"
-    ).all()
+    )
+    if subject:
+        assistants = assistants.join(Subject, Subject.id == User.subject_id).where(Subject.name == subject)
+    if min_rating is not None:
+        assistants = assistants.where(ASSISTANT_AVG_RATING >= min_rating)
+    return assistants
+
+
+def stored_free_slots_statement(assistants, first: date, last: date, now: datetime,
+                                time_from: Optional[str], time_to: Optional[str], limit: int):
+    """Earliest ``limit`` stored free slots of ``assistants`` from ``now`` within [first, last], read in
+    (is_available, date, time_slot) index order so the scan stops at the limit"""
+    today_key, now_time = now.strftime(DATE_FORMAT), now.strftime(TIME_FORMAT)
+    slot_filters = [
+        Availability.is_available == "available",
+        Availability.date >= first.strftime(DATE_FORMAT),
+        Availability.date <= last.strftime(DATE_FORMAT),
+        or_(Availability.date > today_key, Availability.time_slot >= now_time),
+        Availability.assistant_id.in_(assistants)
+    ]
+    if time_from:
+        slot_filters.append(Availability.time_slot >= time_from)
+    if time_to:
+        slot_filters.append(Availability.time_slot <= time_to)
+    return select(Availability.date, Availability.time_slot, Availability.assistant_id).where(
+        *slot_filters
+    ).order_by(
+        Availability.date, Availability.time_slot, Availability.assistant_id
+    ).limit(limit)
+
+
+@router.get("/slots/search")
+def search_slots(
+        subject: Optional[str] = Query(None, description="Fan nomi"),
+        date_from: Optional[date] = Query(None, description="YYYY-MM-DD, shu kundan boshlab"),
+        date_to: Optional[date] = Query(None, description="YYYY-MM-DD, shu kungacha (shu kun ham)"),
+        time_from: Optional[str] = Query(None, description="HH:MM, kunning shu vaqtidan"),
+        time_to: Optional[str] = Query(None, description="HH:MM, kunning shu vaqtigacha"),
+        min_rating: Optional[float] = Query(None, ge=0, le=5),
+        limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+        current_user: Principal = Depends(require_role(["student"])),
+        db: Session = Depends(get_db)
+):
+    """Earliest free slots across the center's assistants, stored and rule-generated"""
+    for bound in (time_from, time_to):
+        if bound is not None:
+            parse_time(bound)
 
-    result = []
-    for assistant in assistants:
-        # Calculate average rating
-        avg_rating_query = db.query(
-            func.avg((Rating.knowledge + Rating.communication + Rating.patience +
-                      Rating.engagement + Rating.problem_solving) / 5.0)
-        ).join(SessionModel).filter(SessionModel.assistant_id == assistant.id)
-
-        avg_rating = avg_rating_query.scalar() or 0
-
-        # Get available slots for future dates
-        available_slots = db.query(Availability).filter(
-            Availability.assistant_id == assistant.id,
-            Availability.is_available == "available",
-            Availability.date >= datetime.now().strftime("%Y-%m-%d")
-        ).limit(20).all()
-
-        slots_list = []
-        for slot in available_slots:
-            slots_list.append(f"{slot.date} {slot.time_slot}")
+    now = datetime.now()
+    today_key, now_time = now.strftime(DATE_FORMAT), now.strftime(TIME_FORMAT)
+    first, last = rule_window(max(date_from or now.date(), now.date()), date_to)
+    if last < first:
+        return []
+
+    assistants = slot_search_assistants(current_user.learning_center_id, subject, min_rating)
+    matches = set(db.execute(
+        stored_free_slots_statement(assistants, first, last, now, time_from, time_to, limit)
+    ).all())
+
+    # Rule slots, one chunk of days at a time with that chunk's booked/busy overrides applied
+    rules = collect_rules(db.execute(
+        rules_statement([AvailabilityRule.assistant_id.in_(assistants)], first, last)
+    ).all())
+    day_mask = time_range_mask(time_from, time_to)
+    today_mask = day_mask & time_range_mask(now_time)
+    chunk_start = first
+    while rules and chunk_start <= last:
+        chunk_end = min(last, chunk_start + timedelta(days=SLOT_SEARCH_CHUNK_DAYS - 1))
+        rule_days = expand_rules(rules, chunk_start, chunk_end)
+
+        overrides = {}
+        if rule_days:
+            for assistant_id, slot_date, time_slot, is_available in db.execute(
+                    select(
+                        Availability.assistant_id, Availability.date, Availability.time_slot, Availability.is_available
+                    ).where(
+                        Availability.assistant_id.in_(list(rule_days)),
+                        Availability.is_available != "available",
+                        Availability.date >= chunk_start.strftime(DATE_FORMAT),
+                        Availability.date <= chunk_end.strftime(DATE_FORMAT)
+                    )
+            ):
+                overrides.setdefault(assistant_id, []).append((slot_date, time_slot, is_available))
+
+        for assistant_id, days in rule_days.items():
+            for day_key, bitmap in build_day_bitmaps(days, overrides.get(assistant_id, [])).items():
+                free = bitmap.free & (today_mask if day_key == today_key else day_mask)
+                matches.update((day_key, time_slot, assistant_id) for time_slot in mask_slots(free))
+
+        # Count the merged, deduplicated slots: once the earliest `limit` of them all fall on or before
+        # this chunk, no later chunk can displace one
+        earliest = heapq.nsmallest(limit, matches)
+        matches = set(earliest)
+        if len(earliest) == limit and earliest[-1][0] <= chunk_end.strftime(DATE_FORMAT):
+            break
+        chunk_start = chunk_end + timedelta(days=1)
+
+    matches = sorted(matches)[:limit]
+    if not matches:
+        return []
+
+    profiles = {
+        assistant.id: (assistant, avg_rating)
+        for assistant, avg_rating in db.execute(
+            select(User, ASSISTANT_AVG_RATING).outerjoin(
+                AssistantStats, AssistantStats.assistant_id == User.id
+            ).where(User.id.in_({assistant_id for _, _, assistant_id in matches}))
+        ).all()
+    }
 
+    result = []
+    for slot_date, time_slot, assistant_id in matches:
+        assistant, avg_rating = profiles[assistant_id]
         result.append({
-            "id": assistant.id,
+            "assistant_id": assistant.id,
             "fullname": assistant.fullname,
             "subject": assistant.subject_field,
-            "avg_rating": round(avg_rating, 2),
+            "avg_rating": round(avg_rating or 0, 2),
             "photo_url": assistant.photo_url,
-            "available_slots": slots_list
+            "date": slot_date,
+            "time": time_slot
         })
 
     return result
 
 
+def claim_slot_statement(assistant_id: int, session_datetime):
+    """Compare-and-set UPDATE marking a free slot booked; affects one row only if the slot was free"""
+    return update(Availability).where(
+        Availability.assistant_id == assistant_id,
+        Availability.date == session_datetime.strftime("%Y-%m-%d"),
+        Availability.time_slot == session_datetime.strftime("%H:%M"),
+        Availability.is_available == "available"
+    ).values(is_available="booked").execution_options(synchronize_session=False)
+
+
+def booking_assistant_statement(assistant_id: int, learning_center_id: int, session_datetime):
+    """The assistant being booked, one row per rule (and exception) it has on the session's date.
+
+    Booking only needs the assistant's ids, so its subject is not selectin-loaded.
+    """
+    return with_rules_on(select(User).options(lazyload(User.subject)), User.id, session_datetime.date()).where(
+        User.id == assistant_id,
+        User.learning_center_id == learning_center_id,
+        User.role == "assistant"
+    )
+
+
+def booking_assistant(rows) -> tuple:
+    """(assistant, collect_rules() of its rules that day) from booking_assistant_statement rows"""
+    return rows[0][0], collect_rules((rule, exception_date) for _, rule, exception_date in rows if rule is not None)
+
+
 @router.post("/sessions")
 def book_session(
         request: SessionCreate,
-        current_user: User = Depends(require_role(["student"])),
+        current_user: Principal = Depends(require_role(["student"])),
         db: Session = Depends(get_db)
 ):
-    # Check if assistant exists and is in same learning center
-    assistant = db.query(User).filter(
-        User.id == request.assistant_id,
-        User.learning_center_id == current_user.learning_center_id,
-        User.role == "assistant"
-    ).first()
+    # Check if assistant exists and is in same learning center, with its rules for that day
+    rows = db.execute(booking_assistant_statement(
+        request.assistant_id, current_user.learning_center_id, request.datetime
+    )).all()
 
-    if not assistant:
+    if not rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Yordamchi topilmadi"
         )
+    assistant, rules = booking_assistant(rows)
 
-    # Check if time slot is available
-    date_str = request.datetime.strftime("%Y-%m-%d")
-    time_str = request.datetime.strftime("%H:%M")
-
-    availability = db.query(Availability).filter(
-        Availability.assistant_id == request.assistant_id,
-        Availability.date == date_str,
-        Availability.time_slot == time_str,
-        Availability.is_available == "available"
-    ).first()
-
-    if not availability:
+    # Claim the slot atomically: only one concurrent booking can flip it from available to booked,
+    # or materialize a rule slot as booked
+    if (db.execute(claim_slot_statement(request.assistant_id, request.datetime)).rowcount != 1
+            and not claim_rule_slot(db, request.assistant_id, request.datetime, rules)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Bu vaqt band yoki mavjud emas"
         )
 
     # Check if student already has a session at this time
-    existing_session = db.query(SessionModel).filter(
+    existing_session = db.query(SessionModel.id).filter(
         SessionModel.student_id == current_user.id,
         SessionModel.datetime == request.datetime
     ).first()
 
     if existing_session:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Bu vaqtda sizda allaqachon dars bor"
@@ -107,13 +333,12 @@ def book_session(
         student_id=current_user.id,
         assistant_id=request.assistant_id,
         datetime=request.datetime,
-        status="booked"
+        status="booked",
+        subject_id=assistant.subject_id
     )
 
     db.add(session)
-
-    # Mark availability as booked
-    availability.is_available = "booked"
+    record_session_booked(db, session, assistant.learning_center_id)
 
     db.commit()
     db.refresh(session)
@@ -125,32 +350,28 @@ def book_session(
     }
 
 
-@router.get("/sessions")
-def get_sessions(
-        status: str = Query("upcoming", description="upcoming yoki past"),
-        current_user: User = Depends(require_role(["student"])),
-        db: Session = Depends(get_db)
-):
+def student_sessions_query(student_id: int, status: str):
+    """Student's sessions with their assistant and rating, in one statement"""
     now = datetime.now()
+    time_filter = SessionModel.datetime >= now if status == "upcoming" else SessionModel.datetime < now
+
+    return select(SessionModel, User, Rating).join(
+        User, User.id == SessionModel.assistant_id
+    ).outerjoin(
+        Rating, Rating.session_id == SessionModel.id
+    ).where(
+        SessionModel.student_id == student_id,
+        time_filter
+    )
 
-    if status == "upcoming":
-        sessions = db.query(SessionModel).filter(
-            SessionModel.student_id == current_user.id,
-            SessionModel.datetime >= now
-        ).all()
-    else:
-        sessions = db.query(SessionModel).filter(
-            SessionModel.student_id == current_user.id,
-            SessionModel.datetime < now
-        ).all()
 
-    result = []
-    for session in sessions:
-        assistant = db.query(User).filter(User.id == session.assistant_id).first()
+# Keyset order of a student's session list
+STUDENT_SESSION_ORDER = [SessionModel.datetime, SessionModel.id]
 
-        # Check if student has rated this session
-        my_rating = db.query(Rating).filter(Rating.session_id == session.id).first()
 
+def format_student_sessions(rows):
+    result = []
+    for session, assistant, my_rating in rows:
         result.append({
             "id": session.id,
             "assistant_name": assistant.fullname,
@@ -170,10 +391,26 @@ def get_sessions(
     return result
 
 
+def session_row_key(row):
+    return [row[0].datetime, row[0].id]
+
+
+@router.get("/sessions")
+def get_sessions(
+        status: str = Query("upcoming", description="upcoming yoki past"),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role(["student"])),
+        db: Session = Depends(get_db)
+):
+    query = page.keyset(student_sessions_query(current_user.id, status), STUDENT_SESSION_ORDER)
+    rows = page.finish(db.execute(query).all(), key=session_row_key)
+    return format_student_sessions(rows)
+
+
 @router.post("/ratings")
 def create_rating(
         request: RatingCreate,
-        current_user: User = Depends(require_role(["student"])),
+        current_user: Principal = Depends(require_role(["student"])),
         db: Session = Depends(get_db)
 ):
     # Check if session exists and belongs to student
@@ -223,8 +460,17 @@ def create_rating(
         comments=request.comments
     )
 
-    db.add(rating)
-    db.commit()
+    # The check above can race a concurrent submit; ux_ratings_session_id lets only one of them in
+    try:
+        db.add(rating)
+        record_rating(db, session, rating, current_user.learning_center_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bu dars allaqachon baholangan"
+        )
 
     return {
         "success": True,
@@ -0,0 +1,110 @@
+"""Async variants of the busiest student endpoints (enabled with ASYNC_ROUTES=true).
+
+Responses match app/routes/student.py exactly.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..models import Session as SessionModel
+from ..schemas import SessionCreate
+from ..auth import Principal, require_role_async
+from ..stats import record_session_booked
+from ..pagination import PageParams
+from ..availability import claim_rule_slot
+from ..response_cache import cached_response
+from .student import (
+    CATALOGUE_TABLES, catalogue_window, assistant_catalogue_queries, format_assistant_catalogue, claim_slot_statement,
+    booking_assistant_statement, booking_assistant,
+    student_sessions_query, format_student_sessions, session_row_key, STUDENT_SESSION_ORDER
+)
+
+router = APIRouter()
+
+
+@router.get("/assistants")
+@cached_response("student.assistants", CATALOGUE_TABLES, params=("window",))
+async def get_assistants_async(
+        window: tuple = Depends(catalogue_window),
+        current_user: Principal = Depends(require_role_async(["student"])),
+        db: AsyncSession = Depends(get_async_db)
+):
+    queries = assistant_catalogue_queries(current_user.learning_center_id, window)
+    return format_assistant_catalogue(window, *[(await db.execute(query)).all() for query in queries])
+
+
+@router.post("/sessions")
+async def book_session_async(
+        request: SessionCreate,
+        current_user: Principal = Depends(require_role_async(["student"])),
+        db: AsyncSession = Depends(get_async_db)
+):
+    # Check if assistant exists and is in same learning center, with its rules for that day
+    rows = (await db.execute(booking_assistant_statement(
+        request.assistant_id, current_user.learning_center_id, request.datetime
+    ))).all()
+
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Yordamchi topilmadi"
+        )
+    assistant, rules = booking_assistant(rows)
+
+    # Claim the slot atomically: only one concurrent booking can flip it from available to booked,
+    # or materialize a rule slot as booked
+    if ((await db.execute(claim_slot_statement(request.assistant_id, request.datetime))).rowcount != 1
+            and not await db.run_sync(claim_rule_slot, request.assistant_id, request.datetime, rules)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bu vaqt band yoki mavjud emas"
+        )
+
+    # Check if student already has a session at this time
+    existing_session = (await db.execute(
+        select(SessionModel.id).where(
+            SessionModel.student_id == current_user.id,
+            SessionModel.datetime == request.datetime
+        )
+    )).first()
+
+    if existing_session:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bu vaqtda sizda allaqachon dars bor"
+        )
+
+    session = SessionModel(
+        student_id=current_user.id,
+        assistant_id=request.assistant_id,
+        datetime=request.datetime,
+        status="booked",
+        subject_id=assistant.subject_id
+    )
+
+    db.add(session)
+
+    learning_center_id = assistant.learning_center_id
+    await db.run_sync(lambda sync_db: record_session_booked(sync_db, session, learning_center_id))
+
+    await db.commit()
+
+    return {
+        "session_id": session.id,
+        "success": True,
+        "message": "Dars muvaffaqiyatli band qilindi"
+    }
+
+
+@router.get("/sessions")
+async def get_sessions_async(
+        status: str = Query("upcoming", description="upcoming yoki past"),
+        page: PageParams = Depends(),
+        current_user: Principal = Depends(require_role_async(["student"])),
+        db: AsyncSession = Depends(get_async_db)
+):
+    query = page.keyset(student_sessions_query(current_user.id, status), STUDENT_SESSION_ORDER)
+    rows = page.finish((await db.execute(query)).all(), key=session_row_key)
+    return format_student_sessions(rows)
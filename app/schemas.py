@@ -92,12 +92,30 @@ class AvailabilityCreate(BaseModel):
     time_slots: List[str]
 
 
+class AvailabilityBulkCreate(BaseModel):
+    days: List[AvailabilityCreate]
+
+
 class AvailabilityResponse(BaseModel):
     date: str
     available_slots: List[str]
     booked_slots: List[str]
 
 
+class AvailabilityRuleCreate(BaseModel):
+    weekday: int  # 0 = Monday ... 6 = Sunday
+    start_time: str  # HH:MM
+    end_time: str  # HH:MM
+    slot_minutes: int = 60
+    valid_from: Optional[str] = None  # YYYY-MM-DD, today when omitted
+    valid_to: Optional[str] = None
+    exceptions: List[str] = []  # dates the rule does not apply
+
+
+class AvailabilityRuleExceptionsCreate(BaseModel):
+    dates: List[str]
+
+
 # Response Schemas
 class SuccessResponse(BaseModel):
     success: bool
@@ -0,0 +1,331 @@
+"""Incrementally maintained counters behind the manager dashboard and assistant ratings.
+
+Route handlers call the ``record_*`` helpers inside their own transaction, so the
+counters commit or roll back together with the session/rating rows they describe.
+``rebuild_stats`` recomputes everything from the source tables to repair drift;
+``check_rating_aggregates`` only compares (and optionally repairs) assistant ratings.
+"""
+
+from datetime import date, timedelta
+from sqlalchemy import func, extract, case, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from .models import (
+    User, Session as SessionModel, Rating,
+    CenterStats, CenterMonthlyStats, CenterHourlyStats, CenterDailyStats, AssistantStats
+)
+
+RATING_POINTS = (Rating.knowledge + Rating.communication + Rating.patience +
+                 Rating.engagement + Rating.problem_solving)
+
+RATING_DIMENSIONS = ("knowledge", "communication", "patience", "engagement", "problem_solving")
+
+# Average rating of an assistant from its AssistantStats row (NULL when unrated or no row)
+ASSISTANT_AVG_RATING = case(
+    (AssistantStats.rating_count > 0, AssistantStats.rating_total / (5.0 * AssistantStats.rating_count)),
+    else_=None
+)
+
+# CenterDailyStats.subject_id of sessions without a subject; a NULL would never conflict in the bucket index
+NO_SUBJECT = 0
+
+
+def _increment(db: Session, model, keys: dict, deltas: dict, defaults: dict = None):
+    """Add deltas to a counter row with one INSERT ... ON CONFLICT DO UPDATE.
+
+    ``keys`` must be the row's primary key or unique index, so concurrent first writes of the same row
+    add up instead of one failing on the duplicate key.
+    """
+    table = model.__table__
+    values = {**keys, **(defaults or {}), **deltas}
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(table).values(values)
+        statement = statement.on_duplicate_key_update({
+            column: table.c[column] + statement.inserted[column] for column in deltas
+        })
+    elif dialect in ("postgresql", "sqlite"):
+        statement = (postgresql if dialect == "postgresql" else sqlite).insert(table).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + statement.excluded[column] for column in deltas}
+        )
+    else:
+        raise ValueError(f"No counter upsert for {dialect!r}")
+
+    db.execute(statement)
+
+
+def _rating_points(rating: Rating) -> int:
+    return (rating.knowledge + rating.communication + rating.patience +
+            rating.engagement + rating.problem_solving)
+
+
+def _daily_bucket(session: SessionModel, learning_center_id: int) -> dict:
+    """CenterDailyStats key of a session, under the subject it was booked with"""
+    return {
+        "learning_center_id": learning_center_id,
+        "day": session.datetime.date(),
+        "hour": session.datetime.hour,
+        "assistant_id": session.assistant_id,
+        "subject_id": session.subject_id or NO_SUBJECT
+    }
+
+
+def record_session_booked(db: Session, session: SessionModel, learning_center_id: int):
+    """Count a newly booked session"""
+    center = {"learning_center_id": learning_center_id}
+    _increment(db, CenterStats, center, {"total_sessions": 1})
+    _increment(db, CenterMonthlyStats,
+               {**center, "year": session.datetime.year, "month": session.datetime.month},
+               {"sessions": 1})
+    _increment(db, CenterHourlyStats, {**center, "hour": session.datetime.hour}, {"sessions": 1})
+    _increment(db, AssistantStats, {"assistant_id": session.assistant_id},
+               {"total_sessions": 1}, defaults=center)
+    _increment(db, CenterDailyStats, _daily_bucket(session, learning_center_id), {"sessions": 1})
+
+
+def record_attendance(db: Session, session: SessionModel, previous_attendance, learning_center_id: int):
+    """Adjust present/absent counters after attendance was (re)marked"""
+    delta = (session.attendance == "present") - (previous_attendance == "present")
+    absent_delta = (session.attendance == "absent") - (previous_attendance == "absent")
+
+    center = {"learning_center_id": learning_center_id}
+    if delta:
+        _increment(db, CenterStats, center, {"present_sessions": delta})
+        _increment(db, AssistantStats, {"assistant_id": session.assistant_id},
+                   {"present_sessions": delta}, defaults=center)
+    if delta or absent_delta:
+        _increment(db, CenterDailyStats, _daily_bucket(session, learning_center_id),
+                   {"present_sessions": delta, "absent_sessions": absent_delta})
+
+
+def record_rating(db: Session, session: SessionModel, rating: Rating, learning_center_id: int):
+    """Count a new rating"""
+    deltas = {"rating_total": _rating_points(rating), "rating_count": 1}
+    center = {"learning_center_id": learning_center_id}
+    _increment(db, CenterStats, center, deltas)
+    _increment(db, AssistantStats, {"assistant_id": session.assistant_id},
+               {**deltas, **{f"{dimension}_total": getattr(rating, dimension) for dimension in RATING_DIMENSIONS}},
+               defaults=center)
+    _increment(db, CenterDailyStats, _daily_bucket(session, learning_center_id), deltas)
+
+
+def _assistant_rating_totals(db: Session, learning_center_id: int = None) -> dict:
+    """Rating aggregates per assistant recomputed from the ratings table"""
+    query = db.query(
+        SessionModel.assistant_id,
+        User.learning_center_id,
+        func.sum(RATING_POINTS),
+        func.count(Rating.id),
+        *[func.sum(getattr(Rating, dimension)) for dimension in RATING_DIMENSIONS]
+    ).select_from(Rating).join(
+        SessionModel, Rating.session_id == SessionModel.id
+    ).join(User, SessionModel.assistant_id == User.id)
+    if learning_center_id is not None:
+        query = query.filter(User.learning_center_id == learning_center_id)
+
+    totals = {}
+    for assistant_id, center_id, points, count, *dimension_sums in query.group_by(
+            SessionModel.assistant_id, User.learning_center_id
+    ):
+        totals[assistant_id] = {
+            "learning_center_id": center_id,
+            "rating_total": points,
+            "rating_count": count,
+            **{f"{dimension}_total": value for dimension, value in zip(RATING_DIMENSIONS, dimension_sums)}
+        }
+    return totals
+
+
+RATING_AGGREGATE_COLUMNS = ("rating_total", "rating_count") + tuple(f"{d}_total" for d in RATING_DIMENSIONS)
+
+
+def check_rating_aggregates(db: Session, learning_center_id: int = None, repair: bool = False) -> list:
+    """Compare AssistantStats rating aggregates against the ratings table.
+
+    Returns one entry per drifting assistant; with ``repair`` the stored values are overwritten.
+    """
+    expected = _assistant_rating_totals(db, learning_center_id)
+
+    query = db.query(AssistantStats)
+    if learning_center_id is not None:
+        query = query.filter(AssistantStats.learning_center_id == learning_center_id)
+    stored = {row.assistant_id: row for row in query}
+
+    drift = []
+    for assistant_id in sorted(set(expected) | set(stored)):
+        should_be = expected.get(assistant_id, {})
+        row = stored.get(assistant_id)
+        differences = {
+            column: {
+                "stored": getattr(row, column) if row else 0,
+                "expected": should_be.get(column, 0)
+            }
+            for column in RATING_AGGREGATE_COLUMNS
+            if (getattr(row, column) if row else 0) != should_be.get(column, 0)
+        }
+        if not differences:
+            continue
+
+        drift.append({"assistant_id": assistant_id, "differences": differences})
+        if repair:
+            if row is None:
+                row = AssistantStats(assistant_id=assistant_id, learning_center_id=should_be["learning_center_id"],
+                                     total_sessions=0, present_sessions=0)
+                db.add(row)
+            for column in RATING_AGGREGATE_COLUMNS:
+                setattr(row, column, should_be.get(column, 0))
+
+    return drift
+
+
+def rebuild_stats(db: Session, learning_center_id: int = None) -> dict:
+    """Recompute all counters from sessions and ratings (one center or all of them)"""
+    center_column = User.learning_center_id.label("learning_center_id")
+    present = func.sum(case((SessionModel.attendance == "present", 1), else_=0))
+
+    def sessions_query(*columns):
+        query = db.query(*columns).select_from(SessionModel).join(User, SessionModel.assistant_id == User.id)
+        if learning_center_id is not None:
+            query = query.filter(User.learning_center_id == learning_center_id)
+        return query
+
+    def ratings_query(*columns):
+        return sessions_query(*columns).join(Rating, Rating.session_id == SessionModel.id)
+
+    for model in (CenterStats, CenterMonthlyStats, CenterHourlyStats, CenterDailyStats, AssistantStats):
+        query = db.query(model)
+        if learning_center_id is not None:
+            query = query.filter(model.learning_center_id == learning_center_id)
+        query.delete(synchronize_session=False)
+
+    # Center and assistant totals
+    centers = {
+        row.learning_center_id: {
+            "learning_center_id": row.learning_center_id,
+            "total_sessions": row.total,
+            "present_sessions": row.present or 0,
+            "rating_total": 0,
+            "rating_count": 0
+        }
+        for row in sessions_query(
+            center_column, func.count(SessionModel.id).label("total"), present.label("present")
+        ).group_by(User.learning_center_id)
+    }
+    assistants = {
+        row.assistant_id: {
+            "assistant_id": row.assistant_id,
+            "learning_center_id": row.learning_center_id,
+            "total_sessions": row.total,
+            "present_sessions": row.present or 0,
+            **{column: 0 for column in RATING_AGGREGATE_COLUMNS}
+        }
+        for row in sessions_query(
+            SessionModel.assistant_id, center_column,
+            func.count(SessionModel.id).label("total"), present.label("present")
+        ).group_by(SessionModel.assistant_id, User.learning_center_id)
+    }
+
+    # Rating sums
+    for row in ratings_query(
+            center_column, func.sum(RATING_POINTS).label("points"), func.count(Rating.id).label("count")
+    ).group_by(User.learning_center_id):
+        centers[row.learning_center_id].update(rating_total=row.points, rating_count=row.count)
+
+    for assistant_id, totals in _assistant_rating_totals(db, learning_center_id).items():
+        assistants[assistant_id].update({column: totals[column] for column in RATING_AGGREGATE_COLUMNS})
+
+    # Monthly and hourly buckets
+    year = extract("year", SessionModel.datetime)
+    month = extract("month", SessionModel.datetime)
+    hour = extract("hour", SessionModel.datetime)
+
+    months = [
+        {"learning_center_id": row[0], "year": int(row[1]), "month": int(row[2]), "sessions": row[3]}
+        for row in sessions_query(center_column, year, month, func.count(SessionModel.id))
+        .group_by(User.learning_center_id, year, month)
+    ]
+    hours = [
+        {"learning_center_id": row[0], "hour": int(row[1]), "sessions": row[2]}
+        for row in sessions_query(center_column, hour, func.count(SessionModel.id))
+        .group_by(User.learning_center_id, hour)
+    ]
+
+    # Daily buckets per assistant and subject; extract() keeps the grouping portable across backends
+    day_of_month = extract("day", SessionModel.datetime)
+    bucket_subject = func.coalesce(SessionModel.subject_id, NO_SUBJECT)
+    bucket_columns = (center_column, SessionModel.assistant_id, bucket_subject, year, month, day_of_month, hour)
+
+    def bucket_key(row):
+        center_id, assistant_id, subject_id, row_year, row_month, row_day, row_hour = row[:7]
+        return (center_id, date(int(row_year), int(row_month), int(row_day)), int(row_hour),
+                assistant_id, subject_id)
+
+    days = {}
+    for row in sessions_query(
+            *bucket_columns, func.count(SessionModel.id), present,
+            func.sum(case((SessionModel.attendance == "absent", 1), else_=0))
+    ).group_by(*bucket_columns):
+        center_id, day, bucket_hour, assistant_id, subject_id = key = bucket_key(row)
+        days[key] = {
+            "learning_center_id": center_id, "day": day, "hour": bucket_hour,
+            "assistant_id": assistant_id, "subject_id": subject_id,
+            "sessions": row[7], "present_sessions": row[8] or 0, "absent_sessions": row[9] or 0,
+            "rating_total": 0, "rating_count": 0
+        }
+    for row in ratings_query(
+            *bucket_columns, func.sum(RATING_POINTS), func.count(Rating.id)
+    ).group_by(*bucket_columns):
+        days[bucket_key(row)].update(rating_total=row[7], rating_count=row[8])
+
+    for model, rows in ((CenterStats, list(centers.values())), (AssistantStats, list(assistants.values())),
+                        (CenterMonthlyStats, months), (CenterHourlyStats, hours),
+                        (CenterDailyStats, list(days.values()))):
+        if rows:
+            db.execute(insert(model), rows)
+
+    return {
+        "centers": len(centers),
+        "assistants": len(assistants),
+        "months": len(months),
+        "hours": len(hours),
+        "days": len({(key[0], key[1]) for key in days})
+    }
+
+
+TIMESERIES_GRANULARITIES = ("day", "week", "month")
+
+
+def period_start(day: date, granularity: str) -> date:
+    """First day of the day/week (Monday)/month bucket containing ``day``"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_count(date_from: date, date_to: date, granularity: str) -> int:
+    """Number of buckets period_starts() returns, computed without building them"""
+    first, last = period_start(date_from, granularity), period_start(date_to, granularity)
+    if granularity == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if granularity == "week" else 1) + 1
+
+
+def period_starts(date_from: date, date_to: date, granularity: str) -> list:
+    """Every bucket start from the one containing ``date_from`` through the one containing ``date_to``.
+
+    Steps exactly period_count() - 1 times, so the bucket after the last is never computed (it may
+    lie past date.max).
+    """
+    current = period_start(date_from, granularity)
+    starts = [current]
+    for _ in range(period_count(date_from, date_to, granularity) - 1):
+        if granularity == "month":
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=7 if granularity == "week" else 1)
+        starts.append(current)
+    return starts
@@ -0,0 +1,29 @@
+"""Subject lookups for endpoints that take a subject by name"""
+
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from .models import Subject
+
+
+def resolve_subject_id(db: Session, learning_center_id: int, name: Optional[str]) -> Optional[int]:
+    """Id of the center's subject called ``name``; None clears the subject, unknown names are a 400"""
+    if not name:
+        return None
+
+    subject_id = db.query(Subject.id).filter(
+        Subject.learning_center_id == learning_center_id,
+        Subject.name == name
+    ).scalar()
+
+    if subject_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bunday fan mavjud emas"
+        )
+    return subject_id
+
+
+def subject_ids_by_name(db: Session, learning_center_id: int) -> dict:
+    """{name: id} of every subject in the center, for validating many rows at once"""
+    return dict(db.query(Subject.name, Subject.id).filter(Subject.learning_center_id == learning_center_id).all())
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark sync vs async routes - throughput and latency of the student/assistant endpoints that
+have async variants (catalogue and session reads, and booking writes), served with
+ASYNC_ROUTES=false and then ASYNC_ROUTES=true
+
+Seeds a throwaway SQLite database (or --database-url), starts uvicorn once per mode against it and
+drives it with 50, 200 and 1000 concurrent clients. Needs httpx, which the tests use as well.
+
+Usage: python benchmark_async_routes.py [--clients 50,200,1000] [--requests 10] [--database-url URL]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+PORT = 8799
+ASSISTANTS = 20
+SESSIONS_PER_STUDENT = 3
+SLOT_TIMES = ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00", "16:00", "17:00"]
+CATALOGUE_DAYS = 7
+
+# (role, method, path) - each client cycles through these with its own token; every POST books a
+# slot no other request books, so a failed booking is an error
+ENDPOINTS = [
+    ("student", "GET", "/student/assistants"),
+    ("student", "GET", "/student/sessions?status=upcoming"),
+    ("assistant", "GET", "/assistant/sessions?status=upcoming"),
+    ("student", "POST", "/student/sessions"),
+]
+
+
+def bookings_needed(levels: list, requests: int) -> int:
+    """Bookings both modes make: warm-up plus every level"""
+    per_client = -(-requests // len(ENDPOINTS))
+    writes = sum(clients * per_client for clients in levels)
+    return 2 * (writes + min(levels))
+
+
+def seed(students: int, bookings: int):
+    """Create one center with assistants, students, sessions and free slots; return token pairs and
+    ``bookings`` distinct free slots (beyond the catalogue's days) for the booking requests"""
+    from app.database import SessionLocal, create_tables
+    from app.models import LearningCenter, Subject, User, Availability, Session as SessionModel
+    from app.auth import get_password_hash, create_access_token
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        password = get_password_hash("benchmark")
+        center = LearningCenter(name=f"Benchmark {datetime.now():%Y-%m-%d %H:%M:%S}")
+        db.add(center)
+        db.flush()
+        subject = Subject(name="Benchmark", learning_center_id=center.id)
+        db.add(subject)
+        db.flush()
+
+        def member(role: str, index: int):
+            return User(fullname=f"{role.title()} {index}", phone=f"bench{center.id}{role[0]}{index}",
+                        password=password, role=role, learning_center_id=center.id, subject_id=subject.id)
+
+        assistants = [member("assistant", i) for i in range(ASSISTANTS)]
+        student_users = [member("student", i) for i in range(students)]
+        db.add_all(assistants + student_users)
+        db.flush()
+
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        booking_days = -(-bookings // (ASSISTANTS * len(SLOT_TIMES)))
+        days = [today + timedelta(days=offset) for offset in range(1, CATALOGUE_DAYS + booking_days + 1)]
+        db.add_all([
+            Availability(assistant_id=assistant.id, date=day.strftime("%Y-%m-%d"), time_slot=time_slot,
+                         is_available="available")
+            for assistant in assistants for day in days for time_slot in SLOT_TIMES
+        ])
+        # Day by day, time by time, assistant by assistant: a student's bookings never share a time
+        booking_slots = [
+            {"assistant_id": assistant.id, "datetime": f"{day:%Y-%m-%d}T{time_slot}:00"}
+            for day in days[CATALOGUE_DAYS:] for time_slot in SLOT_TIMES for assistant in assistants
+        ][:bookings]
+        db.add_all([
+            SessionModel(student_id=student.id, assistant_id=assistants[(index + n) % ASSISTANTS].id,
+                         subject_id=subject.id,
+                         datetime=today + timedelta(days=n - 1, hours=9 + index % 8))
+            for index, student in enumerate(student_users) for n in range(SESSIONS_PER_STUDENT)
+        ])
+        db.commit()
+
+        def token(user):
+            return create_access_token({"sub": str(user.id)})
+
+        tokens = [
+            {"student": token(student), "assistant": token(assistants[index % ASSISTANTS])}
+            for index, student in enumerate(student_users)
+        ]
+        return tokens, booking_slots
+    finally:
+        db.close()
+
+
+def start_server(async_routes: bool) -> subprocess.Popen:
+    env = {**os.environ, "ASYNC_ROUTES": "true" if async_routes else "false"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning",
+         "--backlog", "4096"],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}/").status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def run_clients(tokens: list, slots, clients: int, requests: int) -> dict:
+    latencies, write_latencies = [], []
+    errors = write_errors = 0
+
+    async def client_loop(http: httpx.AsyncClient, index: int):
+        nonlocal errors, write_errors
+        pair = tokens[index % len(tokens)]
+        for n in range(requests):
+            role, method, path = ENDPOINTS[(index + n) % len(ENDPOINTS)]
+            body = next(slots) if method == "POST" else None
+            started = time.perf_counter()
+            try:
+                response = await http.request(method, path, json=body,
+                                              headers={"Authorization": f"Bearer {pair[role]}"})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            if method == "POST":
+                write_latencies.append(elapsed)
+                write_errors += not ok
+            errors += not ok
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=120) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(http, index) for index in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    write_latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "write_errors": write_errors,
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "write_p95": write_latencies[max(int(len(write_latencies) * 0.95) - 1, 0)] * 1000 if write_latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async route throughput")
+    parser.add_argument("--clients", default="50,200,1000", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=10, help="requests per client per level")
+    parser.add_argument("--database-url", help="database to seed and serve (default: a temporary SQLite file)")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.clients.split(",")]
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        directory = tempfile.mkdtemp(prefix="learning_center_benchmark_")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+    # Both servers and the tokens minted here must agree on the signing key
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+
+    print(f"🌱 Seeding {max(levels)} students on {os.environ['DATABASE_URL']}...")
+    tokens, booking_slots = seed(max(levels), bookings_needed(levels, args.requests))
+    slots = iter(booking_slots)
+
+    results = {}
+    for async_routes in (False, True):
+        mode = "async" if async_routes else "sync"
+        print(f"🚀 Serving {mode} routes...")
+        server = start_server(async_routes)
+        try:
+            asyncio.run(run_clients(tokens, slots, min(levels), 1))  # warm up caches and connections
+            for clients in levels:
+                results[mode, clients] = asyncio.run(run_clients(tokens, slots, clients, args.requests))
+                print(f"   {clients} clients done")
+        finally:
+            server.terminate()
+            server.wait()
+
+    print()
+    print(f"{'clients':>8} {'mode':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'book p95':>9} {'errors':>7} {'book err':>9}")
+    for clients in levels:
+        for mode in ("sync", "async"):
+            result = results[mode, clients]
+            print(f"{clients:>8} {mode:>6} {result['rps']:>9.1f} {result['p50']:>9.1f} "
+                  f"{result['p95']:>9.1f} {result['write_p95']:>9.1f} {result['errors']:>7} "
+                  f"{result['write_errors']:>9}")
+        speedup = results["async", clients]["rps"] / results["sync", clients]["rps"]
+        print(f"{'':>8} {'async/sync throughput':>33}: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Login load check - p99 of /auth/login while hundreds of logins are in flight at once
+
+Seeds one center on a throwaway SQLite database (or --database-url), starts uvicorn and fires bursts
+of simultaneous logins at each concurrency level. Logins beyond the hashing pool's workers and
+queue limit are answered 503 before taking a threadpool thread, so the p99 of accepted logins should stay flat as the
+burst grows instead of climbing with it. Hashes use the configured PASSWORD_HASH_ITERATIONS.
+
+Usage: python benchmark_logins.py [--clients 1,50,500] [--rounds 3] [--database-url URL]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmark_async_routes import PORT, start_server
+
+PASSWORD = "benchmark"
+
+
+def seed(users: int) -> list:
+    """Create one center with ``users`` students; return their login payloads"""
+    from app.database import SessionLocal, create_tables
+    from app.models import LearningCenter, User
+    from app.auth import get_password_hash
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        center = LearningCenter(name=f"Login benchmark {datetime.now():%Y-%m-%d %H:%M:%S}")
+        db.add(center)
+        db.flush()
+        password = get_password_hash(PASSWORD)
+        students = [
+            User(fullname=f"Student {index}", phone=f"login{center.id}_{index}", password=password,
+                 role="student", learning_center_id=center.id)
+            for index in range(users)
+        ]
+        db.add_all(students)
+        db.commit()
+        return [{"phone": student.phone, "password": PASSWORD, "learning_center_id": center.id}
+                for student in students]
+    finally:
+        db.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    return sorted(values)[max(int(len(values) * fraction) - 1, 0)] * 1000 if values else 0.0
+
+
+async def burst(logins: list, clients: int, rounds: int) -> dict:
+    accepted, shed, errors = [], [], 0
+
+    async def attempt(http: httpx.AsyncClient, payload: dict):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            response = await http.post("/auth/login", json=payload)
+        except httpx.HTTPError:
+            errors += 1
+            return
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            accepted.append(elapsed)
+        elif response.status_code == 503:
+            shed.append(elapsed)
+        else:
+            errors += 1
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=300) as http:
+        for _ in range(rounds):
+            await asyncio.gather(*(attempt(http, logins[index % len(logins)]) for index in range(clients)))
+
+    return {
+        "accepted": len(accepted),
+        "shed": len(shed),
+        "errors": errors,
+        "p50": statistics.median(accepted) * 1000 if accepted else 0.0,
+        "p99": percentile(accepted, 0.99),
+        "shed_p99": percentile(shed, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure login latency under concurrent logins")
+    parser.add_argument("--clients", default="1,50,500", help="comma-separated burst sizes")
+    parser.add_argument("--rounds", type=int, default=3, help="bursts per level")
+    parser.add_argument("--database-url", help="database to seed and serve (default: a temporary SQLite file)")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.clients.split(",")]
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        directory = tempfile.mkdtemp(prefix="learning_center_login_benchmark_")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+
+    print(f"🌱 Seeding {max(levels)} students on {os.environ['DATABASE_URL']}...")
+    logins = seed(max(levels))
+
+    results = {}
+    server = start_server(async_routes=False)
+    try:
+        asyncio.run(burst(logins, 1, 1))  # warm up
+        for clients in levels:
+            results[clients] = asyncio.run(burst(logins, clients, args.rounds))
+            print(f"   {clients} concurrent logins done")
+    finally:
+        server.terminate()
+        server.wait()
+
+    print()
+    print(f"{'clients':>8} {'ok':>6} {'503':>6} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'503 p99 ms':>11}")
+    for clients in levels:
+        result = results[clients]
+        print(f"{clients:>8} {result['accepted']:>6} {result['shed']:>6} {result['errors']:>7} "
+              f"{result['p50']:>9.1f} {result['p99']:>9.1f} {result['shed_p99']:>11.1f}")
+    print()
+    for smaller, larger in zip(levels, levels[1:]):
+        if results[smaller]["p99"]:
+            growth = results[larger]["p99"] / results[smaller]["p99"]
+            print(f"accepted-login p99 from {smaller} to {larger} clients: {growth:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
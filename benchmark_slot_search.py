@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Slot search timing - GET /student/slots/search at 500 assistants x 90 days of stored availability
+
+Seeds a throwaway SQLite database (or --database-url) with one center, its assistants spread over a
+few subjects with ratings, and SLOTS_PER_DAY slots a day for --days days, a third of them booked.
+Runs each search shape --runs times in-process and reports the database time per request (from the
+X-DB-Time-Ms header) against the 10 ms target, plus SQLite's plan for the stored-slot query.
+
+Usage: python benchmark_slot_search.py [--assistants 500] [--days 90] [--runs 50] [--database-url URL]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+TARGET_MS = 10.0
+SLOTS_PER_DAY = ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00", "16:00", "17:00"]
+SUBJECTS = ["Math", "Physics", "English", "Chemistry"]
+BATCH = 20000
+
+
+def seed(assistants: int, days: int):
+    """Create the center; return (student, first slot date)"""
+    from sqlalchemy import insert, text
+    from app.database import SessionLocal, create_tables, engine
+    from app.models import LearningCenter, Subject, User, Availability, AssistantStats
+
+    create_tables()
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        center = LearningCenter(name=f"Slot search benchmark {datetime.now():%Y-%m-%d %H:%M:%S}")
+        db.add(center)
+        db.flush()
+        subjects = [Subject(name=name, learning_center_id=center.id) for name in SUBJECTS]
+        db.add_all(subjects)
+        db.flush()
+        staff = [
+            User(fullname=f"Assistant {index}", phone=f"slots{center.id}a{index}", password="x", role="assistant",
+                 learning_center_id=center.id, subject_id=subjects[index % len(subjects)].id)
+            for index in range(assistants)
+        ]
+        student = User(fullname="Student", phone=f"slots{center.id}s", password="x", role="student",
+                       learning_center_id=center.id)
+        db.add_all(staff + [student])
+        db.flush()
+        db.execute(insert(AssistantStats), [
+            {"assistant_id": assistant.id, "learning_center_id": center.id, "rating_count": 10,
+             "rating_total": rng.randint(125, 250)}  # averages of 2.5 - 5
+            for assistant in staff
+        ])
+
+        first = datetime.now().date() + timedelta(days=1)
+        rows = (
+            {"assistant_id": assistant.id, "date": f"{first + timedelta(days=offset):%Y-%m-%d}",
+             "time_slot": time_slot, "is_available": "booked" if rng.random() < 1 / 3 else "available"}
+            for assistant in staff for offset in range(days) for time_slot in SLOTS_PER_DAY
+        )
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == BATCH:
+                db.execute(insert(Availability), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Availability), batch)
+        db.commit()
+        if engine.dialect.name == "sqlite":
+            with engine.begin() as connection:
+                connection.execute(text("ANALYZE"))
+        db.refresh(student)
+        return student, first
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the student slot search at scale")
+    parser.add_argument("--assistants", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--runs", type=int, default=50, help="requests per search shape")
+    parser.add_argument("--database-url", help="database to seed (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        directory = tempfile.mkdtemp(prefix="learning_center_slot_search_")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+    os.environ["SQL_METRICS_HEADERS"] = "true"
+
+    rows = args.assistants * args.days * len(SLOTS_PER_DAY)
+    print(f"🌱 Seeding {args.assistants} assistants x {args.days} days ({rows} slots) on {os.environ['DATABASE_URL']}...")
+    started = time.perf_counter()
+    student, first = seed(args.assistants, args.days)
+    print(f"   seeded in {time.perf_counter() - started:.1f}s")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.auth import create_access_token
+    from app.database import engine
+    from app.routes.student import slot_search_assistants, stored_free_slots_statement
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(student.id)})}"}
+    middle = first + timedelta(days=args.days // 2)
+    searches = {
+        "earliest": "",
+        "subject": "&subject=Physics",
+        "afternoon": "&time_from=14:00&time_to=17:00",
+        "rating >= 4.5": "&min_rating=4.5",
+        "all filters": "&subject=Chemistry&time_from=15:00&time_to=16:00&min_rating=4",
+        "second half": f"&date_from={middle:%Y-%m-%d}",
+        "limit 100": "&limit=100",
+    }
+
+    client = TestClient(app)
+    print()
+    print(f"{'search':>14} {'db p50 ms':>10} {'db p95 ms':>10} {'wall p50 ms':>12} {'slots':>6}")
+    worst = 0.0
+    for name, params in searches.items():
+        db_times, wall_times = [], []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            response = client.get(f"/student/slots/search?date_from={first:%Y-%m-%d}{params}", headers=headers)
+            wall_times.append((time.perf_counter() - started) * 1000)
+            db_times.append(float(response.headers["x-db-time-ms"]))
+        db_times.sort()
+        p95 = db_times[max(int(len(db_times) * 0.95) - 1, 0)]
+        worst = max(worst, p95)
+        print(f"{name:>14} {statistics.median(db_times):>10.2f} {p95:>10.2f} "
+              f"{statistics.median(wall_times):>12.2f} {len(response.json()):>6}")
+
+    print(f"\nworst db p95: {worst:.2f} ms ({'within' if worst < TARGET_MS else 'OVER'} the {TARGET_MS:.0f} ms target)")
+
+    if engine.dialect.name == "sqlite":
+        statement = stored_free_slots_statement(
+            slot_search_assistants(student.learning_center_id, "Physics", 4.0),
+            first, first + timedelta(days=args.days - 1), datetime.now(), "09:00", "18:00", 20
+        )
+        compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with engine.connect() as connection:
+            print("\nstored-slot query plan:")
+            for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params):
+                print(f"   {row[3]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Verify assistant rating aggregates - compares AssistantStats against the ratings table
+
+Usage: python check_rating_aggregates.py [--repair] [learning_center_id]
+"""
+
+import sys
+from app.database import SessionLocal, create_tables
+from app.stats import check_rating_aggregates
+
+
+def main():
+    args = sys.argv[1:]
+    repair = "--repair" in args
+    args = [arg for arg in args if arg != "--repair"]
+    learning_center_id = int(args[0]) if args else None
+    target = f"o'quv markaz #{learning_center_id}" if learning_center_id else "barcha o'quv markazlar"
+    print(f"🔍 Checking assistant rating aggregates for {target}...")
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        drift = check_rating_aggregates(db, learning_center_id, repair=repair)
+        for entry in drift:
+            details = ", ".join(
+                f"{column}: {values['stored']} != {values['expected']}"
+                for column, values in entry["differences"].items()
+            )
+            print(f"⚠️  Assistant #{entry['assistant_id']}: {details}")
+
+        if not drift:
+            print("✅ No drift found")
+        elif repair:
+            db.commit()
+            print(f"✅ Repaired {len(drift)} assistant(s)")
+        else:
+            print(f"❌ {len(drift)} assistant(s) drifted; run with --repair to fix")
+            sys.exit(1)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error checking rating aggregates: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
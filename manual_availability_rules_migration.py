@@ -0,0 +1,45 @@
+"""Manual migration for recurring weekly availability rules"""
+
+revision = 'c71e4f2a9b58'
+down_revision = '4b8d2e61f0a3'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade() -> None:
+    op.create_table(
+        'availability_rules',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('assistant_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('weekday', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.String(), nullable=False),
+        sa.Column('end_time', sa.String(), nullable=False),
+        sa.Column('slot_minutes', sa.Integer(), nullable=False, server_default='60'),
+        sa.Column('valid_from', sa.String(), nullable=False),
+        sa.Column('valid_to', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index('ix_availability_rules_id', 'availability_rules', ['id'])
+    op.create_index('ix_availability_rules_assistant_id_weekday', 'availability_rules', ['assistant_id', 'weekday'])
+
+    op.create_table(
+        'availability_rule_exceptions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('rule_id', sa.Integer(), sa.ForeignKey('availability_rules.id'), nullable=False),
+        sa.Column('date', sa.String(), nullable=False),
+    )
+    op.create_index('ix_availability_rule_exceptions_id', 'availability_rule_exceptions', ['id'])
+    op.create_index('ux_availability_rule_exceptions_rule_id_date', 'availability_rule_exceptions',
+                    ['rule_id', 'date'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_availability_rule_exceptions_rule_id_date', table_name='availability_rule_exceptions')
+    op.drop_index('ix_availability_rule_exceptions_id', table_name='availability_rule_exceptions')
+    op.drop_table('availability_rule_exceptions')
+    op.drop_index('ix_availability_rules_assistant_id_weekday', table_name='availability_rules')
+    op.drop_index('ix_availability_rules_id', table_name='availability_rules')
+    op.drop_table('availability_rules')
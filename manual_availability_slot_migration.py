@@ -0,0 +1,33 @@
+"""Manual migration to make availability slots unique per assistant/date/time"""
+
+revision = '9a3e5c72d1f4'
+down_revision = '6d1f0a9c4b27'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+
+def upgrade() -> None:
+    # Drop duplicate slots, keeping a booked row when there is one
+    op.execute("""
+        DELETE FROM availability WHERE id NOT IN (
+            SELECT (
+                SELECT b.id FROM availability b
+                WHERE b.assistant_id = a.assistant_id AND b.date = a.date AND b.time_slot = a.time_slot
+                ORDER BY CASE WHEN b.is_available = 'booked' THEN 0 ELSE 1 END, b.id
+                LIMIT 1
+            )
+            FROM availability a
+        )
+    """)
+
+    op.drop_index('ix_availability_assistant_id_date_time_slot_is_available', table_name='availability')
+    op.create_index('ux_availability_assistant_id_date_time_slot', 'availability',
+                    ['assistant_id', 'date', 'time_slot'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_availability_assistant_id_date_time_slot', table_name='availability')
+    op.create_index('ix_availability_assistant_id_date_time_slot_is_available', 'availability',
+                    ['assistant_id', 'date', 'time_slot', 'is_available'], unique=False)
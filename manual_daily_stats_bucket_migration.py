@@ -0,0 +1,57 @@
+"""Manual migration: center_daily_stats.subject_id becomes NOT NULL with 0 for "no subject".
+
+NULLs never conflict in ux_center_daily_stats_bucket, so racing upserts of a subject-less bucket
+created duplicate rows. The rollup is derived data: the table is recreated empty and refilled by
+the startup rebuild or `python rebuild_stats.py`.
+"""
+
+revision = '3d7b9e2f6a41'
+down_revision = '8c2f4a6d1b39'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def _counter(name):
+    return sa.Column(name, sa.Integer(), nullable=False, server_default='0')
+
+
+def _create_daily_stats(subject_column):
+    op.create_table(
+        'center_daily_stats',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('learning_center_id', sa.Integer(), sa.ForeignKey('learning_centers.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('hour', sa.Integer(), nullable=False),
+        sa.Column('assistant_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        subject_column,
+        _counter('sessions'),
+        _counter('present_sessions'),
+        _counter('absent_sessions'),
+        _counter('rating_total'),
+        _counter('rating_count'),
+    )
+    op.create_index('ix_center_daily_stats_id', 'center_daily_stats', ['id'])
+    op.create_index(
+        'ux_center_daily_stats_bucket', 'center_daily_stats',
+        ['learning_center_id', 'day', 'hour', 'assistant_id', 'subject_id'], unique=True
+    )
+
+
+def _drop_daily_stats():
+    op.drop_index('ux_center_daily_stats_bucket', table_name='center_daily_stats')
+    op.drop_index('ix_center_daily_stats_id', table_name='center_daily_stats')
+    op.drop_table('center_daily_stats')
+
+
+def upgrade() -> None:
+    _drop_daily_stats()
+    _create_daily_stats(sa.Column('subject_id', sa.Integer(), nullable=False, server_default='0'))
+    # The rollup starts empty; fill it with `python rebuild_stats.py` (the API also does on startup)
+
+
+def downgrade() -> None:
+    _drop_daily_stats()
+    _create_daily_stats(sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id'), nullable=True))
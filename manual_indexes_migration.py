@@ -0,0 +1,80 @@
+"""Manual migration to add composite indexes for hot router filters"""
+
+revision = '6d1f0a9c4b27'
+down_revision = '28b3e44b6539'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def _check_unique_keys() -> None:
+    """Stop before the unique indexes if existing rows violate them.
+
+    Which duplicate to keep is a data decision (ratings are user input, users own sessions), so the
+    migration only lists the conflicts; resolve them by hand and run it again.
+    """
+    connection = op.get_bind()
+    ids = _id_list(connection)
+    conflicts = []
+    for session_id, rating_ids in connection.execute(sa.text(f"""
+        SELECT session_id, rating_ids FROM (
+            SELECT session_id, COUNT(*) AS duplicates, MIN(id) AS first_id,
+                   {ids} AS rating_ids
+            FROM ratings GROUP BY session_id
+        ) AS grouped WHERE duplicates > 1 ORDER BY first_id
+    """)):
+        conflicts.append(f"ratings.session_id={session_id}: rating ids {rating_ids}")
+    for phone, learning_center_id, user_ids in connection.execute(sa.text(f"""
+        SELECT phone, learning_center_id, user_ids FROM (
+            SELECT phone, learning_center_id, COUNT(*) AS duplicates, MIN(id) AS first_id,
+                   {ids} AS user_ids
+            FROM users WHERE learning_center_id IS NOT NULL GROUP BY phone, learning_center_id
+        ) AS grouped WHERE duplicates > 1 ORDER BY first_id
+    """)):
+        conflicts.append(f"users phone={phone} learning_center_id={learning_center_id}: user ids {user_ids}")
+
+    if conflicts:
+        raise RuntimeError(
+            "Unique indexes ux_ratings_session_id / ux_users_phone_learning_center_id cannot be created; "
+            "resolve these duplicates first:\n  " + "\n  ".join(conflicts)
+        )
+
+
+def _id_list(connection) -> str:
+    """Comma-separated ids of a group in this dialect"""
+    if connection.dialect.name == "postgresql":
+        return "STRING_AGG(CAST(id AS VARCHAR), ',' ORDER BY id)"
+    if connection.dialect.name == "mysql":
+        return "GROUP_CONCAT(id ORDER BY id)"
+    return "GROUP_CONCAT(id)"
+
+
+def upgrade() -> None:
+    # Before any DDL, so a failed run leaves nothing behind on backends without transactional DDL
+    _check_unique_keys()
+
+    # Session lookups by assistant/student and time
+    op.create_index('ix_sessions_assistant_id_datetime', 'sessions', ['assistant_id', 'datetime'], unique=False)
+    op.create_index('ix_sessions_student_id_datetime', 'sessions', ['student_id', 'datetime'], unique=False)
+
+    # Slot lookups for booking and the assistant catalogue
+    op.create_index('ix_availability_assistant_id_date_time_slot_is_available', 'availability',
+                    ['assistant_id', 'date', 'time_slot', 'is_available'], unique=False)
+
+    # One rating per session
+    op.create_index('ux_ratings_session_id', 'ratings', ['session_id'], unique=True)
+
+    # Center user lists and login / phone uniqueness checks
+    op.create_index('ix_users_learning_center_id_role', 'users', ['learning_center_id', 'role'], unique=False)
+    op.create_index('ux_users_phone_learning_center_id', 'users', ['phone', 'learning_center_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_users_phone_learning_center_id', table_name='users')
+    op.drop_index('ix_users_learning_center_id_role', table_name='users')
+    op.drop_index('ux_ratings_session_id', table_name='ratings')
+    op.drop_index('ix_availability_assistant_id_date_time_slot_is_available', table_name='availability')
+    op.drop_index('ix_sessions_student_id_datetime', table_name='sessions')
+    op.drop_index('ix_sessions_assistant_id_datetime', table_name='sessions')
@@ -0,0 +1,31 @@
+"""Manual migration: sessions remember the subject they were booked under.
+
+The daily rollup attributes a session to this subject, so attendance and ratings marked after the
+assistant changes subject still land in the booking's bucket. Existing sessions get their
+assistant's current subject, which is what the rollup was rebuilt from so far.
+"""
+
+revision = 'a5c1e8d37f02'
+down_revision = '3d7b9e2f6a41'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.add_column(sa.Column('subject_id', sa.Integer(), nullable=True))
+
+    op.execute("""
+        UPDATE sessions SET subject_id = (SELECT u.subject_id FROM users u WHERE u.id = sessions.assistant_id)
+    """)
+
+    # Buckets written before this may have split across subjects; the startup rebuild refills them
+    op.execute("DELETE FROM center_daily_stats")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_column('subject_id')
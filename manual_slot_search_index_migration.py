@@ -0,0 +1,17 @@
+"""Manual migration adding the index behind the student slot search"""
+
+revision = 'e24b9d07c6a1'
+down_revision = 'c71e4f2a9b58'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+
+def upgrade() -> None:
+    op.create_index('ix_availability_is_available_date_time_slot', 'availability',
+                    ['is_available', 'date', 'time_slot', 'assistant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_availability_is_available_date_time_slot', table_name='availability')
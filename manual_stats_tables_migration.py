@@ -0,0 +1,61 @@
+"""Manual migration for the denormalized dashboard and assistant rating counters"""
+
+revision = '4b8d2e61f0a3'
+down_revision = '9a3e5c72d1f4'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def _counter(name):
+    return sa.Column(name, sa.Integer(), nullable=False, server_default='0')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'center_stats',
+        sa.Column('learning_center_id', sa.Integer(), sa.ForeignKey('learning_centers.id'), primary_key=True),
+        _counter('total_sessions'),
+        _counter('present_sessions'),
+        _counter('rating_total'),
+        _counter('rating_count'),
+    )
+    op.create_table(
+        'center_monthly_stats',
+        sa.Column('learning_center_id', sa.Integer(), sa.ForeignKey('learning_centers.id'), primary_key=True),
+        sa.Column('year', sa.Integer(), primary_key=True),
+        sa.Column('month', sa.Integer(), primary_key=True),
+        _counter('sessions'),
+    )
+    op.create_table(
+        'center_hourly_stats',
+        sa.Column('learning_center_id', sa.Integer(), sa.ForeignKey('learning_centers.id'), primary_key=True),
+        sa.Column('hour', sa.Integer(), primary_key=True),
+        _counter('sessions'),
+    )
+    op.create_table(
+        'assistant_stats',
+        sa.Column('assistant_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('learning_center_id', sa.Integer(), sa.ForeignKey('learning_centers.id'), nullable=False),
+        _counter('total_sessions'),
+        _counter('present_sessions'),
+        _counter('rating_total'),
+        _counter('rating_count'),
+        _counter('knowledge_total'),
+        _counter('communication_total'),
+        _counter('patience_total'),
+        _counter('engagement_total'),
+        _counter('problem_solving_total'),
+    )
+    op.create_index('ix_assistant_stats_learning_center_id', 'assistant_stats', ['learning_center_id'])
+    # The counters start empty; fill them with `python rebuild_stats.py`
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assistant_stats_learning_center_id', table_name='assistant_stats')
+    op.drop_table('assistant_stats')
+    op.drop_table('center_hourly_stats')
+    op.drop_table('center_monthly_stats')
+    op.drop_table('center_stats')
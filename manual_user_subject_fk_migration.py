@@ -0,0 +1,53 @@
+"""Manual migration replacing users.subject_field with a subject foreign key"""
+
+revision = '5f3a8c1d2e97'
+down_revision = 'e24b9d07c6a1'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('subject_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_users_subject_id_subjects', 'subjects', ['subject_id'], ['id'])
+        batch_op.create_index('ix_users_subject_id', ['subject_id'])
+
+    # Names without a subject row in their center become subjects, so no assignment is lost
+    op.execute("""
+        INSERT INTO subjects (name, learning_center_id, created_at)
+        SELECT DISTINCT u.subject_field, u.learning_center_id, CURRENT_TIMESTAMP
+        FROM users u
+        WHERE u.subject_field IS NOT NULL AND u.subject_field != '' AND u.learning_center_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM subjects s
+              WHERE s.name = u.subject_field AND s.learning_center_id = u.learning_center_id
+          )
+    """)
+    op.execute("""
+        UPDATE users SET subject_id = (
+            SELECT MIN(s.id) FROM subjects s
+            WHERE s.name = users.subject_field AND s.learning_center_id = users.learning_center_id
+        )
+        WHERE subject_field IS NOT NULL AND subject_field != ''
+    """)
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('subject_field')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('subject_field', sa.String(), nullable=True))
+
+    op.execute("""
+        UPDATE users SET subject_field = (SELECT s.name FROM subjects s WHERE s.id = users.subject_id)
+        WHERE subject_id IS NOT NULL
+    """)
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_index('ix_users_subject_id')
+        batch_op.drop_constraint('fk_users_subject_id_subjects', type_='foreignkey')
+        batch_op.drop_column('subject_id')
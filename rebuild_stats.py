@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Rebuild dashboard counters - recomputes center/assistant stats from sessions and ratings
+
+Usage: python rebuild_stats.py [learning_center_id]
+"""
+
+import sys
+from app.database import SessionLocal, create_tables
+from app.stats import rebuild_stats
+
+
+def main():
+    learning_center_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    target = f"o'quv markaz #{learning_center_id}" if learning_center_id else "barcha o'quv markazlar"
+    print(f"🔄 Rebuilding stats for {target}...")
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        summary = rebuild_stats(db, learning_center_id)
+        db.commit()
+        print(f"✅ Centers: {summary['centers']}, assistants: {summary['assistants']}, "
+              f"months: {summary['months']}, hours: {summary['hours']}, days: {summary['days']}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error rebuilding stats: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print("🎉 Stats rebuild complete!")
+
+
+if __name__ == "__main__":
+    main()
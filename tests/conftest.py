@@ -0,0 +1,88 @@
+"""Shared fixtures: the app on a throwaway SQLite database, plus a factory for seeded centers"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Configure the app before it is imported: its database, cheap password hashes and the per-request
+# SQL statement headers of app/instrumentation.py
+_database_dir = tempfile.mkdtemp(prefix="learning_center_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ["PASSWORD_HASH_ITERATIONS"] = "1000"
+os.environ["SQL_METRICS_HEADERS"] = "true"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import SessionLocal, create_tables
+from app.models import LearningCenter, User, Subject, Availability
+from app.auth import get_password_hash, create_access_token, principal_cache
+
+create_tables()
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def auth_headers(user) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+
+def statement_count(response) -> int:
+    """Statements the request executed, from the X-DB-Statements header"""
+    return int(response.headers["x-db-statements"])
+
+
+@pytest.fixture
+def make_center(db):
+    """Create a learning center with a manager, assistants, students and tomorrow's free slots"""
+    password = get_password_hash("secret")
+    created = 0
+
+    def make(assistants: int = 1, students: int = 1, slots=("10:00", "11:00")):
+        nonlocal created
+        created += 1
+        center = LearningCenter(name=f"Center {datetime.now().timestamp()} {created}")
+        db.add(center)
+        db.flush()
+        subject = Subject(name="Math", learning_center_id=center.id)
+        manager = User(fullname="Manager", phone=f"m{center.id}", password=password, role="manager",
+                       learning_center_id=center.id)
+        db.add_all([subject, manager])
+        db.flush()
+
+        def member(role: str, index: int):
+            return User(fullname=f"{role.title()} {index}", phone=f"{role[0]}{center.id}_{index}",
+                        password=password, role=role, learning_center_id=center.id, subject_id=subject.id)
+
+        assistant_users = [member("assistant", i) for i in range(assistants)]
+        student_users = [member("student", i) for i in range(students)]
+        db.add_all(assistant_users + student_users)
+        db.flush()
+
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        db.add_all([
+            Availability(assistant_id=assistant.id, date=tomorrow, time_slot=time_slot, is_available="available")
+            for assistant in assistant_users for time_slot in slots
+        ])
+        db.commit()
+        for row in [center, subject, manager] + assistant_users + student_users:
+            db.refresh(row)
+        return SimpleNamespace(center=center, subject=subject, manager=manager, assistants=assistant_users,
+                               students=student_users, slot_date=tomorrow)
+
+    yield make
+    principal_cache.clear()
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import analytics
+from app.models import Session as SessionModel, Rating, Subject
+from .conftest import auth_headers
+
+
+@pytest.fixture
+def refresh_every_request(monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_REFRESH_SECONDS", 0)
+
+
+def heatmap_sessions(client, center) -> int:
+    response = client.get("/manager/analytics/heatmap", headers=auth_headers(center.manager))
+    assert response.status_code == 200
+    return sum(map(sum, response.json()["sessions"]))
+
+
+def rated_sessions(client, center) -> int:
+    response = client.get("/manager/analytics/ratings", headers=auth_headers(center.manager))
+    return sum(subject["ratings"] for subject in response.json()["subjects"])
+
+
+def test_rows_committed_below_the_watermark_are_picked_up(client, make_center, db, refresh_every_request):
+    center = make_center(assistants=1, students=1)
+    other = make_center(assistants=1, students=1)
+
+    def session(owner, hours: int) -> SessionModel:
+        return SessionModel(student_id=owner.students[0].id, assistant_id=owner.assistants[0].id,
+                            subject_id=owner.subject.id, datetime=datetime.now() - timedelta(hours=hours))
+
+    sessions = [session(center, hours) for hours in (1, 2, 3)]
+    db.add_all(sessions)
+    db.commit()
+    # The middle id "has not committed yet" when the snapshot is loaded
+    late = {"id": sessions[1].id, "student_id": sessions[1].student_id, "assistant_id": sessions[1].assistant_id,
+            "subject_id": sessions[1].subject_id, "datetime": sessions[1].datetime}
+    db.delete(sessions[1])
+    db.commit()
+    assert heatmap_sessions(client, center) == 2
+
+    late_session = SessionModel(**late)
+    db.add_all([late_session, session(other, 1)])
+    db.commit()
+    db.add(Rating(session_id=late_session.id, knowledge=5, communication=5, patience=5, engagement=5,
+                  problem_solving=5))
+    db.commit()
+
+    assert heatmap_sessions(client, center) == 3
+    assert rated_sessions(client, center) == 1
+    assert heatmap_sessions(client, other) == 1
+
+
+def test_sessions_stay_under_the_subject_they_were_booked_under(client, make_center, db):
+    center = make_center(assistants=1, students=1)
+    assistant, student = center.assistants[0], center.students[0]
+    math = center.subject
+    session = SessionModel(student_id=student.id, assistant_id=assistant.id, subject_id=math.id,
+                           datetime=datetime.now() - timedelta(days=1))
+    db.add(session)
+    db.flush()
+    db.add(Rating(session_id=session.id, knowledge=4, communication=4, patience=4, engagement=4,
+                  problem_solving=4))
+    english = Subject(name="Eng", learning_center_id=center.center.id)
+    db.add(english)
+    db.flush()
+    assistant.subject_id = english.id
+    db.commit()
+    headers = auth_headers(center.manager)
+
+    subjects = client.get("/manager/analytics/ratings", headers=headers).json()["subjects"]
+    assert [(subject["subject_id"], subject["subject"], subject["ratings"]) for subject in subjects] == [
+        (math.id, "Math", 1)
+    ]
+
+    [row] = client.get("/manager/analytics/fill-rate", headers=headers).json()["assistants"]
+    assert row["sessions_by_subject"] == [{"subject_id": math.id, "subject": "Math", "sessions": 1}]
+
+    for subject_id, sessions in ((math.id, 1), (english.id, 0)):
+        response = client.get(f"/manager/analytics/heatmap?subject_id={subject_id}", headers=headers)
+        assert sum(map(sum, response.json()["sessions"])) == sessions
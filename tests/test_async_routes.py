@@ -0,0 +1,66 @@
+import asyncio
+import importlib
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from app.response_cache import response_cache
+from .conftest import auth_headers
+
+
+@pytest.fixture
+def async_app(monkeypatch):
+    """app.main rebuilt with ASYNC_ROUTES=true, restored afterwards"""
+    monkeypatch.setenv("ASYNC_ROUTES", "true")
+    yield importlib.reload(app.main).app
+    monkeypatch.undo()
+    importlib.reload(app.main)
+
+
+def test_async_catalogue_and_booking_match_the_sync_routes(client, async_app, make_center):
+    center = make_center(assistants=2, students=2)
+    assistant, student = center.assistants[0], center.students[0]
+    headers = auth_headers(student)
+    expected = client.get("/student/assistants", headers=headers).json()
+
+    with TestClient(async_app) as async_client:
+        response_cache.clear()
+        assert async_client.get("/student/assistants", headers=headers).json() == expected
+
+        slot = f"{center.slot_date}T10:00:00"
+        response = async_client.post("/student/sessions", headers=headers,
+                                     json={"assistant_id": assistant.id, "datetime": slot})
+        assert response.status_code == 200
+        response = async_client.post("/student/sessions", headers=auth_headers(center.students[1]),
+                                     json={"assistant_id": assistant.id, "datetime": slot})
+        assert response.status_code == 400
+
+        # The booking invalidated the cached catalogue, for the async and the sync route alike
+        [entry] = [entry for entry in async_client.get("/student/assistants", headers=headers).json()
+                   if entry["id"] == assistant.id]
+        assert entry["available_slots"] == [f"{center.slot_date} 11:00"]
+        assert client.get("/student/assistants", headers=headers).json() == \
+            async_client.get("/student/assistants", headers=headers).json()
+
+        sessions = async_client.get("/student/sessions?status=upcoming", headers=headers).json()
+        assert sessions == client.get("/student/sessions?status=upcoming", headers=headers).json()
+        assert [session["assistant_name"] for session in sessions] == [assistant.fullname]
+
+
+def test_concurrent_async_catalogue_requests_compute_once(async_app, make_center):
+    center = make_center(assistants=3, students=1)
+    headers = auth_headers(center.students[0])
+    response_cache.clear()
+    executions = response_cache.flights.executions
+
+    async def burst():
+        transport = httpx.ASGITransport(app=async_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.get("/student/assistants", headers=headers) for _ in range(20)))
+
+    responses = asyncio.run(burst())
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert response_cache.flights.executions - executions == 1
@@ -0,0 +1,56 @@
+from sqlalchemy import event, text
+
+from app.auth import principal_cache, invalidate_user
+from app.database import engine
+from app.models import User
+from .conftest import auth_headers
+
+
+def test_cached_principal_carries_no_password_and_no_orm_state(client, make_center):
+    center = make_center()
+    manager = center.manager
+    assert client.get("/manager/users?role=student", headers=auth_headers(manager)).status_code == 200
+
+    principal = principal_cache.get(manager.id)
+    assert not isinstance(principal, User)
+    assert not hasattr(principal, "password")
+    assert (principal.id, principal.role, principal.learning_center_id) == (
+        manager.id, "manager", center.center.id
+    )
+
+
+def test_invalidation_racing_a_principal_load_is_not_overwritten(client, make_center):
+    center = make_center()
+    manager = center.manager
+    headers = auth_headers(manager)
+    principal_cache.clear()
+    demoted = []
+
+    def demote_after_read(connection, cursor, statement, *args):
+        # The request has read the manager row; the demotion commits and invalidates before it caches
+        if not demoted and statement.startswith("SELECT users.id, users.role"):
+            demoted.append(True)
+            with engine.begin() as writer:
+                writer.execute(text("UPDATE users SET role = 'student' WHERE id = :id"), {"id": manager.id})
+            invalidate_user(manager.id)
+
+    event.listen(engine, "after_cursor_execute", demote_after_read)
+    try:
+        assert client.get("/manager/users?role=student", headers=headers).status_code == 200
+    finally:
+        event.remove(engine, "after_cursor_execute", demote_after_read)
+
+    assert demoted
+    assert principal_cache.get(manager.id) is None
+    assert client.get("/manager/users?role=student", headers=headers).status_code == 403
+
+
+def test_profile_routes_change_the_users_own_row(client, make_center, db):
+    center = make_center()
+    student = center.students[0]
+    response = client.put("/auth/update-profile", headers=auth_headers(student), json={"fullname": "Renamed"})
+
+    assert response.status_code == 200
+    assert response.json()["updated_user"]["fullname"] == "Renamed"
+    db.expire_all()
+    assert db.get(User, student.id).fullname == "Renamed"
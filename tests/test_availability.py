@@ -0,0 +1,32 @@
+from app.models import Availability
+from .conftest import auth_headers
+
+
+def test_off_grid_slots_are_listed_and_bookable(client, make_center, db):
+    center = make_center(assistants=1, students=1, slots=("10:00",))
+    assistant, student = center.assistants[0], center.students[0]
+    # A legacy row from before the 15-minute grid, and a new off-grid time through the API
+    db.add(Availability(assistant_id=assistant.id, date=center.slot_date, time_slot="10:10",
+                        is_available="available"))
+    db.commit()
+    response = client.post("/assistant/availability", headers=auth_headers(assistant),
+                           json={"date": center.slot_date, "time_slots": ["10:00", "10:10", "11:05"]})
+    assert response.status_code == 200
+
+    response = client.get("/assistant/availability", headers=auth_headers(assistant))
+    assert response.json() == [
+        {"date": center.slot_date, "available_slots": ["10:00", "10:10", "11:05"], "booked_slots": []}
+    ]
+
+    response = client.get("/student/assistants", headers=auth_headers(student))
+    [entry] = [entry for entry in response.json() if entry["id"] == assistant.id]
+    assert entry["available_slots"] == [f"{center.slot_date} {time}" for time in ("10:00", "10:10", "11:05")]
+
+    response = client.post("/student/sessions", headers=auth_headers(student),
+                           json={"assistant_id": assistant.id, "datetime": f"{center.slot_date}T10:10:00"})
+    assert response.status_code == 200
+
+    response = client.get("/assistant/availability", headers=auth_headers(assistant))
+    assert response.json() == [
+        {"date": center.slot_date, "available_slots": ["10:00", "11:05"], "booked_slots": ["10:10"]}
+    ]
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import AvailabilityRule
+from .conftest import auth_headers
+
+
+def book(client, student, assistant, moment: str):
+    return client.post("/student/sessions", headers=auth_headers(student),
+                       json={"assistant_id": assistant.id, "datetime": moment})
+
+
+def statements_of(request) -> list:
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = request()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return response, statements
+
+
+def add_rule(db, assistant, day: str):
+    weekday = datetime.strptime(day, "%Y-%m-%d").weekday()
+    db.add(AvailabilityRule(assistant_id=assistant.id, weekday=weekday, start_time="14:00", end_time="16:00",
+                            slot_minutes=60, valid_from=day))
+    db.commit()
+
+
+def test_failed_booking_outside_the_rules_needs_no_extra_round_trips(client, make_center, db):
+    center = make_center(assistants=1, students=2, slots=("10:00",))
+    assistant, first, second = center.assistants[0], *center.students
+    add_rule(db, assistant, center.slot_date)
+    assert book(client, first, assistant, f"{center.slot_date}T10:00:00").status_code == 200
+    book(client, second, assistant, f"{center.slot_date}T11:00:00")  # caches the principal
+
+    for time_slot in ("10:00", "11:00"):  # booked stored slot, and a slot nothing offers
+        response, statements = statements_of(
+            lambda: book(client, second, assistant, f"{center.slot_date}T{time_slot}:00")
+        )
+        assert response.status_code == 400
+        # The assistant (joined with its rules for the day) and the compare-and-set, nothing else
+        assert len(statements) == 2, statements
+        assert statements[1].startswith("UPDATE availability")
+
+
+def test_rule_slots_are_booked_once(client, make_center, db):
+    center = make_center(assistants=1, students=2, slots=())
+    assistant, first, second = center.assistants[0], *center.students
+    add_rule(db, assistant, center.slot_date)
+
+    assert book(client, first, assistant, f"{center.slot_date}T14:00:00").status_code == 200
+    response = book(client, second, assistant, f"{center.slot_date}T14:00:00")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Bu vaqt band yoki mavjud emas"
+    assert book(client, second, assistant, f"{center.slot_date}T15:00:00").status_code == 200
+    # 14:30 is inside the rule's hours but not one of its slot starts
+    assert book(client, second, assistant, f"{center.slot_date}T14:30:00").status_code == 400
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Availability, Session as SessionModel
+from .conftest import auth_headers
+
+BOOKERS = 200
+
+
+def test_simultaneous_bookings_of_one_slot_have_one_winner(make_center, db):
+    center = make_center(assistants=1, students=BOOKERS, slots=("10:00",))
+    assistant = center.assistants[0]
+    slot = f"{center.slot_date}T10:00:00"
+    headers = [auth_headers(student) for student in center.students]
+
+    clients = threading.local()
+    start = threading.Barrier(50)
+
+    def book(index: int):
+        if not hasattr(clients, "client"):
+            clients.client = TestClient(app)
+            start.wait()  # release the first wave together
+        response = clients.client.post("/student/sessions", headers=headers[index],
+                                       json={"assistant_id": assistant.id, "datetime": slot})
+        return response.status_code, response.json()
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        results = list(pool.map(book, range(BOOKERS)))
+
+    statuses = [status for status, _ in results]
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == BOOKERS - 1
+    assert {body["detail"] for status, body in results if status == 400} == {"Bu vaqt band yoki mavjud emas"}
+
+    assert db.query(SessionModel).filter(SessionModel.assistant_id == assistant.id).count() == 1
+    assert db.query(Availability.is_available).filter(
+        Availability.assistant_id == assistant.id
+    ).scalar() == "booked"
+
+
+def test_simultaneous_ratings_of_one_session_have_one_winner(make_center, db):
+    center = make_center(assistants=1, students=1, slots=())
+    session = SessionModel(student_id=center.students[0].id, assistant_id=center.assistants[0].id,
+                           subject_id=center.subject.id, datetime=datetime.now() - timedelta(days=1),
+                           attendance="present")
+    db.add(session)
+    db.commit()
+    headers = auth_headers(center.students[0])
+    submitters = 20
+    start = threading.Barrier(submitters)
+
+    def rate(_):
+        client = TestClient(app)
+        start.wait()
+        response = client.post("/student/ratings", headers=headers, json={
+            "session_id": session.id, "knowledge": 5, "communication": 5, "patience": 5, "engagement": 5,
+            "problem_solving": 5
+        })
+        return response.status_code, response.json()
+
+    with ThreadPoolExecutor(max_workers=submitters) as pool:
+        results = list(pool.map(rate, range(submitters)))
+
+    statuses = [status for status, _ in results]
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == submitters - 1
+    assert {body["detail"] for status, body in results if status == 400} == {"Bu dars allaqachon baholangan"}
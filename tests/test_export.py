@@ -0,0 +1,47 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import Session as SessionModel
+from .conftest import auth_headers
+
+
+def export_with_statement_count(client, center):
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/manager/export/sessions?format=csv", headers=auth_headers(center.manager))
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return response, len(statements)
+
+
+def test_session_export_is_one_statement_per_center(client, make_center, db):
+    counts = {}
+    for size in (2, 20):
+        center = make_center(assistants=size, students=1)
+        start = datetime.now() + timedelta(days=1)
+        db.add_all([
+            SessionModel(student_id=center.students[0].id, assistant_id=assistant.id,
+                         subject_id=center.subject.id, datetime=start - timedelta(hours=hour))
+            for assistant in center.assistants for hour in range(3)
+        ])
+        db.commit()
+
+        response, counts[size] = export_with_statement_count(client, center)
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == size * 3
+        # By assistant, then oldest first
+        assert [(int(row["assistant_id"]), row["datetime"]) for row in rows] == sorted(
+            (int(row["assistant_id"]), row["datetime"]) for row in rows
+        )
+
+    assert counts[2] == counts[20]
@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.hashing import HashingPool
+from app.main import app
+from app.models import User
+
+LOGINS = 500
+HASH_SECONDS = 0.05
+
+
+def login(client, user, password="secret"):
+    return client.post("/auth/login", json={"phone": user.phone, "password": password,
+                                            "learning_center_id": user.learning_center_id})
+
+
+def test_login_upgrades_a_legacy_hash(client, make_center, db):
+    student = make_center().students[0]
+    legacy = f"salt:{hashlib.sha256(b'oldpasssalt').hexdigest()}"
+    db.query(User).filter(User.id == student.id).update({"password": legacy})
+    db.commit()
+
+    assert login(client, student, "oldpass").status_code == 200
+    db.expire_all()
+    stored = db.get(User, student.id).password
+    assert stored.startswith(f"{auth.PASSWORD_HASH_SCHEME}${auth.PASSWORD_HASH_ITERATIONS}$")
+    assert login(client, student, "oldpass").status_code == 200
+
+
+def test_concurrent_logins_are_shed_instead_of_queued(make_center, monkeypatch):
+    student = make_center().students[0]
+    pool = HashingPool(workers=2, max_pending=4)
+    verify = auth._verify_password
+    queued = []
+
+    def slow_verify(plain_password, hashed_password):
+        queued.append(pool.stats()["queued"])
+        time.sleep(HASH_SECONDS)  # stands in for a production-strength KDF
+        return verify(plain_password, hashed_password)
+
+    monkeypatch.setattr(auth, "hashing_pool", pool)
+    monkeypatch.setattr(auth, "_verify_password", slow_verify)
+
+    clients = threading.local()
+
+    def attempt(_):
+        if not hasattr(clients, "client"):
+            clients.client = TestClient(app)
+        return login(clients.client, student)
+
+    with ThreadPoolExecutor(max_workers=100) as executor:
+        responses = list(executor.map(attempt, range(LOGINS)))
+
+    statuses = [response.status_code for response in responses]
+    assert set(statuses) == {200, 503}
+    assert all(response.headers["retry-after"] == "1" for response in responses if response.status_code == 503)
+    assert pool.stats()["in_flight"] == 0
+    assert pool.rejected == statuses.count(503)
+    assert len(queued) == statuses.count(200)
+    # An accepted login waits behind at most the bounded queue, never behind every login in flight;
+    # benchmark_logins.py measures the resulting p99 against a real server
+    assert max(queued) <= pool.max_pending
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Session as SessionModel
+from app.pagination import NEXT_CURSOR_HEADER
+from .conftest import auth_headers, statement_count
+
+
+@pytest.mark.parametrize("role", ["assistant", "student"])
+def test_user_list_statement_count_does_not_grow_with_users(client, make_center, role):
+    counts = {}
+    for size in (8, 60):
+        center = make_center(assistants=size, students=size)
+        response = client.get(f"/manager/users?role={role}", headers=auth_headers(center.manager))
+
+        assert response.status_code == 200
+        assert len(response.json()) == size
+        counts[size] = statement_count(response)
+
+    assert counts[8] == counts[60]
+
+
+def test_user_detail_sessions_page_like_every_other_list(client, make_center, db):
+    center = make_center(assistants=1, students=1)
+    student = center.students[0]
+    start = datetime.now() + timedelta(days=1)
+    db.add_all([
+        SessionModel(student_id=student.id, assistant_id=center.assistants[0].id, subject_id=center.subject.id,
+                     datetime=start + timedelta(hours=hour))
+        for hour in range(60)
+    ])
+    db.commit()
+    headers = auth_headers(center.manager)
+
+    # Without cursor/limit the legacy full list comes back, with no cursor anywhere
+    response = client.get(f"/manager/users/{student.id}", headers=headers)
+    assert len(response.json()["sessions"]) == 60
+    assert "next_cursor" not in response.json()
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    seen = []
+    params = {"limit": 25}
+    while True:
+        response = client.get(f"/manager/users/{student.id}", headers=headers, params=params)
+        assert "next_cursor" not in response.json()
+        seen += [session["id"] for session in response.json()["sessions"]]
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+
+    assert len(seen) == len(set(seen)) == 60
+
+
+def test_user_list_fields_match_their_definitions(client, make_center, db):
+    center = make_center(assistants=1, students=2, slots=("10:00", "11:00"))
+    assistant, (rated, idle) = center.assistants[0], center.students
+    for time_slot in ("10:00", "11:00"):
+        response = client.post("/student/sessions", headers=auth_headers(rated),
+                               json={"assistant_id": assistant.id, "datetime": f"{center.slot_date}T{time_slot}:00"})
+        assert response.status_code == 200
+    past = [
+        SessionModel(student_id=rated.id, assistant_id=assistant.id, subject_id=center.subject.id,
+                     datetime=datetime.now() - timedelta(days=day), attendance="present")
+        for day in (1, 2)
+    ]
+    db.add_all(past)
+    db.commit()
+    for session, score in zip(past, (5, 3)):
+        response = client.post("/student/ratings", headers=auth_headers(rated), json={
+            "session_id": session.id, "knowledge": score, "communication": score, "patience": score,
+            "engagement": score, "problem_solving": score
+        })
+        assert response.status_code == 200
+    headers = auth_headers(center.manager)
+
+    students = {user["id"]: user for user in client.get("/manager/users?role=student", headers=headers).json()}
+    assert students[rated.id] == {
+        "id": rated.id, "fullname": rated.fullname, "phone": rated.phone, "subject_field": "Math",
+        "photo_url": None, "avg_rating": 4.0, "total_sessions": 4,
+        "created_at": rated.created_at.strftime("%d.%m.%Y"), "active_status": "faol"
+    }
+    assert (students[idle.id]["avg_rating"], students[idle.id]["total_sessions"]) == (0, 0)
+
+    # Assistants count the sessions booked through the API, with ratings from the aggregates
+    [listed] = client.get("/manager/users?role=assistant", headers=headers).json()
+    assert (listed["id"], listed["avg_rating"], listed["total_sessions"]) == (assistant.id, 4.0, 2)
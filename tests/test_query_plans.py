@@ -0,0 +1,75 @@
+"""The routers' hot lookups must be served by an index, never a full table scan (SQLite plans)"""
+
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Response
+from sqlalchemy import select
+
+from app.database import engine
+from app.models import User, Rating, Availability
+from app.pagination import PageParams
+from app.routes.assistant import assistant_sessions_query
+from app.routes.student import (
+    claim_slot_statement, student_sessions_query, slot_search_assistants, stored_free_slots_statement
+)
+from app.export import session_export_statement
+
+NOW = datetime(2026, 1, 5, 10, 0)
+HOT_TABLES = ("sessions", "availability", "ratings", "users")
+# "SCAN users" or an aliased "SCAN users_1"; SEARCH ... USING INDEX is what we want
+FULL_SCAN = re.compile(rf"^SCAN ({'|'.join(HOT_TABLES)})(_\d+)?\b")
+
+HOT_QUERIES = {
+    "assistant sessions by time": lambda: assistant_sessions_query(
+        1, "upcoming", PageParams(Response(), cursor=None, limit=20)
+    ),
+    "student sessions by time": lambda: student_sessions_query(1, "upcoming"),
+    "session export by center": lambda: session_export_statement(1),
+    "slot claim": lambda: claim_slot_statement(1, NOW),
+    "free slots of an assistant": lambda: select(Availability).where(
+        Availability.assistant_id == 1, Availability.date >= "2026-01-05"
+    ),
+    "rating of a session": lambda: select(Rating).where(Rating.session_id == 1),
+    "center users by role": lambda: select(User).where(User.learning_center_id == 1, User.role == "student"),
+    "login by phone": lambda: select(User).where(User.phone == "+998900000000", User.learning_center_id == 1),
+    "slot search": lambda: slot_search_statement(),
+}
+
+
+def slot_search_statement():
+    return stored_free_slots_statement(
+        slot_search_assistants(1, "Math", 3.0), NOW.date(), NOW.date() + timedelta(days=89), NOW, "09:00", "18:00", 20
+    )
+
+
+def query_plan(statement) -> list:
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as connection:
+        return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="plans are read from SQLite's EXPLAIN QUERY PLAN")
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_an_index(name):
+    plan = query_plan(HOT_QUERIES[name]())
+
+    assert plan
+    assert not [step for step in plan if FULL_SCAN.match(step)], plan
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="plans are read from SQLite's EXPLAIN QUERY PLAN")
+def test_session_export_streams_in_index_order():
+    plan = query_plan(session_export_statement(1))
+
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="plans are read from SQLite's EXPLAIN QUERY PLAN")
+def test_slot_search_reads_free_slots_in_index_order():
+    plan = query_plan(slot_search_statement())
+
+    assert any("ix_availability_is_available_date_time_slot" in step for step in plan), plan
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import AssistantStats, Session as SessionModel
+from app.stats import check_rating_aggregates
+from .conftest import auth_headers
+
+SCORES = [(5, 4, 5, 4, 5), (3, 3, 4, 3, 2), (5, 5, 5, 5, 5)]
+DIMENSIONS = ("knowledge", "communication", "patience", "engagement", "problem_solving")
+
+
+def rate_sessions(client, center, db):
+    assistant, student = center.assistants[0], center.students[0]
+    sessions = [
+        SessionModel(student_id=student.id, assistant_id=assistant.id, subject_id=center.subject.id,
+                     datetime=datetime.now() - timedelta(days=day + 1), attendance="present")
+        for day in range(len(SCORES))
+    ]
+    db.add_all(sessions)
+    db.commit()
+    for session, scores in zip(sessions, SCORES):
+        response = client.post("/student/ratings", headers=auth_headers(student),
+                               json={"session_id": session.id, **dict(zip(DIMENSIONS, scores))})
+        assert response.status_code == 200
+
+
+def test_ratings_update_the_assistant_aggregates_read_by_every_list(client, make_center, db):
+    center = make_center(assistants=1, students=1)
+    assistant = center.assistants[0]
+    rate_sessions(client, center, db)
+
+    stats = db.get(AssistantStats, assistant.id)
+    assert (stats.rating_count, stats.rating_total) == (3, sum(map(sum, SCORES)))
+    for index, dimension in enumerate(DIMENSIONS):
+        assert getattr(stats, f"{dimension}_total") == sum(scores[index] for scores in SCORES)
+
+    expected = round(sum(map(sum, SCORES)) / (5.0 * len(SCORES)), 2)
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        [listed] = client.get("/manager/users?role=assistant", headers=auth_headers(center.manager)).json()
+        [catalogue] = client.get("/student/assistants", headers=auth_headers(center.students[0])).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert listed["avg_rating"] == catalogue["avg_rating"] == expected
+    # The assistant lists read the aggregates, never the ratings table
+    assert statements
+    assert not [statement for statement in statements if "FROM ratings" in statement or "JOIN ratings" in statement]
+
+    top = client.get("/manager/stats", headers=auth_headers(center.manager)).json()["top_assistants"]
+    assert [(entry["name"], entry["rating"]) for entry in top] == [(assistant.fullname, expected)]
+
+
+def test_check_rating_aggregates_reports_and_repairs_drift(client, make_center, db):
+    center = make_center(assistants=1, students=1)
+    assistant = center.assistants[0]
+    rate_sessions(client, center, db)
+    stats = db.get(AssistantStats, assistant.id)
+    stats.rating_count, stats.patience_total = 7, 0
+    db.commit()
+
+    drift = check_rating_aggregates(db, center.center.id)
+    assert drift == [{"assistant_id": assistant.id, "differences": {
+        "rating_count": {"stored": 7, "expected": 3},
+        "patience_total": {"stored": 0, "expected": sum(scores[2] for scores in SCORES)},
+    }}]
+
+    assert check_rating_aggregates(db, center.center.id, repair=True) == drift
+    db.commit()
+    assert check_rating_aggregates(db, center.center.id) == []
@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Subject
+from app.response_cache import response_cache
+from .conftest import auth_headers, statement_count
+
+
+def test_concurrent_identical_stats_requests_compute_once(make_center):
+    center = make_center(assistants=2, students=2)
+    headers = auth_headers(center.manager)
+    response_cache.clear()
+    executions = response_cache.flights.executions
+    start = threading.Barrier(10)
+
+    def fetch(_):
+        client = TestClient(app)
+        start.wait()
+        return client.get("/manager/stats", headers=headers)
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        responses = list(pool.map(fetch, range(10)))
+
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert response_cache.flights.executions - executions == 1
+
+
+def test_cached_page_keeps_its_cursor_and_is_dropped_by_a_write(client, make_center, db):
+    center = make_center()
+    db.add(Subject(name="Physics", learning_center_id=center.center.id))
+    db.commit()
+    headers = auth_headers(center.manager)
+
+    first = client.get("/manager/subjects?limit=1", headers=headers)
+    again = client.get("/manager/subjects?limit=1", headers=headers)
+    assert statement_count(again) == 0
+    assert again.json() == first.json()
+    assert again.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+
+    response = client.post("/manager/subjects", headers=headers, json={"name": "Chemistry"})
+    assert response.status_code == 200
+    after_write = client.get("/manager/subjects?limit=1", headers=headers)
+    assert statement_count(after_write) > 0
+
+
+def test_coalesced_only_routes_are_not_cached(client, make_center):
+    center = make_center()
+    headers = auth_headers(center.manager)
+    client.get("/manager/users?role=student", headers=headers)
+
+    assert statement_count(client.get("/manager/users?role=student", headers=headers)) > 0
+    assert client.get("/manager/users?role=manager", headers=headers).status_code == 400
+
+
+def test_cache_key_dependencies_are_not_query_parameters(client):
+    operation = client.get("/openapi.json").json()["paths"]["/student/assistants"]["get"]
+    assert [parameter["name"] for parameter in operation.get("parameters", [])] == []
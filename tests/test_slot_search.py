@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from app.models import Availability, AvailabilityRule
+from .conftest import auth_headers, statement_count
+
+
+def test_stored_slots_filling_the_limit_end_the_rule_scan(client, make_center, db):
+    center = make_center(assistants=2, students=1, slots=())
+    stored, ruled = center.assistants
+    tomorrow = datetime.strptime(center.slot_date, "%Y-%m-%d")
+    # One rule slot a week, and a rule slot duplicating a stored slot: neither may count twice
+    db.add_all([
+        Availability(assistant_id=stored.id, date=center.slot_date, time_slot=time_slot, is_available="available")
+        for time_slot in ("10:00", "11:00")
+    ] + [
+        AvailabilityRule(assistant_id=ruled.id, weekday=tomorrow.weekday(), start_time="12:00", end_time="13:00",
+                         slot_minutes=60, valid_from=center.slot_date),
+        AvailabilityRule(assistant_id=stored.id, weekday=tomorrow.weekday(), start_time="10:00", end_time="11:00",
+                         slot_minutes=60, valid_from=center.slot_date),
+    ])
+    db.commit()
+    headers = auth_headers(center.students[0])
+    client.get("/student/slots/search", headers=headers)  # cache the principal
+
+    response = client.get(f"/student/slots/search?date_from={center.slot_date}&limit=3", headers=headers)
+
+    assert response.status_code == 200
+    assert [(slot["assistant_id"], slot["date"], slot["time"]) for slot in response.json()] == [
+        (stored.id, center.slot_date, "10:00"),
+        (stored.id, center.slot_date, "11:00"),
+        (ruled.id, center.slot_date, "12:00"),
+    ]
+    # Stored slots, rules, the first week's overrides, the profiles and their subjects - no further weeks
+    assert statement_count(response) == 5
+
+
+def test_search_scans_on_while_the_earliest_slots_are_not_settled(client, make_center, db):
+    center = make_center(assistants=1, students=1, slots=())
+    assistant = center.assistants[0]
+    far = datetime.strptime(center.slot_date, "%Y-%m-%d") + timedelta(days=20)
+    db.add(AvailabilityRule(assistant_id=assistant.id, weekday=far.weekday(), start_time="09:00", end_time="10:00",
+                            slot_minutes=60, valid_from=f"{far:%Y-%m-%d}"))
+    db.commit()
+
+    response = client.get(f"/student/slots/search?date_from={center.slot_date}&limit=2",
+                          headers=auth_headers(center.students[0]))
+
+    assert [(slot["date"], slot["time"]) for slot in response.json()] == [
+        (f"{far:%Y-%m-%d}", "09:00"), (f"{far + timedelta(days=7):%Y-%m-%d}", "09:00")
+    ]
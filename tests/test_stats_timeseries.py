@@ -0,0 +1,49 @@
+import time
+from datetime import date
+
+import pytest
+
+from app.stats import TIMESERIES_GRANULARITIES, period_count, period_starts
+from .conftest import auth_headers
+
+
+@pytest.mark.parametrize("granularity", TIMESERIES_GRANULARITIES)
+@pytest.mark.parametrize("date_from, date_to", [
+    (date(2026, 1, 1), date(2026, 1, 1)),
+    (date(2025, 12, 31), date(2026, 3, 1)),
+    (date(2024, 2, 29), date(2026, 2, 28)),
+    (date(9999, 1, 1), date(9999, 12, 31)),
+    (date(1, 1, 1), date(1, 3, 3)),
+])
+def test_period_count_matches_the_buckets_built(date_from, date_to, granularity):
+    starts = period_starts(date_from, date_to, granularity)
+
+    assert period_count(date_from, date_to, granularity) == len(starts)
+    assert starts[0] <= date_from and starts[-1] <= date_to
+    assert starts == sorted(set(starts))
+
+
+@pytest.mark.parametrize("granularity", TIMESERIES_GRANULARITIES)
+@pytest.mark.parametrize("date_to", ["9999-12-30", "9999-12-31"])
+def test_huge_ranges_are_rejected_before_building_buckets(client, make_center, granularity, date_to):
+    center = make_center()
+    started = time.perf_counter()
+    response = client.get(f"/manager/stats/timeseries?from=0001-01-01&to={date_to}&granularity={granularity}",
+                          headers=auth_headers(center.manager))
+
+    assert response.status_code == 400
+    assert time.perf_counter() - started < 0.5
+
+
+@pytest.mark.parametrize("query, periods", [
+    ("from=9999-12-01&to=9999-12-31&granularity=day", 31),
+    ("from=9999-01-01&to=9999-12-31&granularity=month", 12),
+    ("from=9999-12-01&to=9999-12-31&granularity=week", 5),
+    ("to=0001-01-05", 5),
+])
+def test_ranges_at_the_calendar_edges(client, make_center, query, periods):
+    center = make_center()
+    response = client.get(f"/manager/stats/timeseries?{query}", headers=auth_headers(center.manager))
+
+    assert response.status_code == 200
+    assert len(response.json()["series"]) == periods
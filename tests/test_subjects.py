@@ -0,0 +1,114 @@
+import io
+
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import Subject, User
+from .conftest import auth_headers, statement_count
+
+UNKNOWN_SUBJECT = {"detail": "Bunday fan mavjud emas"}
+
+
+def test_create_user_rejects_an_unknown_subject(client, make_center, db):
+    center = make_center(assistants=0, students=0)
+    elsewhere = make_center(assistants=0, students=0)
+    db.query(Subject).filter(Subject.id == elsewhere.subject.id).update({"name": "Biology"})
+    db.commit()
+    headers = auth_headers(center.manager)
+
+    # Unknown anywhere, and known only in another center
+    for subject in ("Chemistry", "Biology"):
+        response = client.post("/manager/users", headers=headers, json={
+            "fullname": "New", "phone": f"sub{center.center.id}{subject}", "password": "secret",
+            "role": "student", "subject_field": subject
+        })
+        assert (response.status_code, response.json()) == (400, UNKNOWN_SUBJECT)
+
+    response = client.post("/manager/users", headers=headers, json={
+        "fullname": "New", "phone": f"sub{center.center.id}", "password": "secret", "role": "student",
+        "subject_field": "Math"
+    })
+    assert response.status_code == 200
+    assert db.get(User, response.json()["user_id"]).subject_id == center.subject.id
+
+
+def test_update_user_rejects_an_unknown_subject(client, make_center, db):
+    center = make_center()
+    student = center.students[0]
+
+    response = client.put(f"/manager/users/{student.id}", headers=auth_headers(center.manager),
+                          json={"subject_field": "Chemistry"})
+
+    assert (response.status_code, response.json()) == (400, UNKNOWN_SUBJECT)
+    db.expire_all()
+    assert db.get(User, student.id).subject_id == center.subject.id
+
+
+def test_update_profile_rejects_an_unknown_subject(client, make_center, db):
+    center = make_center()
+    assistant = center.assistants[0]
+
+    response = client.put("/auth/update-profile", headers=auth_headers(assistant),
+                          json={"fullname": "Renamed", "subject_field": "Chemistry"})
+
+    assert (response.status_code, response.json()) == (400, UNKNOWN_SUBJECT)
+    db.expire_all()
+    assert db.get(User, assistant.id).fullname == assistant.fullname
+
+
+def test_import_reports_an_unknown_subject_on_its_row(client, make_center, db):
+    center = make_center(assistants=0, students=0)
+    content = (
+        "fullname,phone,password,role,subject_field\n"
+        f"Known,imps{center.center.id}_1,secret,student,Math\n"
+        f"Unknown,imps{center.center.id}_2,secret,student,Chemistry\n"
+    ).encode()
+
+    response = client.post("/manager/users/import", headers=auth_headers(center.manager),
+                           files={"file": ("users.csv", io.BytesIO(content), "text/csv")})
+
+    # The import reports rows instead of failing the whole upload
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert response.json()["errors"] == [
+        {"row": 3, "phone": f"imps{center.center.id}_2", "errors": ["Bunday fan mavjud emas"]}
+    ]
+
+
+def test_subject_rename_updates_one_row_and_shows_on_users(client, make_center):
+    center = make_center(assistants=3, students=3)
+    headers = auth_headers(center.manager)
+    updates = []
+
+    def record_update(connection, cursor, statement, *args):
+        if statement.startswith("UPDATE"):
+            updates.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_update)
+    try:
+        response = client.put(f"/manager/subjects/{center.subject.id}", headers=headers, json={"name": "Algebra"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record_update)
+
+    assert response.status_code == 200
+    assert [statement.split(" SET")[0] for statement in updates] == ["UPDATE subjects"]
+    users = client.get("/manager/users?role=assistant", headers=headers).json()
+    assert {user["subject_field"] for user in users} == {"Algebra"}
+
+
+def test_subject_list_counts_in_one_query(client, make_center, db):
+    counts = {}
+    for extra_subjects in (1, 20):
+        center = make_center(assistants=2, students=3)
+        db.add_all([Subject(name=f"Extra {index}", learning_center_id=center.center.id)
+                    for index in range(extra_subjects)])
+        db.commit()
+        response = client.get("/manager/subjects", headers=auth_headers(center.manager))
+
+        subjects = {subject["name"]: subject for subject in response.json()}
+        assert len(subjects) == extra_subjects + 1
+        assert (subjects["Math"]["assistant_count"], subjects["Math"]["student_count"]) == (2, 3)
+        assert subjects["Extra 0"]["assistant_count"] == subjects["Extra 0"]["student_count"] == 0
+        counts[extra_subjects] = statement_count(response)
+
+    assert counts[1] == counts[20]
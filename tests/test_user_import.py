@@ -0,0 +1,113 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import user_import
+from app.database import SessionLocal
+from app.models import User
+from app.routes import manager as manager_routes
+from .conftest import auth_headers
+
+
+def upload(client, center, content: bytes, filename="users.csv"):
+    return client.post("/manager/users/import", headers=auth_headers(center.manager),
+                       files={"file": (filename, content, "text/csv")})
+
+
+def csv_rows(center, count: int, start: int = 0) -> list:
+    return [f"Student {index},imp{center.center.id}_{index},secret,student,Math" for index in range(start, start + count)]
+
+
+def csv_file(lines) -> bytes:
+    return ("fullname,phone,password,role,subject_field\n" + "\n".join(lines) + "\n").encode()
+
+
+def center_phones(db, center) -> set:
+    return {phone for (phone,) in db.query(User.phone).filter(User.learning_center_id == center.center.id)}
+
+
+def test_import_commits_chunk_by_chunk_and_reports_rows(client, make_center, db, monkeypatch):
+    center = make_center(assistants=0, students=1)
+    monkeypatch.setattr(user_import, "IMPORT_BATCH_SIZE", 3)
+    lines = csv_rows(center, 7)
+    lines.insert(4, f"Taken,{center.students[0].phone},secret,student,")  # row 6
+    lines.append(f"Again,imp{center.center.id}_1,secret,student,")  # row 10, repeats row 3
+    lines.append(f"Boss,imp{center.center.id}_x,secret,manager,")  # row 11
+
+    commits = []
+
+    def count_commit(session):
+        commits.append(session)
+
+    event.listen(Session, "after_commit", count_commit)
+    try:
+        response = upload(client, center, csv_file(lines))
+    finally:
+        event.remove(Session, "after_commit", count_commit)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (7, 3)
+    assert [(error["row"], error["errors"]) for error in body["errors"]] == [
+        (6, ["Bu telefon raqam allaqachon ro'yxatdan o'tgan"]),
+        (10, ["Bu telefon raqam faylning 3-qatorida ham bor"]),
+        (11, ["Faqat yordamchi yoki talaba hisobi yaratish mumkin"]),
+    ]
+    assert len(commits) == 4  # one per chunk of three rows
+    db.expire_all()
+    assert center_phones(db, center) >= {f"imp{center.center.id}_{index}" for index in range(7)}
+
+
+def test_phone_registered_during_import_is_reported_for_its_row(client, make_center, db, monkeypatch):
+    center = make_center(assistants=0, students=0)
+    lines = csv_rows(center, 3)
+    validate = manager_routes.validate_import_rows
+
+    def validate_then_register(db, learning_center_id, rows, *args):
+        result = validate(db, learning_center_id, rows, *args)
+        with SessionLocal() as other:  # another request wins the phone of row 3
+            other.add(User(fullname="Elsewhere", phone=f"imp{center.center.id}_1", password="x",
+                           role="student", learning_center_id=learning_center_id))
+            other.commit()
+        return result
+
+    monkeypatch.setattr(manager_routes, "validate_import_rows", validate_then_register)
+    response = upload(client, center, csv_file(lines))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2
+    assert body["errors"] == [
+        {"row": 3, "phone": f"imp{center.center.id}_1", "errors": ["Bu telefon raqam allaqachon ro'yxatdan o'tgan"]}
+    ]
+    db.expire_all()
+    assert db.query(User).filter(User.learning_center_id == center.center.id, User.role == "student").count() == 3
+
+
+def test_file_that_stops_decoding_keeps_the_rows_before_it(client, make_center, db, monkeypatch):
+    center = make_center(assistants=0, students=0)
+    monkeypatch.setattr(user_import, "IMPORT_BATCH_SIZE", 2)
+    content = csv_file(csv_rows(center, 10)) + b"\xff\xfe,broken\n"
+
+    response = upload(client, center, content)
+
+    assert response.status_code == 200
+    body = response.json()
+    [error] = body["errors"]
+    assert error["errors"] == ["Faylni o'qib bo'lmadi: UTF-8 CSV yoki NDJSON kerak"]
+    # Every row before the one reported (after the header) was created
+    assert body["created"] == error["row"] - 2 > 0
+    db.expire_all()
+    assert db.query(User).filter(User.learning_center_id == center.center.id, User.role == "student").count() == \
+        body["created"]
+
+    assert upload(client, center, b"\xff\xfe\x00\x01").status_code == 400
+
+
+def test_unknown_subject_is_a_row_error(client, make_center):
+    center = make_center(assistants=0, students=0)
+    response = upload(client, center, csv_file([f"Student,imp{center.center.id}_s,secret,student,Chemistry"]))
+
+    assert response.status_code == 200
+    assert response.json()["errors"] == [
+        {"row": 2, "phone": f"imp{center.center.id}_s", "errors": ["Bunday fan mavjud emas"]}
+    ]